@@ -0,0 +1,192 @@
+# async_web.py
+"""
+Asyncio (ASGI) web tier, used when WEB_TIER = "async".
+
+Flask's threaded server ties up a whole thread for every /video_feed client
+and for every control request until the move has finished.  Here the
+latency sensitive parts run as coroutines under uvicorn:
+
+    /video_feed  - each new preview frame is JPEG encoded once (in a worker
+                   thread) and shared by every viewer, so a viewer is just a
+                   cheap coroutine waiting for the next frame
+    /move        - returns straight away, the move runs in the background
+    /ws          - WebSocket pushing status changes and accepting control
+                   messages, including continuous joystick velocities
+
+Everything else is handed to the existing Flask app through WSGIMiddleware,
+so the other routes only exist once.
+
+Needs the optional packages starlette, a2wsgi and uvicorn[standard].
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+
+import time
+
+import cv2
+
+from metrics import stream_metrics
+
+logger = logging.getLogger("my_app_logger.async_web")
+
+
+class FrameBroadcaster:
+    """
+    Encodes each new preview frame once and shares the JPEG with all streaming clients.
+    """
+    def __init__(self, get_frame, fps, add_viewer=None):
+        self.get_frame = get_frame
+        self.add_viewer = add_viewer
+        self.interval = 1.0 / fps
+        self.condition = asyncio.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.clients = 0
+        self.encode_seconds, self.stream_clients = stream_metrics()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        last_frame = None
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.clients:
+                continue
+            frame = self.get_frame()
+            # The camera callback stores a new array for every frame
+            if frame is None or frame is last_frame:
+                continue
+            last_frame = frame
+            encode_start = time.perf_counter()
+            ret, buffer = await loop.run_in_executor(None, cv2.imencode, '.jpg', frame)
+            self.encode_seconds.observe(time.perf_counter() - encode_start)
+            if not ret:
+                continue
+            async with self.condition:
+                self.jpeg = buffer.tobytes()
+                self.seq += 1
+                self.condition.notify_all()
+
+    async def frames(self):
+        self.clients += 1
+        self.stream_clients.inc()
+        if self.add_viewer:
+            self.add_viewer(1)
+        try:
+            seq = self.seq
+            while True:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: self.seq != seq)
+                    seq = self.seq
+                    jpeg = self.jpeg
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            self.clients -= 1
+            self.stream_clients.dec()
+            if self.add_viewer:
+                self.add_viewer(-1)
+
+
+def create_app(flask_app, get_status, get_frame, start_move, handle_control, fps, status_interval=0.2,
+               add_viewer=None, is_ready=None):
+    """
+    get_status()             -> dict, the same data as /status
+    get_frame()              -> latest annotated preview frame (BGR array) or None
+    start_move(direction)    -> (message, http status), must not block
+    handle_control(message)  -> dict reply for a WebSocket control message, must not block
+    add_viewer(delta)        -> called with +1/-1 as video feed clients come and go, optional
+    is_ready()               -> False until start up is done, these routes answer 503 until then
+                                like the Flask ones, optional
+    """
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+    from starlette.routing import Mount, Route, WebSocketRoute
+    from starlette.websockets import WebSocketDisconnect
+
+    broadcaster = FrameBroadcaster(get_frame, fps, add_viewer)
+
+    def ready():
+        return is_ready is None or is_ready()
+
+    def starting():
+        return JSONResponse({"status": "starting", "message": "Starting up"}, status_code=503,
+                            headers={"Retry-After": "1"})
+
+    async def video_feed(request):
+        if not ready():
+            return starting()
+        return StreamingResponse(broadcaster.frames(),
+                                 media_type='multipart/x-mixed-replace; boundary=frame')
+
+    async def move(request):
+        if not ready():
+            return starting()
+        message, status = start_move(request.query_params.get("direction"))
+        return PlainTextResponse(message, status_code=status)
+
+    async def websocket_endpoint(websocket):
+        await websocket.accept()
+
+        async def push_status():
+            last = None
+            while True:
+                await asyncio.sleep(status_interval)
+                # The turret's status is incomplete until start up is done
+                if not ready():
+                    continue
+                try:
+                    status = json.dumps(get_status())
+                except Exception as e:
+                    logger.error(f"Could not read the status for the WebSocket: {e}")
+                    continue
+                if status != last:
+                    await websocket.send_text('{"type": "status", "data": ' + status + '}')
+                    last = status
+
+        pusher = asyncio.create_task(push_status())
+        try:
+            while True:
+                text = await websocket.receive_text()
+                try:
+                    message = json.loads(text)
+                    reply = handle_control(message) if ready() else {"type": "error", "message": "Starting up"}
+                except Exception as e:
+                    reply = {"type": "error", "message": str(e)}
+                if reply:
+                    await websocket.send_text(json.dumps(reply))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            pusher.cancel()
+            # Stop the turret if the controlling page goes away mid-move
+            if ready():
+                handle_control({"type": "velocity", "pan": 0, "tilt": 0})
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        task = asyncio.create_task(broadcaster.run())
+        yield
+        task.cancel()
+
+    return Starlette(
+        routes=[
+            Route('/video_feed', video_feed),
+            Route('/move', move),
+            WebSocketRoute('/ws', websocket_endpoint),
+            Mount('/', app=WSGIMiddleware(flask_app)),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def run(asgi_app, host, port):
+    """
+    Runs the ASGI app with uvicorn, blocks so call it from its own thread.
+    """
+    import uvicorn
+    config = uvicorn.Config(asgi_app, host=host, port=port, log_level="warning")
+    uvicorn.Server(config).run()
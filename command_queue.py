@@ -0,0 +1,64 @@
+# command_queue.py
+"""
+Thread-safe queue of commands for the controller thread.
+
+The camera callback and the web routes must not start/stop recording or
+reconfigure the camera themselves (that would deadlock the callback or race
+with each other), so they put a Command on the queue instead.  The controller
+thread blocks on the queue and carries the commands out one at a time, so it
+reacts immediately and never wakes up when there is nothing to do.
+
+Each command is stamped when it is queued so the time spent waiting in the
+queue can be measured.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger("my_app_logger.commands")
+
+Command = namedtuple("Command", ["name", "args", "queued_at"])
+
+
+class CommandQueue:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.handled = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_latency = 0.0
+
+    def put(self, name, **args):
+        """
+        Queue a command, safe to call from the camera callback and web threads.
+        """
+        self.queue.put(Command(name, args, time.monotonic()))
+
+    def get(self):
+        """
+        Blocks until a command is available and records how long it waited.
+        """
+        command = self.queue.get()
+        latency = time.monotonic() - command.queued_at
+        with self.lock:
+            self.handled += 1
+            self.total_latency += latency
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+        logger.debug("Command %s waited %.2f ms in the queue", command.name, latency * 1000)
+        return command
+
+    def stats(self):
+        with self.lock:
+            avg = self.total_latency / self.handled if self.handled else 0.0
+            return {
+                "handled": self.handled,
+                "pending": self.queue.qsize(),
+                "last_latency_ms": round(self.last_latency * 1000, 3),
+                "avg_latency_ms": round(avg * 1000, 3),
+                "max_latency_ms": round(self.max_latency * 1000, 3),
+            }
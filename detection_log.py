@@ -0,0 +1,349 @@
+# detection_log.py
+"""
+Append-only log of every detection, so questions like "how many foxes per
+night this month" can be answered without grepping the logs.
+
+Detections are stored as fixed-width binary records (RECORD_DTYPE, 30 bytes
+each) in one file per day, detections_YYYYMMDD.bin, with a small JSON header
+file alongside holding the labels and main stream size.  Adding a frame only
+appends a tuple to a list; a background thread converts each batch to
+records and appends them to the file.
+
+Queries memory-map the day files and work through them in fixed size chunks
+with NumPy, so memory use does not grow with the size of the log.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger("my_app_logger.detection_log")
+
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),  # Unix time
+    ("category", "<u2"),   # Index into the labels in the header file
+    ("conf", "<f4"),
+    ("x", "<u2"),          # Box in main stream pixels
+    ("y", "<u2"),
+    ("w", "<u2"),
+    ("h", "<u2"),
+    ("pan", "<f4"),        # Turret pose when the frame was processed
+    ("tilt", "<f4"),
+])
+
+QUERY_CHUNK_RECORDS = 65536
+# Limits of a query, so a request cannot allocate unbounded arrays
+MAX_GRID_SIDE = 512
+MAX_BUCKETS = 10000
+
+
+def local_day_start(timestamp, hour=0):
+    """
+    Unix time of local midnight (or of hour:00) for the day containing timestamp.
+    """
+    t = time.localtime(timestamp)
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday, hour, 0, 0, 0, 0, -1))
+
+
+def bucket_edges(bucket, start, end):
+    """
+    Start times of the buckets covering [start, end), followed by the end of the
+    last one.  Days and nights follow local midnight and noon, so they are 23 or
+    25 hours long across a DST change; hours are a fixed 3600 s from midnight.
+    """
+    if bucket == "hour":
+        origin = local_day_start(start)
+        n_buckets = int((end - origin) // 3600) + 1
+        if n_buckets > MAX_BUCKETS:
+            raise ValueError(f"Range covers more than {MAX_BUCKETS} hour buckets")
+        return origin + 3600.0 * np.arange(n_buckets + 1)
+
+    # A night starts at midday, the one covering the early hours of start began the day before
+    hour = 12 if bucket == "night" else 0
+    day = local_day_start(start) if bucket == "day" else local_day_start(local_day_start(start) - 1)
+    edges = []
+    while True:
+        edges.append(local_day_start(day, hour))
+        if edges[-1] >= end:
+            break
+        if len(edges) > MAX_BUCKETS:
+            raise ValueError(f"Range covers more than {MAX_BUCKETS} {bucket} buckets")
+        # Step to the next local midnight (works across DST changes)
+        day = local_day_start(day + 36 * 3600)
+    return np.array(edges)
+
+
+class DetectionLog:
+    def __init__(self, directory, flush_interval=5.0, max_days=365):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_days = max_days
+        self.pending = []
+        self.labels = ()
+        self.main_size = (0, 0)
+        self.file_lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def set_stream_info(self, labels, main_size):
+        """
+        Labels of the current model and the main stream size.  May be called again after a
+        model switch, each day file keeps one label table that only ever grows, so the
+        categories already written stay valid.
+        """
+        self.labels = tuple(labels)
+        self.main_size = tuple(main_size)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+    def add(self, timestamp, detections, pan, tilt):
+        """
+        Called from the event bus subscriber, just queues the frame for the next flush.
+        detections need .category, .conf and .box (x, y, w, h).
+        """
+        # The labels go with the frame, the model may change before the next flush
+        self.pending.append((timestamp, detections, pan, tilt, self.labels))
+
+    def flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush detection log: {e}")
+
+    def day_path(self, day_start, ext):
+        return os.path.join(self.directory, time.strftime("detections_%Y%m%d", time.localtime(day_start)) + ext)
+
+    def flush(self):
+        with self.file_lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        # Swap the list so the callback keeps appending to a fresh one
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        # Categories in the batch index batch_labels, mapped to each day's own table in append()
+        rows = []
+        batch_labels = []
+        batch_index = {}
+        for timestamp, detections, pan, tilt, labels in pending:
+            for d in detections:
+                category = int(d.category)
+                name = labels[category] if category < len(labels) else str(category)
+                if name not in batch_index:
+                    batch_index[name] = len(batch_labels)
+                    batch_labels.append(name)
+                x, y, w, h = d.box
+                rows.append((timestamp, batch_index[name], float(d.conf),
+                             max(0, int(x)), max(0, int(y)), max(0, int(w)), max(0, int(h)), pan, tilt))
+        if not rows:
+            return
+        records = np.array(rows, dtype=RECORD_DTYPE)
+
+        # Split the batch by local day so each lands in the right file
+        timestamps = records["timestamp"]
+        day = local_day_start(timestamps[0])
+        while True:
+            next_day = local_day_start(day + 36 * 3600)
+            self.append(day, records[(timestamps >= day) & (timestamps < next_day)], batch_labels)
+            if next_day > timestamps[-1]:
+                break
+            day = next_day
+
+    def append(self, day_start, records, labels):
+        if len(records) == 0:
+            return
+        header_path = self.day_path(day_start, ".json")
+        new_day = not os.path.exists(header_path)
+        if new_day:
+            header = {"labels": [], "main_size": list(self.main_size), "version": 1}
+        else:
+            with open(header_path, "r") as f:
+                header = json.load(f)
+
+        # Map the batch categories onto the day's label table, adding any new labels at the end
+        day_labels = header["labels"]
+        size_before = len(day_labels)
+        mapping = np.empty(len(labels), dtype=np.uint16)
+        for i, name in enumerate(labels):
+            if name not in day_labels:
+                day_labels.append(name)
+            mapping[i] = day_labels.index(name)
+        records = records.copy()
+        records["category"] = mapping[records["category"]]
+
+        if new_day or len(day_labels) != size_before:
+            tmp_path = header_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(header, f)
+            os.replace(tmp_path, header_path)
+        if new_day:
+            # First write of a new day, also a good moment to drop old days
+            self.remove_old_days()
+        with open(self.day_path(day_start, ".bin"), "ab") as f:
+            f.write(records.tobytes())
+
+    def remove_old_days(self):
+        if not self.max_days:
+            return
+        cutoff = time.strftime("detections_%Y%m%d", time.localtime(time.time() - self.max_days * 86400))
+        for name in os.listdir(self.directory):
+            if name.startswith("detections_") and name.split(".")[0] < cutoff:
+                os.remove(os.path.join(self.directory, name))
+                logger.info(f"Removed old detection log {name}")
+
+    def day_files(self, start, end):
+        """
+        (bin path, header) for every day file overlapping [start, end).
+        """
+        files = []
+        day = local_day_start(start)
+        while day < end:
+            bin_path = self.day_path(day, ".bin")
+            if os.path.exists(bin_path):
+                header = self.read_header(self.day_path(day, ".json"))
+                if header is not None:
+                    files.append((bin_path, header))
+            # Step to the next local midnight (works across DST changes)
+            day = local_day_start(day + 36 * 3600)
+        return files
+
+    def read_header(self, header_path):
+        """
+        The day's header, None (and a warning) if it is missing or damaged.
+        """
+        try:
+            with open(header_path, "r") as f:
+                header = json.load(f)
+            labels = header["labels"]
+            main_w, main_h = header["main_size"]
+            if not isinstance(labels, list) or not all(isinstance(n, (int, float)) for n in (main_w, main_h)):
+                raise ValueError("unexpected header contents")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Skipping detection log day, bad header {header_path}: {e}")
+            return None
+        return header
+
+    def query(self, start, end, label=None, bucket="day", grid=(32, 18), event_gap=10.0):
+        """
+        Aggregates detections between start and end (Unix times).
+
+        Returns counts of detections and of distinct visits (runs of the same
+        label with gaps shorter than event_gap seconds) per label and per time
+        bucket ("hour", "day" or "night", a night running noon to noon), plus a
+        grid heatmap of box centres.  Raises ValueError for an empty or too
+        long range or a grid outside 1 - MAX_GRID_SIDE cells a side.
+        """
+        grid_w, grid_h = grid
+        if not (0 < grid_w <= MAX_GRID_SIDE and 0 < grid_h <= MAX_GRID_SIDE):
+            raise ValueError(f"Grid must be 1 to {MAX_GRID_SIDE} cells a side")
+        if end <= start:
+            raise ValueError("End must be after start")
+        if bucket not in ("hour", "day", "night"):
+            raise ValueError(f"Unknown bucket {bucket}")
+        # Flush first so the most recent detections are included
+        self.flush()
+
+        # Buckets are aligned to local time, a night starts at midday
+        edges = bucket_edges(bucket, start, end)
+        n_buckets = len(edges) - 1
+
+        heatmap = np.zeros((grid_h, grid_w), dtype=np.int64)
+        detections = {}  # label => count
+        visits = {}      # label => count
+        bucket_detections = {}  # label => np array of counts per bucket
+        bucket_visits = {}
+        last_seen = {}   # label => timestamp of last detection, carries across chunks
+
+        with self.file_lock:
+            files = self.day_files(start, end)
+
+        for bin_path, header in files:
+            labels = header["labels"]
+            main_w, main_h = header["main_size"]
+            if not main_w or not main_h:
+                main_w, main_h = 1, 1
+            # Only map whole records, the flush thread may be appending
+            n_records = os.path.getsize(bin_path) // RECORD_DTYPE.itemsize
+            if n_records == 0:
+                continue
+            data = np.memmap(bin_path, dtype=RECORD_DTYPE, mode="r", shape=(n_records,))
+            for offset in range(0, len(data), QUERY_CHUNK_RECORDS):
+                chunk = data[offset:offset + QUERY_CHUNK_RECORDS]
+                mask = (chunk["timestamp"] >= start) & (chunk["timestamp"] < end)
+                if label is not None:
+                    if label not in labels:
+                        break
+                    mask &= chunk["category"] == labels.index(label)
+                chunk = chunk[mask]
+                if len(chunk) == 0:
+                    continue
+
+                # Heatmap of box centres
+                cx = (chunk["x"] + chunk["w"] / 2.0) * grid_w / main_w
+                cy = (chunk["y"] + chunk["h"] / 2.0) * grid_h / main_h
+                gx = np.clip(cx.astype(np.int64), 0, grid_w - 1)
+                gy = np.clip(cy.astype(np.int64), 0, grid_h - 1)
+                np.add.at(heatmap, (gy, gx), 1)
+
+                bucket_index = np.searchsorted(edges, chunk["timestamp"], side="right") - 1
+                for category in np.unique(chunk["category"]):
+                    name = labels[category] if category < len(labels) else str(category)
+                    in_cat = chunk["category"] == category
+                    ts = chunk["timestamp"][in_cat]
+                    buckets = bucket_index[in_cat]
+
+                    # A new visit starts whenever the gap since the previous detection is large
+                    previous = np.concatenate(([last_seen.get(name, -np.inf)], ts[:-1]))
+                    new_visit = (ts - previous) > event_gap
+                    last_seen[name] = ts[-1]
+
+                    if name not in bucket_detections:
+                        bucket_detections[name] = np.zeros(n_buckets, dtype=np.int64)
+                        bucket_visits[name] = np.zeros(n_buckets, dtype=np.int64)
+                    bucket_detections[name] += np.bincount(buckets, minlength=n_buckets)[:n_buckets]
+                    bucket_visits[name] += np.bincount(buckets[new_visit], minlength=n_buckets)[:n_buckets]
+                    detections[name] = detections.get(name, 0) + int(len(ts))
+                    visits[name] = visits.get(name, 0) + int(new_visit.sum())
+            del data
+
+        bucket_list = []
+        for i in range(n_buckets):
+            bucket_start = float(edges[i])
+            if edges[i + 1] <= start:
+                continue
+            counts = {name: {"detections": int(bucket_detections[name][i]), "visits": int(bucket_visits[name][i])}
+                      for name in bucket_detections if bucket_detections[name][i]}
+            bucket_list.append({
+                "start": bucket_start,
+                "start_str": time.strftime("%Y-%m-%d %H:%M", time.localtime(bucket_start)),
+                "counts": counts,
+            })
+
+        return {
+            "start": start,
+            "end": end,
+            "label": label,
+            "bucket": bucket,
+            "detections": detections,
+            "visits": visits,
+            "buckets": bucket_list,
+            "heatmap": {"grid": [grid_w, grid_h], "counts": heatmap.tolist()},
+        }
@@ -0,0 +1,65 @@
+# detection_postprocess.py
+"""
+Host-side post-processing of the IMX500 output tensors into detections.
+
+Shared by parse_detections() in main.py and model_benchmark.py, so the
+benchmark times exactly what runs for every camera frame.  Nothing here
+needs the camera: the outputs are the numpy arrays from imx500.get_outputs()
+(or a recording of them) and the boxes come back normalised to 0.0 - 1.0 of
+the network input, ready for imx500.convert_inference_coords().
+
+POSTPROCESS selects the decoder:
+    ""         the network does NMS on the chip, the outputs are the detections
+    "yolov8"   raw YOLOv8 head, decoded and NMS'd here by yolo_decode.py
+    "nanodet"  picamera2's NanoDet decoder
+"""
+
+import numpy as np
+
+from yolo_decode import YoloDecoder
+
+# Keeps its work buffers between frames
+yolo_decoder = YoloDecoder()
+# picamera2's NanoDet functions, imported on first use
+nanodet = None
+
+
+def nanodet_functions():
+    global nanodet
+    if nanodet is None:
+        from picamera2.devices.imx500 import postprocess_nanodet_detection
+        from picamera2.devices.imx500.postprocess import scale_boxes
+        nanodet = (postprocess_nanodet_detection, scale_boxes)
+    return nanodet
+
+
+def decode_outputs(np_outputs, input_size, postprocess, bbox_normalization, bbox_order,
+                   threshold, iou, max_detections, top_k=300):
+    """
+    Returns (boxes, scores, classes) of the detections scoring at least threshold.
+    np_outputs are the output tensors with the batch dimension, input_size is (width, height).
+    top_k is how many candidates the "yolov8" decoder keeps for NMS.
+    """
+    input_w, input_h = input_size
+
+    if postprocess == "yolov8":
+        return yolo_decoder.decode(np_outputs, input_size, threshold, iou, max_detections, top_k)
+    if postprocess == "nanodet":
+        postprocess_nanodet_detection, scale_boxes = nanodet_functions()
+        boxes, scores, classes = postprocess_nanodet_detection(
+            outputs=np_outputs[0],
+            conf=threshold,
+            iou_thres=iou,
+            max_out_dets=max_detections
+        )[0]
+        boxes = scale_boxes(boxes, 1, 1, input_h, input_w, False, False)
+    else:
+        boxes, scores, classes = np_outputs[0][0], np_outputs[1][0], np_outputs[2][0]
+        if bbox_normalization:
+            boxes = boxes / input_h
+        if bbox_order == "xy":
+            # Convert from (y0, x0, y1, x1) => (x0, y0, x1, y1)
+            boxes = boxes[:, [1, 0, 3, 2]]
+
+    keep = np.asarray(scores) >= threshold
+    return np.asarray(boxes)[keep], np.asarray(scores)[keep], np.asarray(classes)[keep]
@@ -0,0 +1,88 @@
+# detection_sidecar.py
+"""
+Writes a detection track next to each recording instead of burning the boxes
+into the video.
+
+The sidecar is a JSON lines file (capture_<timestamp>.tracks.jsonl).  The
+first line is a header with the main stream size and labels, then one line
+per frame:
+
+    {"t": 1.24, "pan": 3.5, "tilt": 20.0, "acquired": true,
+     "tracks": [{"label": "heron", "conf": 0.87, "box": [812, 301, 240, 410]}]}
+
+where t is seconds since the recording started and box is (x, y, w, h) in
+main stream pixels.  Frames are fed in from the event bus "sidecar"
+subscriber, so the JSON encoding and file writes never run in the camera
+callback.
+"""
+
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger("my_app_logger.sidecar")
+
+
+class SidecarWriter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.file = None
+        self.path = None
+        self.start_time = None
+        self.labels = []
+
+    def open(self, path, main_size, labels):
+        """
+        Starts a new sidecar file, called when a recording starts.
+        """
+        header = {
+            "version": 1,
+            "start_time": time.time(),
+            "main_size": list(main_size),
+            "labels": list(labels),
+        }
+        with self.lock:
+            self.path = path
+            self.start_time = header["start_time"]
+            self.labels = header["labels"]
+            self.file = open(path, "w")
+            self.file.write(json.dumps(header, separators=(",", ":")) + "\n")
+
+    def add_frame(self, timestamp, tracks, pan, tilt, acquired):
+        """
+        Appends one frame, tracks are TrackRecords (category, conf, box).
+        Frames arriving when no sidecar is open are ignored.
+        """
+        with self.lock:
+            if self.file is None or timestamp < self.start_time:
+                return
+            record = {
+                "t": round(timestamp - self.start_time, 3),
+                "pan": round(pan, 2),
+                "tilt": round(tilt, 2),
+                "acquired": acquired,
+                "tracks": [
+                    {
+                        "label": self.labels[int(t.category)],
+                        "conf": round(float(t.conf), 3),
+                        "box": [int(v) for v in t.box],
+                    }
+                    for t in tracks
+                ],
+            }
+            try:
+                self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            except Exception as e:
+                logger.error(f"Failed writing detection sidecar {self.path}: {e}")
+
+    def close(self):
+        """
+        Finishes the file and returns its path (None if nothing was open).
+        """
+        with self.lock:
+            if self.file is None:
+                return None
+            self.file.close()
+            self.file = None
+            return self.path
@@ -0,0 +1,133 @@
+# event_bus.py
+"""
+In-process publish/subscribe bus for per-frame detection and tracker events.
+
+The camera callback publishes one immutable FrameEvent per frame and carries
+on.  Each subscriber has its own bounded ring and its own thread, so a slow
+consumer (disk writes, logging, web clients) can only ever fall behind or drop
+its own events, never stall the callback.
+
+Drop policies when a subscriber's ring is full:
+    "drop_oldest" - discard the oldest queued event (keep the most recent history)
+    "drop_newest" - discard the event being published (keep what is queued)
+    "latest"      - only ever keep the newest event (ring of one)
+"""
+
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger("my_app_logger.event_bus")
+
+# One raw detection, box is (x, y, w, h) in main stream pixels, track_id is its site track id (0 without a site)
+DetectionRecord = namedtuple("DetectionRecord", ["category", "conf", "box", "track_id"], defaults=(0,))
+
+# One smoothed track (what is drawn on the preview), the fields of DetectionRecord without track_id
+TrackRecord = namedtuple("TrackRecord", ["category", "conf", "box"])
+
+FrameEvent = namedtuple("FrameEvent", [
+    "frame_id",     # Increments every frame
+    "timestamp",    # time.time() when the callback started
+    "detections",   # Tuple of DetectionRecord
+    "tracks",       # Tuple of TrackRecord
+    "acquired",     # TargetTracker state after this frame
+    "pan",          # Last completed turret pose
+    "tilt",
+    "recording",
+    "auto_mode",
+])
+
+POLICIES = ("drop_oldest", "drop_newest", "latest")
+
+
+class Subscription:
+    def __init__(self, name, handler, maxlen, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown drop policy {policy}")
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.ring = deque(maxlen=1 if policy == "latest" else maxlen)
+        self.condition = threading.Condition()
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"bus-{name}", daemon=True)
+
+    def offer(self, event):
+        with self.condition:
+            if len(self.ring) == self.ring.maxlen:
+                self.dropped += 1
+                if self.policy == "drop_newest":
+                    return
+                # drop_oldest / latest: the deque discards the oldest entry itself
+            self.ring.append(event)
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.ring and self.running:
+                    self.condition.wait()
+                if not self.running and not self.ring:
+                    return
+                event = self.ring.popleft()
+            try:
+                self.handler(event)
+                self.delivered += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Subscriber {self.name} failed handling frame {event.frame_id}: {e}")
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+    def stats(self):
+        return {
+            "policy": self.policy,
+            "queued": len(self.ring),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+class EventBus:
+    def __init__(self):
+        self.subscriptions = []
+        self.published = 0
+        self.last_publish = None
+
+    def subscribe(self, name, handler, maxlen=256, policy="drop_oldest"):
+        """
+        Runs handler(event) on its own thread for every published event.
+        """
+        subscription = Subscription(name, handler, maxlen, policy)
+        # Replace the whole list so publish() never sees it half updated
+        self.subscriptions = self.subscriptions + [subscription]
+        subscription.thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+        subscription.stop()
+
+    def publish(self, event):
+        """
+        Called from the camera callback, never blocks on a subscriber.
+        """
+        for subscription in self.subscriptions:
+            subscription.offer(event)
+        self.published += 1
+        self.last_publish = time.time()
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "subscribers": {s.name: s.stats() for s in self.subscriptions},
+        }
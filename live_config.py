@@ -0,0 +1,213 @@
+# live_config.py
+"""
+Configuration shared by main.py and pan_tilt_control.py.
+
+my_configuration.py is loaded once, with any overrides from config.json, and
+the settings that can change while running (tracking, smoothing, detection
+thresholds, servo pulses...) are copied into an immutable TuningSnapshot
+with the values the hot paths need already worked out.  A change from the
+configuration page builds and validates a complete new snapshot and swaps
+the reference, so code that took the snapshot at the start of a frame or a
+move always sees one consistent set of values.
+
+Everything else in my_configuration (camera, model, pins, directories...)
+is still only read at start up and needs a restart to change.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import NamedTuple
+
+import my_configuration as config
+
+logger = logging.getLogger("my_app_logger.live_config")
+
+JSON_PATH = "config.json"
+
+
+def load_configuration():
+    """
+    Loads configuration from my_configuration.py and optionally overrides
+    with values from config.json if it exists
+    """
+    print("Loading all configuration settings from my_configuration.py and config.json.")
+
+    if os.path.exists(JSON_PATH):
+        try:
+            with open(JSON_PATH, 'r') as f:
+                json_config = json.load(f)
+
+            for key, value in json_config.items():
+                if hasattr(config, key):
+                    original_value = getattr(config, key)
+                    if isinstance(original_value, tuple):
+                        value = tuple(value)  # Convert JSON array back to tuple
+                    setattr(config, key, value)
+                    print(f"Overriding {key} from JSON config with value: {value}")
+                else:
+                    print(f"Unknown configuration key in JSON: {key}")
+
+        except Exception as e:
+            print(f"Error loading JSON configuration: {e}")
+    else:
+        print("No JSON configuration file found, using default values from my_configuration.py")
+
+    return config
+
+
+class TuningSnapshot(NamedTuple):
+    # Tracking
+    pan_deg_per_pixel: float
+    tilt_deg_per_pixel: float
+    pan_invert: bool
+    tilt_invert: bool
+    dead_zone: int
+    home_pan: float
+    home_tilt: float
+    move_steps: int
+    move_step_delay: float
+    # Smoothing and detection
+    alpha: float
+    fade_frames: int
+    threshold: float
+    iou: float
+    max_detections: int
+    activation_detections: int
+    activation_time_window: float
+    no_detection_timeout: float
+    # Outputs
+    water_pistol_armed: bool
+    display_boxes_preview: bool
+    display_boxes_video: bool
+    # Servos
+    min_pulse: int
+    max_pulse: int
+    angle_range: int
+    # Derived
+    pan_scale: float         # Degrees per pixel of offset, sign includes PAN_INVERT
+    tilt_scale: float
+    center_pulse: int
+    pulse_per_degree: float
+
+
+# Settings that apply without a restart: name in my_configuration -> (type, minimum, maximum)
+LIVE_SETTINGS = {
+    "PAN_DEG_PER_PIXEL":      (float, 0.0, 1.0),
+    "TILT_DEG_PER_PIXEL":     (float, 0.0, 1.0),
+    "PAN_INVERT":             (bool, None, None),
+    "TILT_INVERT":            (bool, None, None),
+    "DEAD_ZONE":              (int, 0, 4000),
+    "HOME_PAN":               (float, -180.0, 180.0),
+    "HOME_TILT":              (float, -180.0, 180.0),
+    "MOVE_STEPS":             (int, 1, 100),
+    "MOVE_STEP_DELAY":        (float, 0.0, 1.0),
+    "ALPHA":                  (float, 0.0, 1.0),
+    "FADE_FRAMES":            (int, 0, 1000),
+    "THRESHOLD":              (float, 0.0, 1.0),
+    "IOU":                    (float, 0.0, 1.0),
+    "MAX_DETECTIONS":         (int, 1, 1000),
+    "ACTIVATION_DETECTIONS":  (int, 1, 10000),
+    "ACTIVATION_TIME_WINDOW": (float, 0.0, 600.0),
+    "NO_DETECTION_TIMEOUT":   (float, 0.0, 3600.0),
+    "WATER_PISTOL_ARMED":     (bool, None, None),
+    "DISPLAY_BOXES_PREVIEW":  (bool, None, None),
+    "DISPLAY_BOXES_VIDEO":    (bool, None, None),
+    "MIN_PULSE":              (int, 0, 4095),
+    "MAX_PULSE":              (int, 0, 4095),
+    "ANGLE_RANGE":            (int, 1, 180),
+}
+
+
+def check_value(name, value):
+    """
+    Returns value converted to the setting's type, raising ValueError if it is out of range.
+    """
+    kind, minimum, maximum = LIVE_SETTINGS[name]
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise ValueError(f"{name} must be True or False")
+    elif kind is int:
+        if isinstance(value, bool) or not float(value).is_integer():
+            raise ValueError(f"{name} must be a whole number")
+        value = int(value)
+    else:
+        value = float(value)
+    if minimum is not None and not (minimum <= value <= maximum):
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return value
+
+
+def build_snapshot(values):
+    """
+    Validates values (a dict of every LIVE_SETTINGS name) and works out the derived fields.
+    """
+    v = {name: check_value(name, values[name]) for name in LIVE_SETTINGS}
+    if v["MIN_PULSE"] >= v["MAX_PULSE"]:
+        raise ValueError("MIN_PULSE must be less than MAX_PULSE")
+    center_pulse = (v["MIN_PULSE"] + v["MAX_PULSE"]) // 2
+    return TuningSnapshot(
+        **{name.lower(): value for name, value in v.items()},
+        pan_scale=-v["PAN_DEG_PER_PIXEL"] if v["PAN_INVERT"] else v["PAN_DEG_PER_PIXEL"],
+        tilt_scale=-v["TILT_DEG_PER_PIXEL"] if v["TILT_INVERT"] else v["TILT_DEG_PER_PIXEL"],
+        center_pulse=center_pulse,
+        pulse_per_degree=(v["MAX_PULSE"] - center_pulse) / v["ANGLE_RANGE"],
+    )
+
+
+# Load configuration
+load_configuration()
+snapshot = build_snapshot({name: getattr(config, name) for name in LIVE_SETTINGS})
+update_lock = threading.Lock()
+listeners = []
+
+
+def current():
+    """
+    The current TuningSnapshot.  Take it once per frame or move and use that throughout.
+    """
+    return snapshot
+
+
+def subscribe(listener):
+    """
+    listener(snapshot) is called after every change, for state that keeps its own copy.
+    """
+    listeners.append(listener)
+
+
+def apply(updates):
+    """
+    Applies the live settings in updates straight away.  Raises ValueError (and changes
+    nothing) if any of them is invalid.  Returns (applied names, names needing a restart)
+    for the settings whose value actually changed.
+    """
+    global snapshot
+    with update_lock:
+        live = {name: getattr(config, name) for name in LIVE_SETTINGS}
+        applied = []
+        restart = []
+        for name, value in updates.items():
+            if value == getattr(config, name, None):
+                continue
+            if name in LIVE_SETTINGS:
+                live[name] = value
+                applied.append(name)
+            else:
+                restart.append(name)
+        if not applied:
+            return applied, restart
+
+        new_snapshot = build_snapshot(live)
+        for name in applied:
+            setattr(config, name, getattr(new_snapshot, name.lower()))
+        snapshot = new_snapshot
+
+    logger.info(f"Configuration applied live: {', '.join(applied)}")
+    for listener in listeners:
+        try:
+            listener(new_snapshot)
+        except Exception as e:
+            logger.error(f"Configuration listener failed: {e}")
+    return applied, restart
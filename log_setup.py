@@ -0,0 +1,207 @@
+# log_setup.py
+"""
+Logging that never makes the camera callback wait for a console, SD card or
+lock held by another thread.
+
+Every logger under "my_app_logger" hands its records to a bounded queue and
+returns; a QueueListener thread formats them and writes them to the console,
+the log file and the binary log.  When the queue is full (the SD card has
+stalled, or debug logging produces more than the writer can keep up with)
+new records are dropped and counted in turret_log_records_dropped_total
+instead of blocking the caller.
+
+Records are not formatted by the caller, so hot paths log with %-style
+arguments (logger.debug("box %s", box)) and the string is only built on the
+listener thread, if at all.  The arguments must not change after the call:
+pass numbers, strings and tuples, not arrays that are reused.
+
+Lines that could be written for every detection of every frame go through a
+LogSampler, which lets a few per second through and counts the rest.
+
+The optional binary log keeps every record in a compact length-prefixed
+form (time, level, logger, thread, message) for post-mortems of a turret in
+the field, and rotates to <file>.1 at a size limit.  Read it back with:
+
+    python log_setup.py turret_log.bin
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+import struct
+import sys
+import time
+
+from metrics import registry
+
+records_dropped_total = registry.counter("turret_log_records_dropped_total",
+                                         "Log records dropped because the log queue was full")
+
+# created (s), level, logger name length, thread name length, message length
+BINARY_RECORD = struct.Struct("<dBHHI")
+BINARY_MAGIC = b"TLOG1\n"
+
+
+class DropQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks and leaves the formatting to the listener thread.
+    """
+    def prepare(self, record):
+        # QueueHandler.prepare() formats the message here, on the caller's thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped_total.inc()
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener whose stop() waits for room in a full queue instead of raising queue.Full.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class LogSampler:
+    """
+    Token bucket for log lines that could be written every frame: lets through
+    per_second lines on average, in bursts of up to burst, and counts the rest.
+    Not thread safe, use one per thread.
+    """
+    def __init__(self, per_second, burst=None):
+        self.per_second = per_second
+        self.burst = burst if burst is not None else max(1.0, per_second)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.suppressed = 0
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.per_second)
+        self.last = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.suppressed += 1
+        return False
+
+    def take_suppressed(self):
+        """
+        Lines suppressed since the last call, for the next line that is let through.
+        """
+        suppressed, self.suppressed = self.suppressed, 0
+        return suppressed
+
+
+class BinaryLogHandler(logging.Handler):
+    """
+    Writes records in the compact binary form, rotating to <filename>.1 after max_bytes.
+    """
+    def __init__(self, filename, max_bytes=8 * 1024 * 1024):
+        super().__init__()
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.stream = None
+        self.open()
+
+    def open(self):
+        self.stream = open(self.filename, "ab")
+        if self.stream.tell() == 0:
+            self.stream.write(BINARY_MAGIC)
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+            if record.exc_info:
+                message = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+            name = record.name.encode("utf-8")[:0xFFFF]
+            thread = (record.threadName or "").encode("utf-8")[:0xFFFF]
+            text = message.encode("utf-8", "replace")
+            self.stream.write(BINARY_RECORD.pack(record.created, min(record.levelno, 255),
+                                                 len(name), len(thread), len(text)))
+            self.stream.write(name + thread + text)
+            self.stream.flush()
+            if self.stream.tell() >= self.max_bytes:
+                self.rotate()
+        except Exception:
+            self.handleError(record)
+
+    def rotate(self):
+        self.stream.close()
+        os.replace(self.filename, f"{self.filename}.1")
+        self.open()
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+        super().close()
+
+
+def read_binary_log(path):
+    """
+    Yields (created, levelno, logger name, thread name, message) from a binary log.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary turret log")
+        while True:
+            header = f.read(BINARY_RECORD.size)
+            if len(header) < BINARY_RECORD.size:
+                return
+            created, levelno, name_len, thread_len, text_len = BINARY_RECORD.unpack(header)
+            body = f.read(name_len + thread_len + text_len)
+            if len(body) < name_len + thread_len + text_len:
+                return   # Cut short by a power loss
+            name = body[:name_len].decode("utf-8", "replace")
+            thread = body[name_len:name_len + thread_len].decode("utf-8", "replace")
+            message = body[name_len + thread_len:].decode("utf-8", "replace")
+            yield created, levelno, name, thread, message
+
+
+def setup_logging(logger, level, formatter, log_file=None, binary_file=None,
+                  binary_max_bytes=8 * 1024 * 1024, queue_size=10000):
+    """
+    Sends logger's records through a bounded queue to the console, log_file and
+    binary_file handlers.  Returns the started QueueListener, stop() it at exit
+    to write out what is still queued.
+    """
+    handlers = []
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+    if log_file:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if binary_file:
+        handlers.append(BinaryLogHandler(binary_file, binary_max_bytes))
+    for handler in handlers:
+        handler.setLevel(level)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    logger.setLevel(level)
+    logger.addHandler(DropQueueHandler(log_queue))
+    registry.gauge("turret_log_queue_pending", "Log records waiting to be written", function=log_queue.qsize)
+
+    listener = DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(f"usage: {sys.argv[0]} <binary log file>")
+        sys.exit(1)
+    for created, levelno, name, thread, message in read_binary_log(sys.argv[1]):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+        print(f"{stamp}.{int(created % 1 * 1000):03d} [{logging.getLevelName(levelno)}] {name} ({thread}): {message}")
+
+
+if __name__ == "__main__":
+    main()
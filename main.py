@@ -5,7 +5,7 @@
 #  Import Required Packages
 # --------------------------------------------------------------------------------
 # import my_configuration as config
-from flask import Flask, render_template, Response, request, send_from_directory, jsonify
+from flask import Flask, Blueprint, render_template, Response, request, jsonify, g, abort
 import logging
 import sys
 import threading
@@ -13,87 +13,60 @@ import time
 from collections import deque
 import cv2
 import numpy as np
-import pan_tilt_control  # Must be your existing file: "pan_tilt_control.py"
-from functools import lru_cache
+import live_config
+from pan_tilt_control import PanTilt  # Must be your existing file: "pan_tilt_control.py"
 from picamera2 import MappedArray, Picamera2
 from picamera2.devices import IMX500
-from picamera2.devices.imx500 import (NetworkIntrinsics,
-                                      postprocess_nanodet_detection)
+from picamera2.devices.imx500 import NetworkIntrinsics
 from libcamera import Transform
 from gpiozero import LED  # So it works across all Pi types
 import os
 import subprocess
 import math
-import psutil
-import platform
-import importlib.metadata
 import json
-
-
-def load_configuration():
-   """
-   Loads configuration from my_configuration.py and optionally overrides
-   with values from config.json if it exists
-   """
-   import my_configuration as config
-   print("Loading all configuration settings from my_configuration.py and config.json.")
-
-   json_path = "config.json"
-   if os.path.exists(json_path):
-       try:
-           with open(json_path, 'r') as f:
-               json_config = json.load(f)
-
-           for key, value in json_config.items():
-               if hasattr(config, key):
-                   original_value = getattr(config, key)
-                   if isinstance(original_value, tuple):
-                       value = tuple(value)  # Convert JSON array back to tuple
-                   setattr(config, key, value)
-                   print(f"Overriding {key} from JSON config with value: {value}")
-               else:
-                   print(f"Unknown configuration key in JSON: {key}")
-
-       except Exception as e:
-           print(f"Error loading JSON configuration: {e}")
-   else:
-       print("No JSON configuration file found, using default values from my_configuration.py")
-
-   return config
-
-
-# Load configuration
-config = load_configuration()
+import atexit
+from recording_catalog import RecordingCatalog, make_entry
+from recording_previews import PreviewCollector
+from retention_manager import RetentionManager
+from detection_sidecar import SidecarWriter
+from detection_log import DetectionLog
+from detection_postprocess import decode_outputs
+from command_queue import CommandQueue
+from system_metrics import SystemSampler, installed_packages
+from status_stream import StatusBroadcaster, sse_events
+from event_bus import EventBus, FrameEvent, DetectionRecord, TrackRecord
+from video_serving import send_recording, send_immutable_file
+from metrics import registry, stream_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from shared_frames import SharedFrameRing
+from site_client import SiteClient, TrackIds
+import site_protocol
+from model_manager import ModelManager
+from startup import Startup
+from pipeline_context import build_context, STATUS_FONT_SCALE, STATUS_THICKNESS
+from pipeline_settings import load_pipeline_settings
+from performance_governor import PerformanceGovernor, load_profiles
+from log_setup import LogSampler, setup_logging
+from web_bridge import BridgeServer
+from zones import ZoneMap, load_zones, parse_zones, save_zones, IGNORE, NO_FIRE
+import web_process
+
+
+# Load configuration (my_configuration.py plus config.json), the live tunable settings are
+# read through live_config.current() so they can change without a restart
+config = live_config.config
 
 
 # --------------------------------------------------------------------------------
-#  TUNING PARAMETERS (FROM my_configuration.py)
+#  SETTINGS ONLY READ AT START UP (FROM my_configuration.py)
 # --------------------------------------------------------------------------------
-PAN_DEG_PER_PIXEL    = config.PAN_DEG_PER_PIXEL
-TILT_DEG_PER_PIXEL   = config.TILT_DEG_PER_PIXEL
-PAN_INVERT           = config.PAN_INVERT
-TILT_INVERT          = config.TILT_INVERT
-DEAD_ZONE            = config.DEAD_ZONE
-HOME_PAN             = config.HOME_PAN
-HOME_TILT            = config.HOME_TILT
-MOVE_STEPS           = config.MOVE_STEPS
-MOVE_STEP_DELAY      = config.MOVE_STEP_DELAY
 SHOW_PREVIEW         = config.SHOW_PREVIEW
 SAVE_DIRECTORY       = config.SAVE_DIRECTORY_NAME
 DELETE_CONVERTED_FILES = config.DELETE_CONVERTED_FILES
-ALPHA                = config.ALPHA
-FADE_FRAMES          = config.FADE_FRAMES
-DISPLAY_BOXES_VIDEO  = config.DISPLAY_BOXES_VIDEO
-DISPLAY_BOXES_PREVIEW = config.DISPLAY_BOXES_PREVIEW
-WATER_PISTOL_ARMED    = config.WATER_PISTOL_ARMED
-
-
-#Variable for smoothed boxes
-smoothed_boxes = {}  # { category_id: { "box": (x, y, w, h), "no_update_count": 0 } }
-
-
 
 
+# -----------------------------------------------------------------------------
+#  Smoothed boxes, one BoxSmoother per pipeline
+# -----------------------------------------------------------------------------
 def blend_boxes(old_box, new_box, alpha):
     """
     Weighted average of old_box and new_box coords.
@@ -108,90 +81,94 @@ def blend_boxes(old_box, new_box, alpha):
     h = int((1 - alpha) * ho + alpha * hn)
     return (x, y, w, h)
 
-def update_smoothed_detections(new_detections, alpha=0.5, fade_frames=3):
-    """
-    new_detections: list of real Detection objects => each has .category, .box, .conf
-    alpha: how strongly we blend new boxes (but we use the latest conf).
-    fade_frames: remove old boxes if they don't appear again after these frames.
-    """
-    global smoothed_boxes
+class BoxSmoother:
+    def __init__(self):
+        self.smoothed_boxes = {}  # { category_id: { "box": (x, y, w, h), "no_update_count": 0 } }
 
-    # Mark all existing boxes to increment no_update_count
-    for cat_id in smoothed_boxes:
-        smoothed_boxes[cat_id]["no_update_count"] += 1
+    def update(self, new_detections, alpha=0.5, fade_frames=3):
+        """
+        new_detections: list of real Detection objects => each has .category, .box, .conf
+        alpha: how strongly we blend new boxes (but we use the latest conf).
+        fade_frames: remove old boxes if they don't appear again after these frames.
+        """
+        smoothed_boxes = self.smoothed_boxes
 
-    for det in new_detections:
-        cat_id  = int(det.category)
-        new_box = det.box     # (x, y, w, h)
-        new_conf = det.conf   # real confidence from detection
+        # Mark all existing boxes to increment no_update_count
+        for cat_id in smoothed_boxes:
+            smoothed_boxes[cat_id]["no_update_count"] += 1
 
-        if cat_id in smoothed_boxes:
-            old_box  = smoothed_boxes[cat_id]["box"]
-            old_conf = smoothed_boxes[cat_id]["conf"]
+        for det in new_detections:
+            cat_id  = int(det.category)
+            new_box = det.box     # (x, y, w, h)
+            new_conf = det.conf   # real confidence from detection
 
-            # 1) Blend the bounding boxes
-            blended_box = blend_boxes(old_box, new_box, alpha)
-            smoothed_boxes[cat_id]["box"] = blended_box
+            if cat_id in smoothed_boxes:
+                old_box  = smoothed_boxes[cat_id]["box"]
+                old_conf = smoothed_boxes[cat_id]["conf"]
 
-            # 2) Use the NEW (latest) confidence directly
-            smoothed_boxes[cat_id]["conf"] = new_conf
+                # 1) Blend the bounding boxes
+                blended_box = blend_boxes(old_box, new_box, alpha)
+                smoothed_boxes[cat_id]["box"] = blended_box
 
-            smoothed_boxes[cat_id]["no_update_count"] = 0
-        else:
-            # Initialize with new detection’s box + conf
-            smoothed_boxes[cat_id] = {
-                "box":  new_box,
-                "conf": new_conf,
-                "no_update_count": 0
-            }
-
-    # Remove entries that didn't appear for fade_frames
-    to_remove = []
-    for cat_id, data in smoothed_boxes.items():
-        if data["no_update_count"] > fade_frames:
-            to_remove.append(cat_id)
-    for cat_id in to_remove:
-        del smoothed_boxes[cat_id]
-
-def get_smoothed_detections():
-    results = []
-    for cat_id, data in smoothed_boxes.items():
-        (x, y, w, h) = data["box"]
-        c = data["conf"]  # This is the latest confidence from update_smoothed_detections
-        results.append({
-            "category": cat_id,
-            "conf": c,
-            "box": (x, y, w, h)
-        })
-    return results
+                # 2) Use the NEW (latest) confidence directly
+                smoothed_boxes[cat_id]["conf"] = new_conf
+
+                smoothed_boxes[cat_id]["no_update_count"] = 0
+            else:
+                # Initialize with new detection’s box + conf
+                smoothed_boxes[cat_id] = {
+                    "box":  new_box,
+                    "conf": new_conf,
+                    "no_update_count": 0
+                }
+
+        # Remove entries that didn't appear for fade_frames
+        to_remove = []
+        for cat_id, data in smoothed_boxes.items():
+            if data["no_update_count"] > fade_frames:
+                to_remove.append(cat_id)
+        for cat_id in to_remove:
+            del smoothed_boxes[cat_id]
+
+    def detections(self):
+        results = []
+        for cat_id, data in self.smoothed_boxes.items():
+            (x, y, w, h) = data["box"]
+            c = data["conf"]  # This is the latest confidence from update()
+            results.append({
+                "category": cat_id,
+                "conf": c,
+                "box": (x, y, w, h)
+            })
+        return results
+
+    def reset(self):
+        self.smoothed_boxes = {}
 
 # -----------------------------------------------------------------------------
 #  LOGGING SETUP
 # -----------------------------------------------------------------------------
 logger = logging.getLogger("my_app_logger")
 numeric_level = getattr(logging, config.LOG_LEVEL.upper(), logging.INFO)
-logger.setLevel(numeric_level)
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(numeric_level)
 
 formatter = logging.Formatter(
     fmt="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S"
 )
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
-
-# If we also want to log to a file
-if config.LOG_FILE:
-    file_handler = logging.FileHandler(config.LOG_FILE)
-    file_handler.setLevel(numeric_level)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
-# Added for manual control and settings
-auto_mode = True  # starts in auto mode
-manual_home_pan = HOME_PAN
-manual_home_tilt = HOME_TILT
+def start_logging():
+    """
+    Records are queued and written by a listener thread, so logging never blocks the camera callback.
+    Only called from __main__: the log files belong to the camera process alone.
+    """
+    log_listener = setup_logging(
+        logger, numeric_level, formatter,
+        log_file=config.LOG_FILE,
+        binary_file=config.LOG_BINARY_FILE,
+        binary_max_bytes=config.LOG_BINARY_MAX_MB * 1024 * 1024,
+        queue_size=config.LOG_QUEUE_SIZE,
+    )
+    atexit.register(log_listener.stop)
 
 # -----------------------------------------------------------------------------
 #  Auto detection of Platform
@@ -212,72 +189,218 @@ def detect_platform():
 
     config.RASPBERRY_PI_ZERO_2W = ("Raspberry Pi Zero 2 W" in model_str)
 
-detect_platform()
-if config.RASPBERRY_PI_ZERO_2W:
-    logger.info("This is a Raspberry Pi Zero 2 W, enabling Pi Zero optimizations...")
-else:
-    logger.info("Not a Pi Zero 2 W, using normal behavior.")
+    if config.RASPBERRY_PI_ZERO_2W:
+        logger.info("This is a Raspberry Pi Zero 2 W, enabling Pi Zero optimizations...")
+    else:
+        logger.info("Not a Pi Zero 2 W, using normal behavior.")
 
 # -----------------------------------------------------------------------------
 #  Web Server: Flask App
 # -----------------------------------------------------------------------------
 app = Flask(__name__)
-latest_frame = None  # We'll store the latest "lores" frame (annotated) for MJPEG streaming
+# Lets a front end web server send the recordings itself (zero-copy) instead of Python
+app.config["USE_X_SENDFILE"] = config.USE_X_SENDFILE
+velocity_controller = None  # Joystick control of the default pipeline, only used by the async web tier
+startup = Startup()   # Start up phases, see the end of this file
+
+@app.before_request
+def wait_for_startup():
+    # The web server is started alongside the camera, everything else waits until start up is done
+    if not startup.ready.is_set() and request.endpoint != "static":
+        return jsonify({"status": "starting", "message": "Starting up"}), 503, {"Retry-After": "1"}
+
+# Limits how many recordings are downloaded at once so they cannot starve the MJPEG stream
+video_download_slots = threading.BoundedSemaphore(config.MAX_CONCURRENT_VIDEO_DOWNLOADS)
 
 # -----------------------------------------------------------------------------
-#  Global Flags to Defer Recording Start/Stop
+#  Pipelines, one TurretPipeline per camera/turret (see PIPELINES in my_configuration.py).
+#  Each has its own camera callback, command queue and event bus, the web tier,
+#  recordings, retention and system sampler below are shared.
 # -----------------------------------------------------------------------------
-recording_requested = False
-recording_stop_requested = False
+pipelines = {}   # name -> TurretPipeline, in PIPELINES order, created before start up
+
+def default_pipeline():
+    # The first pipeline answers the plain routes (/move, /status...)
+    return next(iter(pipelines.values()))
+
+recording_catalog = None  # Created at startup
+retention_manager = None  # Created at startup if RETENTION_ENABLED
+system_sampler = SystemSampler(config.SYSTEM_SAMPLE_INTERVAL, config.SYSTEM_HISTORY_SAMPLES)
+governor = None  # PerformanceGovernor, created before start up, its profile is used even when it is not running
+
+# Optional work of the camera callback, shed in this order when it runs over its frame budget.
+# Parsing, tracking and aiming are never shed.
+SHED_STAGES = ("main_overlay", "lores_overlay", "preview", "debug_log")
 
 # -----------------------------------------------------------------------------
-#  System Info Utilities
+#  Prometheus metrics (/metrics), updated from the hot paths, see metrics.py
 # -----------------------------------------------------------------------------
-def get_cpu_temperature():
-    temp_path = "/sys/class/thermal/thermal_zone0/temp"
-    if os.path.exists(temp_path):
-        try:
-            with open(temp_path, "r") as f:
-                millideg = f.read().strip()
-                return float(millideg) / 1000.0
-        except Exception:
-            pass
-    return None
-
-def get_platform_name():
-    model_path = "/proc/device-tree/model"
-    if os.path.exists(model_path):
-        try:
-            with open(model_path, "r") as f:
-                return f.read().strip()
-        except Exception:
-            pass
-    return platform.platform()
+class PipelineMetrics:
+    """
+    The metrics of one pipeline, labelled with its name.
+    """
+    def __init__(self, turret):
+        labels = {"pipeline": turret.name}
+        self.frames_total = registry.counter("turret_camera_frames_total", "Frames handled by the camera callback", labels=labels)
+        self.dropped_frames_total = registry.counter("turret_camera_dropped_frames_total", "Frames missing from the sensor timestamps", labels=labels)
+        self.late_frames_total = registry.counter("turret_callback_late_frames_total", "Callbacks that took longer than a frame interval", labels=labels)
+        self.camera_fps = registry.gauge("turret_camera_fps", "Frame rate measured from the sensor timestamps", labels=labels)
+        self.callback_seconds = registry.histogram("turret_callback_duration_seconds", "Time spent in the camera callback", labels=labels)
+        self.inference_results_total = registry.counter("turret_inference_results_total", "Frames that carried IMX500 inference output", labels=labels)
+        self.detections_total = registry.counter("turret_detections_total", "Detections above the threshold", labels=labels)
+        self.tracks_gauge = registry.gauge("turret_tracks", "Smoothed tracks in the last frame", labels=labels)
+        self.target_acquired_gauge = registry.gauge("turret_target_acquired", "1 while the target tracker has a target", labels=labels)
+        self.water_pistol_seconds_total = registry.counter("turret_water_pistol_on_seconds_total", "Time the water pistol relay was on", labels=labels)
+        self.water_pistol_activations_total = registry.counter("turret_water_pistol_activations_total", "Times the water pistol was started", labels=labels)
+        self.recordings_total = registry.counter("turret_recordings_total", "Recordings finished and added to the catalog", labels=labels)
+        self.recording_bytes_total = registry.counter("turret_recording_bytes_total", "Bytes of finished MP4 recordings", labels=labels)
+        self.idle_entries_total = registry.counter("turret_idle_entries_total", "Times the pipeline went idle", labels=labels)
+        self.idle_seconds_total = registry.counter("turret_idle_seconds_total", "Time spent idle at the low frame rate", labels=labels)
+        self.servos_released_seconds_total = registry.counter("turret_servos_released_seconds_total",
+                                                              "Time the servos spent without PWM pulses", labels=labels)
+        self.preview_skipped_total = registry.counter("turret_preview_skipped_total",
+                                                      "Preview frames not converted because nobody was watching", labels=labels)
+        self.wake_seconds = registry.histogram("turret_idle_wake_seconds", "Time from the waking detection to the first frame at the full rate",
+                                               buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0), labels=labels)
+        registry.gauge("turret_idle", "1 while idle",
+                       function=lambda: int(turret.idle), labels=labels)
+        self.shed_total = {
+            stage: registry.counter("turret_callback_shed_total", "Optional callback work skipped to stay within the frame budget",
+                                    labels={**labels, "stage": stage})
+            for stage in SHED_STAGES
+        }
+        registry.gauge("turret_callback_shed_level", "Number of SHED_STAGES being shed",
+                       function=lambda: turret.shed_level, labels=labels)
+        registry.gauge("turret_recording", "1 while recording",
+                       function=lambda: int(turret.recording_manager.recording), labels=labels)
+        registry.gauge("turret_auto_mode", "1 in AUTO mode, 0 in MANUAL",
+                       function=lambda: int(turret.auto_mode), labels=labels)
+        registry.gauge("turret_water_pistol_active", "1 while the water pistol is firing",
+                       function=lambda: int(turret.water_pistol.active), labels=labels)
+        registry.gauge("turret_command_queue_pending", "Commands waiting for the controller thread",
+                       function=lambda: turret.command_queue.stats()["pending"], labels=labels)
+        registry.gauge("turret_event_bus_dropped", "Frame events dropped by slow subscribers",
+                       function=lambda: sum(s["dropped"] for s in turret.event_bus.stats()["subscribers"].values()),
+                       labels=labels)
 
 # -----------------------------------------------------------------------------
 #  Start Flask in a separate thread
 # -----------------------------------------------------------------------------
 def start_web_server():
-    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
+    app.run(host="0.0.0.0", port=config.WEB_SERVER_PORT, debug=False, threaded=True)
+
+def start_async_web_server():
+    """
+    Serves the async tier (async_web.py) with the Flask app mounted underneath it.  Its video
+    feed and WebSocket are the default pipeline's, the others are served by the Flask routes.
+    """
+    import async_web  # optional dependencies, only needed for WEB_TIER = "async"
+    turret = default_pipeline()
+    asgi_app = async_web.create_app(
+        app,
+        get_status=turret.status_data,
+        get_frame=lambda: turret.latest_frame,
+        start_move=turret.start_move,
+        handle_control=handle_ws_control,
+        fps=config.FPS,
+        add_viewer=turret.add_viewer,
+        is_ready=startup.ready.is_set
+    )
+    async_web.run(asgi_app, host="0.0.0.0", port=config.WEB_SERVER_PORT)
 
-def gen_frames():
+def start_web_process():
     """
-    Generator for MJPEG streaming from 'latest_frame'.
+    Starts the web tier in a separate process.  Preview frames go through a shared memory
+    ring per pipeline, all other requests are forwarded back to this process over the web bridge.
     """
-    global latest_frame
-    while True:
-        if latest_frame is not None:
-            ret, buffer = cv2.imencode('.jpg', latest_frame)
+    rings = {}
+    for turret in pipelines.values():
+        lores_w, lores_h = turret.context.lores_size
+        turret.frame_ring = SharedFrameRing(shape=(lores_h, lores_w, 3), slots=4, create=True)
+        atexit.register(turret.frame_ring.close)
+        rings[turret.name] = turret.frame_ring.describe()
+
+    bridge_address = f"/tmp/ai_object_web_{os.getpid()}.sock"
+    authkey = os.urandom(16)
+    def status_wait(message):
+        turret = pipelines.get(message.get("pipeline")) or default_pipeline()
+        version, snapshot = turret.status_broadcaster.wait_for_change(message["version"], message["timeout"])
+        return {"version": version, "snapshot": snapshot}
+    def performance(message):
+        return governor.profile._asdict()
+    BridgeServer(bridge_address, authkey, app,
+                 handlers={"status_wait": status_wait, "performance": performance}).start()
+
+    settings = {
+        "host": "0.0.0.0",
+        "port": config.WEB_SERVER_PORT,
+        "log_level": config.LOG_LEVEL,
+        "fps": config.FPS,
+        "save_directory": SAVE_DIRECTORY,
+        "max_concurrent_downloads": config.MAX_CONCURRENT_VIDEO_DOWNLOADS,
+        "download_wait": config.VIDEO_DOWNLOAD_WAIT,
+        "download_rate_kbps": config.VIDEO_DOWNLOAD_RATE_LIMIT_KBPS,
+        "video_cache_max_age": config.VIDEO_CACHE_MAX_AGE,
+        "thumbnail_cache_max_age": config.THUMBNAIL_CACHE_MAX_AGE,
+        "use_x_sendfile": config.USE_X_SENDFILE,
+        "status_heartbeat": config.STATUS_STREAM_HEARTBEAT,
+        "status_min_interval": config.STATUS_STREAM_MIN_INTERVAL,
+        "pipelines": list(pipelines),
+    }
+    # Its own script rather than a multiprocessing child, which would import this module again
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(web_process.__file__)],
+        stdin=subprocess.PIPE,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    launch = {"settings": settings, "rings": rings, "bridge_address": bridge_address, "authkey": authkey.hex()}
+    # stdin stays open, the web process exits when it closes
+    process.stdin.write((json.dumps(launch) + "\n").encode())
+    process.stdin.flush()
+    atexit.register(stop_web_process, process, bridge_address)
+    logger.info(f"Web server running in separate process {process.pid}")
+
+def stop_web_process(process, bridge_address):
+    process.stdin.close()
+    try:
+        process.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        process.terminate()
+    if os.path.exists(bridge_address):
+        os.unlink(bridge_address)
+
+def gen_frames(turret):
+    """
+    Generator for MJPEG streaming from the pipeline's 'latest_frame', each frame is sent once.
+    """
+    encode_seconds, stream_clients = stream_metrics()
+    stream_clients.inc()
+    turret.add_viewer(1)
+    last_frame = None
+    frame_wait = 1.0 / (2 * config.FPS)
+    try:
+        while True:
+            latest_frame = turret.latest_frame
+            if latest_frame is None or latest_frame is last_frame:
+                # The callback replaces latest_frame with a new array for every preview frame
+                time.sleep(frame_wait)
+                continue
+            last_frame = latest_frame
+            encode_start = time.perf_counter()
+            ret, buffer = cv2.imencode('.jpg', latest_frame, [cv2.IMWRITE_JPEG_QUALITY, governor.profile.jpeg_quality])
+            encode_seconds.observe(time.perf_counter() - encode_start)
             if not ret:
                 continue
             frame_bytes = buffer.tobytes()
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        else:
-            time.sleep(0.05)
+    finally:
+        # Runs when the client disconnects and the server closes the generator
+        turret.add_viewer(-1)
+        stream_clients.dec()
 
 # -----------------------------------------------------------------------------
-#  Flask Routes
+#  Flask Routes shared by all pipelines
 # -----------------------------------------------------------------------------
 
 @app.route("/configuration", methods=['GET', 'POST'])
@@ -303,13 +426,28 @@ def configuration():
                 logger.warning(f"Skipping invalid configuration value for {key}")
                 continue
 
+        # Tuning settings take effect straight away, anything else needs a restart
+        try:
+            applied, restart_required = live_config.apply(config_updates)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
         # Save to config.json
         try:
-            with open('config.json', 'w') as f:
+            with open(live_config.JSON_PATH, 'w') as f:
                 json.dump(config_updates, f, indent=4)
-            logger.info("Configuration saved. Restart required for changes to take effect.")
-            return jsonify(
-                {"status": "success", "message": "Configuration saved. Restart required for changes to take effect."})
+            message = "Configuration saved."
+            if applied:
+                message += f" Applied now: {', '.join(applied)}."
+            if restart_required:
+                message += f" Restart required for: {', '.join(restart_required)}."
+            logger.info(message)
+            return jsonify({
+                "status": "success",
+                "message": message,
+                "applied": applied,
+                "restart_required": restart_required
+            })
         except Exception as e:
             logger.error(f"Error saving configuration: {e}")
             return jsonify({"status": "error", "message": str(e)}), 500
@@ -324,134 +462,83 @@ def configuration():
                 config_items.append({
                     'name': key,
                     'value': str(value) if isinstance(value, tuple) else value,
-                    'type': 'tuple' if isinstance(value, tuple) else type(value).__name__
+                    'type': 'tuple' if isinstance(value, tuple) else type(value).__name__,
+                    'live': key in live_config.LIVE_SETTINGS
                 })
 
     return render_template('configuration.html', config_items=config_items)
 
-
-@app.route("/manual_recording")
-def manual_recording():
-    global auto_mode, recording_requested, recording_stop_requested
-    if auto_mode:
-        return "Cannot record manually while in AUTO mode", 400
-
-    action = request.args.get("action", None)
-    if not action:
-        return "No action specified", 400
-
-    if action == "start":
-        if not recording_manager.recording:
-            # Instead of direct start, we can still do the same "recording_requested" approach:
-            recording_requested = True
-            return "Recording start requested."
-        else:
-            return "Already recording.", 200
-
-    elif action == "stop":
-        if recording_manager.recording:
-            # Instead of direct stop, set the flag:
-            recording_stop_requested = True
-            return "Recording stop requested."
-        else:
-            return "Was not recording.", 200
-
-    else:
-        return f"Unknown action: {action}", 400
-
 @app.route("/system_info")
 def system_info():
-    temperature = get_cpu_temperature()
-    cpu_usage = psutil.cpu_percent(interval=0.1)
-    mem = psutil.virtual_memory()
-    mem_total_mb = mem.total / (1024 * 1024)
-    mem_used_mb = mem.used / (1024 * 1024)
-    mem_free_mb = mem.available / (1024 * 1024)
-    swap = psutil.swap_memory()
-    swap_total_mb = swap.total / (1024 * 1024)
-    swap_used_mb  = swap.used / (1024 * 1024)
-    disk = psutil.disk_usage('/')
-    disk_total_mb = disk.total / (1024 * 1024)
-    disk_used_mb  = disk.used / (1024 * 1024)
-    disk_free_mb  = disk.free / (1024 * 1024)
-    platform_name = get_platform_name()
-    os_version = platform.platform()
-    python_version = platform.python_version()
-
-    data = {
-        "temperature": temperature,
-        "cpu_usage": cpu_usage,
-        "memory": {
-            "total_mb": round(mem_total_mb, 2),
-            "used_mb":  round(mem_used_mb,  2),
-            "free_mb":  round(mem_free_mb,  2),
-        },
-        "swap": {
-            "total_mb": round(swap_total_mb, 2),
-            "used_mb":  round(swap_used_mb,  2),
-        },
-        "disk": {
-            "total_mb": round(disk_total_mb, 2),
-            "used_mb":  round(disk_used_mb,  2),
-            "free_mb":  round(disk_free_mb, 2),
-        },
-        "platform_name": platform_name,
-        "os_version": os_version,
-        "python_version": python_version,
-    }
+    # Everything here comes from the background sampler, nothing is measured in the request
+    data = system_sampler.latest()
+    data.update({
+        "disk_pressure": retention_manager.status() if retention_manager else None,
+        "startup": startup.report(),
+        "performance": governor.status(),
+        "pipelines": {name: turret.system_info() for name, turret in pipelines.items()},
+    })
     return jsonify(data)
 
+@app.route("/system_info/history")
+def system_info_history():
+    seconds = request.args.get("seconds", None, type=float)
+    return jsonify(system_sampler.history(seconds))
+
 @app.route("/packages")
 def list_packages():
-    distributions = importlib.metadata.distributions()
-    installed = {}
-    for dist in distributions:
-        name = dist.metadata["Name"]
-        version = dist.metadata["Version"]
-        installed[name] = version
-    sorted_installed = dict(sorted(installed.items(), key=lambda x: x[0].lower()))
-    return jsonify(sorted_installed)
+    return jsonify(installed_packages())
+
+@app.route("/pipelines")
+def list_pipelines():
+    return jsonify([
+        {
+            "name": turret.name,
+            "url": f"/pipeline/{turret.name}/",
+            "camera_id": turret.settings.camera_id,
+            "model": turret.model_manager.current if turret.model_manager else None,
+            "status": turret.status_data(),
+        }
+        for turret in pipelines.values()
+    ])
 
 @app.route("/system")
 def system_page():
     return render_template("system.html")
 
-@app.route("/status")
-def status():
-    current_pan, current_tilt = pan_tilt_control.get_current_angles()
-    data = {
-        "auto_mode": auto_mode,
-        "is_recording": recording_manager.recording,
-        "water_pistol_active": water_pistol.active,
-        "current_pan_angle": current_pan,
-        "current_tilt_angle": current_tilt,
-    }
-    return jsonify(data)
+@app.route("/performance")
+def performance_status():
+    # Current profile, the signals it was picked from and the recent transitions
+    return jsonify({"enabled": config.PERFORMANCE_GOVERNOR_ENABLED, **governor.status()})
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(registry.render(), mimetype=METRICS_CONTENT_TYPE)
 
 @app.route("/recordings")
 def show_recordings():
     page = request.args.get("page", 1, type=int)
     page_size = 5
 
-    all_files = [
-        f for f in os.listdir(SAVE_DIRECTORY)
-        if f.lower().endswith(".mp4")
-    ]
-    all_files.sort(key=lambda x: os.path.getmtime(os.path.join(SAVE_DIRECTORY, x)), reverse=True)
-    all_file_info = []
-    for f in all_files:
-        file_path = os.path.join(SAVE_DIRECTORY, f)
-        mtime = os.path.getmtime(file_path)
-        datetime_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mtime))
-        all_file_info.append({
-            "filename": f,
-            "datetime_str": datetime_str
-        })
-    total_files = len(all_file_info)
+    # The catalog is already sorted newest first, no need to touch the directory
+    all_entries = recording_catalog.list_entries()
+    total_files = len(all_entries)
     total_pages = math.ceil(total_files / page_size)
     start_idx = (page - 1) * page_size
     end_idx = start_idx + page_size
-    page_files = all_file_info[start_idx:end_idx]
+
+    page_files = []
+    for entry in all_entries[start_idx:end_idx]:
+        page_files.append({
+            "filename": entry["video"],
+            "datetime_str": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["start_time"])),
+            "poster": entry.get("poster"),
+            "sprite": entry.get("sprite"),
+            "sprite_frames": entry.get("sprite_frames", 0),
+            "labels": entry.get("labels", []),
+            "max_conf": entry.get("max_conf"),
+            "tracks": entry.get("tracks"),
+        })
 
     return render_template("recordings.html",
                            files=page_files,
@@ -460,7 +547,27 @@ def show_recordings():
 
 @app.route("/video/<path:filename>")
 def serve_video(filename):
-    return send_from_directory(SAVE_DIRECTORY, filename)
+    return send_recording(
+        SAVE_DIRECTORY, filename, video_download_slots,
+        finalised=lambda f: recording_catalog.find_by_filename(f) is not None,
+        wait=config.VIDEO_DOWNLOAD_WAIT,
+        rate_kbps=config.VIDEO_DOWNLOAD_RATE_LIMIT_KBPS,
+        cache_max_age=config.VIDEO_CACHE_MAX_AGE,
+        use_x_sendfile=config.USE_X_SENDFILE
+    )
+
+@app.route("/thumbnail/<path:filename>")
+def serve_thumbnail(filename):
+    return send_immutable_file(SAVE_DIRECTORY, filename, ("_poster.jpg", "_sprite.jpg"),
+                               config.THUMBNAIL_CACHE_MAX_AGE)
+
+@app.route("/tracks/<path:filename>")
+def serve_tracks(filename):
+    """
+    Detection sidecar for a recording, used to draw the boxes over the video when playing it.
+    """
+    return send_immutable_file(SAVE_DIRECTORY, filename, (".tracks.jsonl",),
+                               config.THUMBNAIL_CACHE_MAX_AGE, mimetype="application/x-ndjson")
 
 @app.route("/delete_recording", methods=["POST"])
 def delete_recording():
@@ -470,94 +577,229 @@ def delete_recording():
 
     filename = data["filename"]
     file_path = os.path.join(SAVE_DIRECTORY, filename)
+    entry = recording_catalog.find_by_filename(filename)
 
-    if not os.path.exists(file_path):
+    if entry is None and not os.path.exists(file_path):
         return jsonify({"status": "error", "message": "File not found"}), 404
 
     try:
-        os.remove(file_path)
+        if entry is not None:
+            # Removes the video along with its poster, sprite and catalog entry
+            recording_catalog.remove(entry["name"])
+        else:
+            os.remove(file_path)
         return jsonify({"status": "ok"})
     except Exception as e:
         logger.error(f"Error deleting file {filename}: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-@app.route("/set_mode")
+def handle_ws_control(message):
+    """
+    Control messages from the WebSocket of the async web tier, for the default pipeline.
+    The other controls (mode, recording, water pistol...) use the normal HTTP routes.
+    """
+    turret = default_pipeline()
+    kind = message.get("type")
+    if kind == "velocity":
+        pan, tilt = float(message.get("pan", 0)), float(message.get("tilt", 0))
+        if turret.auto_mode:
+            if pan or tilt:
+                return {"type": "error", "message": "Cannot move while in AUTO mode"}
+            return None
+        velocity_controller.set_velocity(pan, tilt)
+        return None
+    if kind == "move":
+        text, status = turret.start_move(message.get("direction"))
+        return {"type": "move", "status": status, "message": text}
+    return {"type": "error", "message": f"Unknown message type: {kind}"}
+
+# -----------------------------------------------------------------------------
+#  Flask Routes of one pipeline, at /... for the default pipeline and at
+#  /pipeline/<name>/... for every pipeline
+# -----------------------------------------------------------------------------
+turret_routes = Blueprint("turret", __name__)
+
+@turret_routes.url_value_preprocessor
+def select_pipeline(endpoint, values):
+    name = values.pop("pipeline", None) if values else None
+    turret = default_pipeline() if name is None else pipelines.get(name)
+    if turret is None:
+        abort(404)
+    g.turret = turret
+    # Prefix for the links of the pages rendered for this pipeline
+    g.base = "" if name is None else f"/pipeline/{name}"
+
+@turret_routes.route("/manual_recording")
+def manual_recording():
+    turret = g.turret
+    if turret.auto_mode:
+        return "Cannot record manually while in AUTO mode", 400
+
+    action = request.args.get("action", None)
+    if not action:
+        return "No action specified", 400
+
+    if action == "start":
+        if not turret.recording_manager.recording:
+            # Instead of direct start, queue it for the controller thread
+            turret.command_queue.put("start_recording")
+            return "Recording start requested."
+        else:
+            return "Already recording.", 200
+
+    elif action == "stop":
+        if turret.recording_manager.recording:
+            # Instead of direct stop, queue it for the controller thread
+            turret.command_queue.put("stop_recording")
+            return "Recording stop requested."
+        else:
+            return "Was not recording.", 200
+
+    else:
+        return f"Unknown action: {action}", 400
+
+@turret_routes.route("/detections/summary")
+def detections_summary():
+    """
+    Aggregated detection counts, e.g. /detections/summary?start=2025-01-01&end=2025-02-01&label=fox&bucket=night
+    start/end are dates (YYYY-MM-DD, end exclusive) and default to the last 7 days.
+    bucket is hour, day or night (noon to noon).  grid sets the heatmap size, e.g. 32x18.
+    """
+    detection_log = g.turret.detection_log
+    if detection_log is None:
+        return jsonify({"status": "error", "message": "Detection log is disabled"}), 404
+
+    try:
+        now = time.time()
+        start_arg = request.args.get("start")
+        end_arg = request.args.get("end")
+        start = time.mktime(time.strptime(start_arg, "%Y-%m-%d")) if start_arg else now - 7 * 86400
+        end = time.mktime(time.strptime(end_arg, "%Y-%m-%d")) if end_arg else now
+        bucket = request.args.get("bucket", "day")
+        if bucket not in ("hour", "day", "night"):
+            raise ValueError(f"Unknown bucket {bucket}")
+        grid_w, grid_h = map(int, request.args.get("grid", "32x18").lower().split("x"))
+        # Checks the range and grid before it allocates anything
+        summary = detection_log.query(
+            start, end,
+            label=request.args.get("label"),
+            bucket=bucket,
+            grid=(grid_w, grid_h),
+            event_gap=config.DETECTION_LOG_VISIT_GAP
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify(summary)
+
+@turret_routes.route("/zones")
+def zones_page():
+    return render_template("zones.html", base=g.base)
+
+@turret_routes.route("/zones/data", methods=["GET", "POST"])
+def zones_data():
+    turret = g.turret
+    if request.method == "POST":
+        try:
+            new_zones = parse_zones(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        save_zones(turret.settings.zones_file, new_zones)
+        # Rebuilding the context must not race a reconfigure or model switch, so the controller thread does it
+        turret.command_queue.put("update_zones", zones=new_zones)
+        zone_list = new_zones
+    else:
+        zone_list = turret.zone_list
+    return jsonify({
+        "zones": [{"name": z.name, "kind": z.kind, "points": [list(p) for p in z.points]} for z in zone_list],
+        "test_point": config.ZONE_TEST_POINT,
+    })
+
+@turret_routes.route("/models")
+def models_status():
+    return jsonify(g.turret.model_manager.status())
+
+@turret_routes.route("/models/switch", methods=["POST"])
+def switch_model():
+    turret = g.turret
+    data = request.get_json(silent=True) or request.form
+    name = data.get("model")
+    try:
+        turret.model_manager.resolve(name)
+    except KeyError:
+        return jsonify({"status": "error", "message": f"Unknown model: {name}"}), 404
+    if turret.recording_manager.recording:
+        return jsonify({"status": "error", "message": "Cannot switch model while recording"}), 409
+    # The switch stops the camera, so it runs on the controller thread
+    turret.command_queue.put("switch_model", name=name, reason="web")
+    return jsonify({"status": "ok", "message": f"Switching to {name}"}), 202
+
+@turret_routes.route("/status")
+def status():
+    return jsonify(g.turret.status_data())
+
+@turret_routes.route("/status/stream")
+def status_stream():
+    """
+    Server-Sent Events: the full status once, then only the values that change.
+    """
+    response = Response(
+        sse_events(g.turret.status_broadcaster.wait_for_change,
+                   heartbeat=config.STATUS_STREAM_HEARTBEAT,
+                   min_interval=config.STATUS_STREAM_MIN_INTERVAL),
+        mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop a reverse proxy from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@turret_routes.route("/set_mode")
 def set_mode():
-    global auto_mode
     mode = request.args.get("mode", "auto")
-    if mode.lower() == "auto":
-        water_pistol.stop()
-        target_tracker.reset()
-        pan_tilt_control.move_to(HOME_PAN, HOME_TILT, steps=MOVE_STEPS, step_delay=MOVE_STEP_DELAY)
-        auto_mode = True
-        logger.info("Switched to AUTO mode")
-    else:
-        auto_mode = False
-        logger.info("Switched to MANUAL mode")
+    # The controller thread does the switch (and the homing move for auto) so we return straight away
+    g.turret.command_queue.put("set_mode", auto=(mode.lower() == "auto"))
     return "OK"
 
-@app.route("/move")
+@turret_routes.route("/move")
 def move():
-    direction = request.args.get("direction", None)
-    if auto_mode:
-        return "Cannot move while in AUTO mode", 400
-    if not direction:
-        return "No direction provided", 400
-
-    step_degrees = 5.0
-    current_pan, current_tilt = pan_tilt_control.get_current_angles()
-    if direction == "down":
-        new_tilt = current_tilt - step_degrees
-        pan_tilt_control.move_to(current_pan, new_tilt, steps=MOVE_STEPS, step_delay=MOVE_STEP_DELAY)
-    elif direction == "up":
-        new_tilt = current_tilt + step_degrees
-        pan_tilt_control.move_to(current_pan, new_tilt, steps=MOVE_STEPS, step_delay=MOVE_STEP_DELAY)
-    elif direction == "right":
-        new_pan = current_pan - step_degrees
-        pan_tilt_control.move_to(new_pan, current_tilt, steps=MOVE_STEPS, step_delay=MOVE_STEP_DELAY)
-    elif direction == "left":
-        new_pan = current_pan + step_degrees
-        pan_tilt_control.move_to(new_pan, current_tilt, steps=MOVE_STEPS, step_delay=MOVE_STEP_DELAY)
-    else:
-        return f"Unknown direction: {direction}", 400
-    return "OK"
+    return g.turret.start_move(request.args.get("direction", None))
 
-@app.route("/water_pistol")
+@turret_routes.route("/water_pistol")
 def water_pistol_control():
     action = request.args.get("action", None)
     if not action:
         return "No action specified", 400
     if action == "start":
-        water_pistol.start()
+        g.turret.water_pistol.start()
     elif action == "stop":
-        water_pistol.stop()
+        g.turret.water_pistol.stop()
     else:
         return f"Unknown action: {action}", 400
     return "OK"
 
-@app.route("/set_home")
+@turret_routes.route("/set_home")
 def set_home():
-    global manual_home_pan, manual_home_tilt
-    global HOME_PAN, HOME_TILT
-    if auto_mode:
+    turret = g.turret
+    if turret.auto_mode:
         return "Cannot set home in AUTO mode", 400
-    current_pan, current_tilt = pan_tilt_control.get_current_angles()
-    manual_home_pan = current_pan
-    manual_home_tilt = current_tilt
-    HOME_PAN = manual_home_pan
-    HOME_TILT = manual_home_tilt
-    logger.info(f"Set new manual home to Pan={manual_home_pan}, Tilt={manual_home_tilt}")
+    current_pan, current_tilt = turret.servos.get_current_angles()
+    turret.set_home(current_pan, current_tilt)
+    turret.logger.info(f"Set new manual home to Pan={current_pan}, Tilt={current_tilt}")
     return "OK"
 
-@app.route('/')
+@turret_routes.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', joystick_max_speed=config.JOYSTICK_MAX_SPEED,
+                           base=g.base, pipeline_names=list(pipelines), current=g.turret.name)
 
-@app.route('/video_feed')
+@turret_routes.route('/video_feed')
 def video_feed():
-    return Response(gen_frames(),
+    return Response(gen_frames(g.turret),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+app.register_blueprint(turret_routes)
+app.register_blueprint(turret_routes, url_prefix="/pipeline/<pipeline>", name="pipeline")
+
 # -----------------------------------------------------------------------------
 #  Utility Functions for Video Conversion
 # -----------------------------------------------------------------------------
@@ -576,57 +818,93 @@ def convert_saved_video(filename):
         if DELETE_CONVERTED_FILES:
             os.remove(filename)
         logger.info(f"Converted {filename} to {mp4_filename}. (DELETE_CONVERTED_FILES={DELETE_CONVERTED_FILES})")
+        return mp4_filename
     except subprocess.CalledProcessError as e:
         logger.error(f"ffmpeg failed to convert {filename}: {e}")
+        return None
 
-def convert_saved_video_async(filename):
-    def convert():
-        convert_saved_video(filename)
-    threading.Thread(target=convert, daemon=True).start()
+def finalise_recording(turret, filename, start_time, end_time, previews, tracks_path=None):
+    """
+    Converts the recording to MP4, writes its poster/sprite previews and adds it to the catalog.
+    """
+    mp4_filename = convert_saved_video(filename)
+    if mp4_filename is None:
+        return
+    base_name = os.path.splitext(os.path.basename(mp4_filename))[0]
+    labels_seen, max_conf = previews.summary()
+    entry = make_entry(
+        base_name,
+        os.path.basename(mp4_filename),
+        start_time,
+        end_time,
+        os.path.getsize(mp4_filename),
+        labels_seen,
+        max_conf
+    )
+    entry["pipeline"] = turret.name
+    if config.GENERATE_RECORDING_PREVIEWS:
+        entry.update(previews.write(SAVE_DIRECTORY, base_name))
+    if tracks_path:
+        entry["tracks"] = os.path.basename(tracks_path)
+    recording_catalog.add(entry)
+    if turret.site_client is not None:
+        turret.site_client.publish_recording(start_time, entry["duration"], max_conf, base_name, labels_seen)
+    turret.metrics.recordings_total.inc()
+    turret.metrics.recording_bytes_total.inc(entry["size_bytes"])
+
+def finalise_recording_async(turret, filename, start_time, end_time, previews, tracks_path=None):
+    def finalise():
+        finalise_recording(turret, filename, start_time, end_time, previews, tracks_path)
+    threading.Thread(target=finalise, daemon=True).start()
+
+def new_preview_collector():
+    return PreviewCollector(
+        sprite_frames=config.PREVIEW_SPRITE_FRAMES,
+        sprite_interval=config.PREVIEW_SPRITE_INTERVAL,
+        sprite_width=config.PREVIEW_SPRITE_WIDTH,
+        jpeg_quality=config.PREVIEW_JPEG_QUALITY
+    )
 
 # -----------------------------------------------------------------------------
 #  Classes
 # -----------------------------------------------------------------------------
 class PanTiltControllerWrapper:
-    def __init__(self, move_steps, move_step_delay):
+    def __init__(self, servos, home_angles):
+        """
+        servos: the pipeline's pan_tilt_control.PanTilt
+        home_angles: function(tuning) -> (pan, tilt) of the pipeline's home position
+        """
+        self.servos = servos
+        self.home_angles = home_angles
         self.is_moving = False
-        self.move_steps = move_steps
-        self.move_step_delay = move_step_delay
-        # Move to home on init
-        time.sleep(1.0)
-        self.home()
 
     def home(self):
-        pan_tilt_control.move_to(
-            HOME_PAN, HOME_TILT,
-            # steps=self.move_steps,
-            # step_delay=self.move_step_delay
+        home_pan, home_tilt = self.home_angles(live_config.current())
+        self.servos.move_to(
+            home_pan, home_tilt,
+            # steps=tuning.move_steps,
+            # step_delay=tuning.move_step_delay
             steps=10,
             step_delay=0.1
         )
 
-    def set_target_by_pixels(self, offset_x, offset_y):
+    def set_target_by_pixels(self, offset_x, offset_y, tuning):
         if self.is_moving:
             return
-        if abs(offset_x) < DEAD_ZONE and abs(offset_y) < DEAD_ZONE:
+        if abs(offset_x) < tuning.dead_zone and abs(offset_y) < tuning.dead_zone:
             return
-        current_pan, current_tilt = pan_tilt_control.get_current_angles()
-        delta_pan = offset_x * PAN_DEG_PER_PIXEL
-        delta_tilt = offset_y * TILT_DEG_PER_PIXEL
-        if PAN_INVERT:
-            delta_pan = -delta_pan
-        if TILT_INVERT:
-            delta_tilt = -delta_tilt
-        new_pan_angle = current_pan + delta_pan
-        new_tilt_angle = current_tilt + delta_tilt
+        current_pan, current_tilt = self.servos.get_current_angles()
+        # The scales already include PAN_INVERT / TILT_INVERT
+        new_pan_angle = current_pan + offset_x * tuning.pan_scale
+        new_tilt_angle = current_tilt + offset_y * tuning.tilt_scale
 
         def do_move():
             self.is_moving = True
-            pan_tilt_control.move_to(
+            self.servos.move_to(
                 new_pan_angle,
                 new_tilt_angle,
-                steps=self.move_steps,
-                step_delay=self.move_step_delay
+                steps=tuning.move_steps,
+                step_delay=tuning.move_step_delay
             )
             self.is_moving = False
         t = threading.Thread(target=do_move, daemon=True)
@@ -637,20 +915,81 @@ class PanTiltControllerWrapper:
             return
         def do_home():
             self.is_moving = True
-            pan_tilt_control.move_to(
-                HOME_PAN, HOME_TILT,
-                # steps=self.move_steps,
-                # step_delay=self.move_step_delay
+            home_pan, home_tilt = self.home_angles(live_config.current())
+            self.servos.move_to(
+                home_pan, home_tilt,
+                # steps=tuning.move_steps,
+                # step_delay=tuning.move_step_delay
                 steps=10,
                 step_delay=0.1
             )
             self.is_moving = False
         threading.Thread(target=do_home, daemon=True).start()
 
+class VelocityController:
+    """
+    Moves the turret continuously at a commanded speed (joystick control over the WebSocket).
+    The speed has to be refreshed at least every timeout seconds or the turret stops, so a
+    lost connection can never leave it running.
+    """
+    def __init__(self, turret, max_speed, rate_hz=20, timeout=0.5):
+        self.turret = turret
+        self.max_speed = max_speed
+        self.interval = 1.0 / rate_hz
+        self.timeout = timeout
+        self.pan_velocity = 0.0
+        self.tilt_velocity = 0.0
+        self.last_command = 0.0
+        # Guards the velocities and last_command, so a stop never overwrites a newer command
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def set_velocity(self, pan, tilt):
+        """
+        pan/tilt in degrees per second, clamped to max_speed.
+        """
+        with self.lock:
+            self.pan_velocity = max(-self.max_speed, min(self.max_speed, pan))
+            self.tilt_velocity = max(-self.max_speed, min(self.max_speed, tilt))
+            self.last_command = time.monotonic()
+        self.wake.set()
+
+    def stop(self):
+        with self.lock:
+            self.pan_velocity = 0.0
+            self.tilt_velocity = 0.0
+
+    def run(self):
+        servos = self.turret.servos
+        while True:
+            with self.lock:
+                if self.turret.auto_mode or (time.monotonic() - self.last_command) > self.timeout:
+                    self.pan_velocity = 0.0
+                    self.tilt_velocity = 0.0
+                pan_velocity, tilt_velocity = self.pan_velocity, self.tilt_velocity
+                if pan_velocity == 0.0 and tilt_velocity == 0.0:
+                    # Cleared under the lock, so a set_velocity() from here on wakes the wait below
+                    self.wake.clear()
+            if pan_velocity == 0.0 and tilt_velocity == 0.0:
+                self.wake.wait()
+                continue
+            current_pan, current_tilt = servos.get_current_angles()
+            # A single step, the step delay paces the loop
+            servos.move_to(
+                current_pan + pan_velocity * self.interval,
+                current_tilt + tilt_velocity * self.interval,
+                steps=1,
+                step_delay=self.interval
+            )
+
 class WaterPistolController:
-    def __init__(self, pin=config.REPLAY_PIN):
+    def __init__(self, pin, metrics, log=logger):
         self.active = False
+        self.started_at = 0.0
         self.relay_pin = pin
+        self.metrics = metrics
+        self.logger = log
         self.relay = LED(self.relay_pin, active_high=True)
         self.relay.off()
 
@@ -658,52 +997,83 @@ class WaterPistolController:
         if not self.active:
             self.active = True
             self.relay.on()
-            logger.info("WaterPistol - Started firing!!")
+            self.started_at = time.monotonic()
+            self.metrics.water_pistol_activations_total.inc()
+            self.logger.info("WaterPistol - Started firing!!")
 
     def stop(self):
         if self.active:
             self.active = False
             self.relay.off()
-            logger.info("WaterPistol - Stopped firing.")
+            self.metrics.water_pistol_seconds_total.inc(time.monotonic() - self.started_at)
+            self.logger.info("WaterPistol - Stopped firing.")
 
     def cleanup(self):
         self.relay.close()
 
 class RecordingManager:
-    def __init__(self, picam2):
+    def __init__(self, turret):
         from picamera2.encoders import H264Encoder
         from picamera2.outputs import FileOutput
-        self.picam2 = picam2
-        self.encoder = H264Encoder()
+        self.turret = turret
+        self.picam2 = turret.picam2
+        self.encoder_class = H264Encoder
         self.output_class = FileOutput
         self.recording = False
         self.filename = None
+        self.start_time = None
+        # Collects poster/sprite frames from the camera callback while recording
+        self.previews = new_preview_collector()
+        # Per-frame detections saved next to the recording
+        self.tracks = SidecarWriter()
 
     def start_recording(self):
         if not self.recording:
             timestamp = time.strftime("%d_%m_%y_%H_%M_%S")
-            self.filename = f"capture_{timestamp}.h264"
-            logger.info(f"[RecordingManager] Starting recording to {self.filename}...")
+            self.filename = f"{self.turret.settings.recording_prefix}{timestamp}.h264"
+            self.turret.logger.info(f"[RecordingManager] Starting recording to {self.filename}...")
             self.output = self.output_class(self.filename)
-            self.picam2.start_recording(self.encoder, self.output)
+            self.previews.reset()
+            self.start_time = time.time()
+            if config.RECORD_DETECTION_TRACKS:
+                base_name = os.path.splitext(self.filename)[0]
+                if not os.path.exists(SAVE_DIRECTORY):
+                    os.makedirs(SAVE_DIRECTORY)
+                self.tracks.open(
+                    os.path.join(SAVE_DIRECTORY, base_name + ".tracks.jsonl"),
+                    self.turret.context.main_size,
+                    self.turret.context.labels
+                )
+            # A new encoder each time so the recording uses the current performance profile's bitrate
+            encoder = self.encoder_class(bitrate=governor.profile.recording_bitrate)
+            self.picam2.start_recording(encoder, self.output)
             self.recording = True
+            # Make sure there is headroom for this recording to finish
+            if retention_manager:
+                retention_manager.wake()
 
     def stop_recording(self):
         if self.recording:
-            logger.info("[RecordingManager] Stopping recording...")
+            self.turret.logger.info("[RecordingManager] Stopping recording...")
             self.picam2.stop_recording()
             self.recording = False
+            end_time = time.time()
+            tracks_path = self.tracks.close()
+            # Hand the collected previews over and start a fresh collector for the next recording
+            previews = self.previews
+            self.previews = new_preview_collector()
             # Now convert the file
             if not config.RASPBERRY_PI_ZERO_2W:
-                convert_saved_video(self.filename)
+                finalise_recording(self.turret, self.filename, self.start_time, end_time, previews, tracks_path)
             else:
-                convert_saved_video_async(self.filename)
+                finalise_recording_async(self.turret, self.filename, self.start_time, end_time, previews, tracks_path)
 
 class TargetTracker:
-    def __init__(self, activation_detections, activation_time_window, no_detection_timeout):
+    def __init__(self, activation_detections, activation_time_window, no_detection_timeout, log=logger):
         self.activation_detections = activation_detections
         self.activation_time_window = activation_time_window
         self.no_detection_timeout = no_detection_timeout
+        self.logger = log
         self.detection_timestamps = deque()
         self.target_acquired = False
         self.last_detection_time = None
@@ -721,79 +1091,57 @@ class TargetTracker:
             # Check if we cross the activation threshold
             if (not self.target_acquired) and (len(self.detection_timestamps) >= self.activation_detections):
                 self.target_acquired = True
-                logger.info("[TargetTracker] Target acquired!")
+                self.logger.info("[TargetTracker] Target acquired!")
         else:
             # If no detections for too long => lose target
             if self.target_acquired and self.last_detection_time is not None:
                 if (now - self.last_detection_time) > self.no_detection_timeout:
                     self.target_acquired = False
                     self.detection_timestamps.clear()
-                    logger.info("[TargetTracker] Target lost due to no detections.")
+                    self.logger.info("[TargetTracker] Target lost due to no detections.")
         return self.target_acquired
 
     def is_target_acquired(self):
         return self.target_acquired
 
+    def apply_tuning(self, tuning):
+        # Called by live_config when the settings change
+        self.activation_detections = tuning.activation_detections
+        self.activation_time_window = tuning.activation_time_window
+        self.no_detection_timeout = tuning.no_detection_timeout
+
     def reset(self):
         # Force a fresh
         self.detection_timestamps.clear()
         self.target_acquired = False
         self.last_detection_time = None
 
-        logger.info("[TargetTracker] State has been reset.")
+        self.logger.info("[TargetTracker] State has been reset.")
 
 # Simple detection container
 class Detection:
+    zone = 0       # Zone bits (zones.py), set by apply_zones()
+    track_id = 0   # Site track id (site_client.TrackIds), set when there is a site coordinator
+
     def __init__(self, coords, category, conf, metadata, picam2, imx500):
         self.category = category
         self.conf = conf
         # Convert from IMX500's inference coords to pixel coords
         self.box = imx500.convert_inference_coords(coords, metadata, picam2)
-        logger.debug(f"[Detection] Raw coords: {coords} converted to pixel box: {self.box}")
-
-def parse_detections(metadata: dict, imx500, intrinsics, picam2):
-    threshold      = config.THRESHOLD
-    iou            = config.IOU
-    max_detections = config.MAX_DETECTIONS
-
-    np_outputs = imx500.get_outputs(metadata, add_batch=True)
-    if np_outputs is None:
-        return []
-
-    input_w, input_h = imx500.get_input_size()
-
-    if intrinsics.postprocess == "nanodet":
-        boxes, scores, classes = postprocess_nanodet_detection(
-            outputs=np_outputs[0],
-            conf=threshold,
-            iou_thres=iou,
-            max_out_dets=max_detections
-        )[0]
-        from picamera2.devices.imx500.postprocess import scale_boxes
-        boxes = scale_boxes(boxes, 1, 1, input_h, input_w, False, False)
-    else:
-        bbox_normalization = intrinsics.bbox_normalization
-        bbox_order = intrinsics.bbox_order
-        boxes, scores, classes = np_outputs[0][0], np_outputs[1][0], np_outputs[2][0]
-        if bbox_normalization:
-            boxes = boxes / input_h
-        if bbox_order == "xy":
-            # Convert from (y0, x0, y1, x1) => (x0, y0, x1, y1)
-            boxes = boxes[:, [1, 0, 3, 2]]
-
-    new_detections = []
-    for i in range(len(scores)):
-        score = scores[i]
-        if score < threshold:
-            continue
-        category = classes[i]
-        box = boxes[i]
-        det = Detection(box, category, score, metadata, picam2, imx500)
-        new_detections.append(det)
-
-    return new_detections
-
-@lru_cache
+
+def apply_zones(detections, zone_map):
+    """
+    Drops the detections in ignore zones and tags the others with their zone bits.
+    """
+    if zone_map.empty:
+        return detections
+    kept = []
+    for det in detections:
+        det.zone = zone_map.flags_for_box(det.box)
+        if not det.zone & IGNORE:
+            kept.append(det)
+    return kept
+
 def get_labels(intrinsics):
     labels = intrinsics.labels
     if hasattr(intrinsics, "ignore_dash_labels") and intrinsics.ignore_dash_labels:
@@ -804,16 +1152,17 @@ def get_labels(intrinsics):
 def draw_detections_on_frame(
     array,
     detections,
-    intrinsics,
+    labels,
+    geometry,
     recording,
     inside_box,
     scale_x=1.0,
     scale_y=1.0
 ):
-    labels = get_labels(intrinsics)
-    height, width, _ = array.shape
-    center_x = width // 2
-    center_y = height // 2
+    """
+    geometry is the OverlayGeometry of the stream being drawn on, from the PipelineContext.
+    """
+    width = geometry.width
 
     if not recording:
         box_color      = (0, 255, 0)
@@ -912,261 +1261,1016 @@ def draw_detections_on_frame(
             )
 
         # Crosshair
-        line_length = 30
         thickness   = 4
-        cv2.line(
-            array,
-            (center_x - line_length, center_y),
-            (center_x + line_length, center_y),
-            crosshair_color, thickness
-        )
-        cv2.line(
-            array,
-            (center_x, center_y - line_length),
-            (center_x, center_y + line_length),
-            crosshair_color, thickness
-        )
+        for start, end in geometry.crosshair:
+            cv2.line(array, start, end, crosshair_color, thickness)
 
-        # Bottom text
-        (bt_text_width, bt_text_height), bt_baseline = cv2.getTextSize(
-            bottom_text, cv2.FONT_HERSHEY_SIMPLEX, 2.0, 2
-        )
-        text_x = (width - bt_text_width) // 2
-        text_y = height - 20
+        # Bottom text, positions worked out when the pipeline was configured
+        text_origin, banner_top_left, banner_bottom_right = geometry.status_text[bottom_text]
         cv2.rectangle(
             array,
-            (text_x, text_y - bt_text_height - bt_baseline),
-            (text_x + bt_text_width, text_y + bt_baseline),
+            banner_top_left,
+            banner_bottom_right,
             bottom_bg_color,
             cv2.FILLED
         )
         cv2.putText(
             array, bottom_text,
-            (text_x, text_y),
+            text_origin,
             cv2.FONT_HERSHEY_SIMPLEX,
-            2.0, (255, 255, 255), 2
+            STATUS_FONT_SCALE, (255, 255, 255), STATUS_THICKNESS
         )
 
+def load_network(model_path, labels_path, camera_id=""):
+    """
+    Opens the IMX500 with a network (its firmware is uploaded when the camera starts) and
+    sets up the intrinsics.  camera_id picks the IMX500 when there are several.  Returns
+    (imx500, intrinsics), raises ValueError if the network is not an object detection model.
+    """
+    # Read before IMX500() so a bad labels file fails without touching the sensor
+    with open(labels_path or "assets/coco_labels.txt", "r") as f:
+        labels = f.read().splitlines()
+
+    network = IMX500(model_path, camera_id=camera_id) if camera_id else IMX500(model_path)
+    network_intrinsics = network.network_intrinsics
+    if not network_intrinsics:
+        network_intrinsics = NetworkIntrinsics()
+        network_intrinsics.task = "object detection"
+    elif network_intrinsics.task != "object detection":
+        raise ValueError("Network is not an object detection task.")
+    network_intrinsics.labels = labels
+
+    if hasattr(network_intrinsics, "ignore_dash_labels"):
+        network_intrinsics.ignore_dash_labels = config.IGNORE_DASH_LABELS
+    if hasattr(network_intrinsics, "postprocess"):
+        network_intrinsics.postprocess = config.POSTPROCESS
+    if hasattr(network_intrinsics, "bbox_normalization"):
+        network_intrinsics.bbox_normalization = config.BBOX_NORMALIZATION
+    if hasattr(network_intrinsics, "bbox_order"):
+        network_intrinsics.bbox_order = config.BBOX_ORDER
+    if hasattr(network_intrinsics, "preserve_aspect_ratio"):
+        network_intrinsics.preserve_aspect_ratio = config.PRESERVE_ASPECT_RATIO
+    network_intrinsics.update_with_defaults()
+    return network, network_intrinsics
 
 # -----------------------------------------------------------------------------
-#  The Camera Callback - DO NOT start/stop recording here
+#  TurretPipeline: one camera, its detector, tracker, turret, water pistol,
+#  recorder and preview
 # -----------------------------------------------------------------------------
-def do_frame_callback(request):
-    global latest_frame
-    global recording_requested, recording_stop_requested
-
-    metadata = request.get_metadata()
-    raw_detections = parse_detections(metadata, imx500, intrinsics, picam2)
-
-    if logger.isEnabledFor(logging.DEBUG):
-        labels_list = get_labels(intrinsics)  # or intrinsics.labels if you prefer
-        for d in raw_detections:
-            cat_id = d.category
-            label_text = labels_list[int(cat_id)]
-            logger.debug(f"Detection: {label_text} {d.conf:.2f}")
-
-    # 1) Update the smoothing store
-    update_smoothed_detections(raw_detections, alpha=ALPHA, fade_frames=FADE_FRAMES)
-
-    # 2) Retrieve the smoothed bounding boxes
-    #    Here we create "Detection-like" objects or simple dicts
-    #    so the draw function can be fed them.
-    smoothed_dets = get_smoothed_detections()
-
-    # 3) (Optional) If you still do TargetTracker, you might pass raw_detections
-    #    or the smoothed_dets. Some prefer raw for immediate logic, or a partial approach.
-    has_detections = (len(smoothed_dets) > 0)
-    was_acquired = target_tracker.is_target_acquired()
-    target_tracker.update_detections(has_detections)
-    is_acquired = target_tracker.is_target_acquired()
-
-    if is_acquired and not was_acquired and auto_mode:
-        recording_requested = True
-        if WATER_PISTOL_ARMED:
-            water_pistol.start()
-
-    elif was_acquired and not is_acquired and auto_mode:
-        recording_stop_requested = True
-        water_pistol.stop()
-        if auto_mode:
-            pan_tilt.move_home_async()
-
-    # 4) Pan/tilt: maybe track the first smoothed box if you want
-    # if is_acquired and smoothed_dets and auto_mode:
-    #     first_box = smoothed_dets[0]["box"]  # (x, y, w, h)
-    #     (x, y, w, h) = first_box
-    #     main_w, main_h = picam2.stream_configuration("main")["size"]
-    #     offset_x = (x + w/2) - (main_w / 2)
-    #     offset_y = (y + h/2) - (main_h / 2)
-    #     pan_tilt.set_target_by_pixels(offset_x, offset_y)
-
-    if is_acquired and raw_detections and auto_mode:
-        # Option A: Just pick the first detection
-        # first_det = raw_detections[0]
-
-        # Option B: Pick the detection with the highest confidence
-        best_det = max(raw_detections, key=lambda d: d.conf)
-
-        (x, y, w, h) = best_det.box  # (x, y, w, h)
-        main_w, main_h = picam2.stream_configuration("main")["size"]
-        offset_x = (x + w / 2) - (main_w / 2)
-        offset_y = (y + h / 2) - (main_h / 2)
-        pan_tilt.set_target_by_pixels(offset_x, offset_y)
-
-
-    # 5) Draw bounding boxes on main (1:1)
-    inside_box = False
-
-    if recording_manager.recording and len(smoothed_dets) > 0:
-        main_w, main_h = picam2.stream_configuration("main")["size"]
-        cx = main_w // 2
-        cy = main_h // 2
-        for d in smoothed_dets:
-            (bx, by, bw, bh) = d["box"]
-            if bx <= cx <= (bx + bw) and by <= cy <= (by + bh):
-                inside_box = True
-                break
-    if DISPLAY_BOXES_VIDEO:
-        with MappedArray(request, "main") as m:
-            main_array = m.array
-            draw_detections_on_frame(
-                main_array,
-                smoothed_dets,     # pass the "smoothed" list
-                intrinsics,
-                recording_manager.recording,
-                inside_box,
-                scale_x=1.0,
-                scale_y=1.0
-            )
-    # 6) Draw bounding boxes on lowres (scaled)
-
-    with MappedArray(request, "lores") as lores_m:
-        lores_frame = cv2.cvtColor(lores_m.array, cv2.COLOR_YUV2BGR_I420)
-        lores_w, lores_h = picam2.stream_configuration("lores")["size"]
-        main_w, main_h   = picam2.stream_configuration("main")["size"]
-
-        sx = lores_w / float(main_w)
-        sy = lores_h / float(main_h)
-
-        if DISPLAY_BOXES_PREVIEW:
-            draw_detections_on_frame(
-                lores_frame,
-                smoothed_dets,     # pass the smoothed list
-                intrinsics,
-                recording_manager.recording,
-                inside_box,
-                scale_x=sx,
-                scale_y=sy
+class TurretPipeline:
+    def __init__(self, settings):
+        """
+        settings: pipeline_settings.PipelineSettings.  Nothing touches the hardware
+        until the start up phases from add_startup_phases() run.
+        """
+        self.settings = settings
+        self.name = settings.name
+        self.logger = logging.getLogger(f"my_app_logger.{settings.name}")
+        self.metrics = PipelineMetrics(self)
+        self.servos = PanTilt(settings.i2c_address, config.I2C_BUS, settings.pan_channel, settings.tilt_channel)
+        self.home = settings.home   # None = the live HOME_PAN / HOME_TILT
+        self.manual_home = None     # ((pan, tilt), configured home it replaces) from /set_home
+
+        self.pan_tilt = None           # PanTiltControllerWrapper, once the servos are initialised
+        self.imx500 = None
+        self.intrinsics = None
+        self.network_files = None      # (network, labels) paths of the loaded network
+        self.picam2 = None
+        self.video_config = None
+        self.context = None            # PipelineContext, rebuilt by configure_pipeline() whenever the camera is configured
+        self.zone_list = load_zones(settings.zones_file)   # Zones drawn on the Zones page, rasterised into the context
+        self.smoother = BoxSmoother()
+        self.water_pistol = None
+        self.recording_manager = None
+        self.target_tracker = None
+        self.model_manager = None      # Which IMX500 network runs and when, see model_manager.py
+        self.site_client = None        # Connection to the site coordinator if SITE_COORDINATOR is set
+        self.site_track_ids = TrackIds()
+        self.detection_log = None      # Created at startup if DETECTION_LOG_ENABLED
+
+        self.auto_mode = True          # starts in auto mode
+        self.latest_frame = None       # The latest "lores" frame (annotated) for MJPEG streaming
+        self.frame_ring = None         # Shared memory ring used instead of latest_frame when WEB_SERVER_PROCESS is set
+        self.frame_counter = 0
+        self.frame_rate = None         # Camera frame rate asked for, the network's inference rate or the profile's cap
+        self.callback_load = 0.0       # Smoothed callback time as a fraction of the frame interval, for the governor
+        self.last_preview = 0.0        # perf_counter() of the last preview frame published
+        self.viewers = 0               # /video_feed clients of this process, see has_viewers()
+        self.viewers_lock = threading.Lock()
+
+        # Idle mode, after IDLE_AFTER seconds without detections, see check_idle()
+        self.idle = False
+        self.idle_pending = False      # "enter_idle" queued for the controller thread
+        self.idle_since = None         # monotonic time idle started
+        self.last_activity = time.monotonic()
+        self.wake_started = None       # monotonic time of the waking detection until the full rate is back
+        self.servos_released_at = None
+        self.idle_lock = threading.Lock()   # Keeps the idle flag and the frame rate asked for in step
+
+        # Load shedding, the first shed_level SHED_STAGES are skipped, see shed() and adapt_shedding()
+        self.shed_level = 0
+        self.calm_frames = 0
+        # Per-detection debug lines, one sampler per thread (camera callback, debug_log subscriber)
+        self.detection_log_sampler = LogSampler(config.LOG_DETECTIONS_PER_SECOND)
+        self.subscriber_log_sampler = LogSampler(config.LOG_DETECTIONS_PER_SECOND)
+        self.last_sensor_timestamp = None   # SensorTimestamp (ns) of the previous frame, for the FPS/drop metrics
+
+        # Recording start/stop, homing, mode changes... are queued for controller_loop()
+        self.command_queue = CommandQueue()
+        # Manual moves (/move), summed up until the move worker takes them
+        self.move_lock = threading.Lock()
+        self.move_wake = threading.Event()
+        self.pending_move = (0.0, 0.0)
+        threading.Thread(target=self.move_worker, name=f"moves_{settings.name}", daemon=True).start()
+        # The camera callback publishes one FrameEvent per frame
+        self.event_bus = EventBus()
+        self.status_broadcaster = StatusBroadcaster()   # Shared snapshot behind /status/stream
+        self.command_handlers = {
+            "start_recording": self.handle_start_recording,
+            "stop_recording": self.handle_stop_recording,
+            "home": self.handle_home,
+            "set_mode": self.handle_set_mode,
+            "reconfigure": self.handle_reconfigure,
+            "update_zones": self.handle_update_zones,
+            "switch_model": self.handle_switch_model,
+            "apply_profile": self.handle_apply_profile,
+            "enter_idle": self.handle_enter_idle,
+            "wake": self.handle_wake,
+        }
+
+    # ---- Home position ----
+    def home_angles(self, tuning):
+        if self.manual_home is not None:
+            angles, configured = self.manual_home
+            # Until HOME_PAN / HOME_TILT are changed through /configuration
+            if configured == (tuning.home_pan, tuning.home_tilt):
+                return angles
+        if self.home is not None:
+            return self.home
+        return tuning.home_pan, tuning.home_tilt
+
+    def set_home(self, pan, tilt):
+        # Live only, like before it is not saved to config.json: it is kept out of config so the
+        # next /configuration save does not write it
+        tuning = live_config.current()
+        self.manual_home = ((pan, tilt), (tuning.home_pan, tuning.home_tilt))
+
+    # ---- Camera configuration ----
+    def profile_lores_size(self):
+        # The web process's frame ring was sized for the first preview resolution, so that one stays
+        if self.frame_ring is not None:
+            return tuple(self.context.lores_size)
+        return governor.profile.lores_size or tuple(config.LOW_RES_STREAM_RESOLUTION)
+
+    def make_video_config(self, network_intrinsics):
+        cap = governor.profile.frame_rate
+        self.frame_rate = min(network_intrinsics.inference_rate, cap) if cap else network_intrinsics.inference_rate
+        return self.picam2.create_video_configuration(
+            main={"size": config.MAIN_STREAM_RESOLUTION},
+            lores={"size": self.profile_lores_size(), "format": "YUV420"},
+            controls={"FrameRate": self.frame_rate},
+            buffer_count=12,
+            transform=Transform(
+                hflip=self.settings.flip_horizontally,
+                vflip=self.settings.flip_vertically
             )
-        latest_frame = lores_frame.copy()
+        )
+
+    def configure_pipeline(self):
+        """
+        Rebuilds the PipelineContext after the camera has been configured, the callback
+        picks up the new one on its next frame.
+        """
+        main_size = self.picam2.stream_configuration("main")["size"]
+        self.context = build_context(
+            main_size,
+            self.picam2.stream_configuration("lores")["size"],
+            get_labels(self.intrinsics),
+            ZoneMap(self.zone_list, main_size, config.ZONE_GRID_WIDTH, config.ZONE_TEST_POINT)
+        )
+
+    # ---- The Camera Callback - DO NOT start/stop recording here ----
+    def record_frame_timing(self, metadata):
+        """
+        Measures the camera frame rate and counts dropped frames from the sensor timestamps.
+        """
+        metrics = self.metrics
+        metrics.frames_total.inc()
+        sensor_timestamp = metadata.get("SensorTimestamp")
+        if sensor_timestamp is None:
+            return
+        rate = self.camera_rate()
+        if self.last_sensor_timestamp is not None and rate:
+            gap = (sensor_timestamp - self.last_sensor_timestamp) / 1e9
+            if gap > 0:
+                expected = 1.0 / rate
+                if self.wake_started is not None:
+                    # Frames keep the idle spacing until the new frame duration reaches the sensor
+                    if gap <= 1.5 * expected:
+                        metrics.wake_seconds.observe(time.monotonic() - self.wake_started)
+                        self.wake_started = None
+                elif gap > 1.5 * expected:
+                    metrics.dropped_frames_total.inc(round(gap / expected) - 1)
+                # Smoothed so a single late frame does not make the gauge jump
+                camera_fps = metrics.camera_fps
+                camera_fps.set(0.9 * camera_fps.value + 0.1 * (1.0 / gap) if camera_fps.value else 1.0 / gap)
+        self.last_sensor_timestamp = sensor_timestamp
+
+    def camera_rate(self):
+        # The frame rate the camera has been asked for, lower while idle
+        if self.idle and self.frame_rate:
+            return min(config.IDLE_FRAME_RATE, self.frame_rate)
+        return self.frame_rate
+
+    def add_viewer(self, delta):
+        with self.viewers_lock:
+            self.viewers += delta
+
+    def has_viewers(self):
+        if self.frame_ring is not None:
+            return self.frame_ring.readers() > 0
+        return self.viewers > 0
+
+    def shed(self, stage, callback_start=None, budget=None):
+        """
+        True if the optional stage is skipped this frame, because the shed level covers it
+        or because the frame is already over its budget.
+        """
+        if not config.LOAD_SHEDDING_ENABLED:
+            return False
+        if (SHED_STAGES.index(stage) < self.shed_level
+                or (budget and time.perf_counter() - callback_start > budget)):
+            self.metrics.shed_total[stage].inc()
+            return True
+        return False
+
+    def adapt_shedding(self, duration, budget):
+        """
+        Sheds one more stage after a frame over budget, and gives one back after
+        SHED_RECOVER_FRAMES frames in a row well under it.
+        """
+        if duration > budget:
+            self.calm_frames = 0
+            if self.shed_level < len(SHED_STAGES):
+                self.shed_level += 1
+                self.logger.info(f"Callback over budget ({duration * 1000:.1f} ms), shedding {SHED_STAGES[self.shed_level - 1]}")
+        elif duration < 0.6 * budget and self.shed_level:
+            self.calm_frames += 1
+            if self.calm_frames >= config.SHED_RECOVER_FRAMES:
+                self.calm_frames = 0
+                self.shed_level -= 1
+                self.logger.info(f"Callback within budget, restored {SHED_STAGES[self.shed_level]}")
+        else:
+            self.calm_frames = 0
+
+    def check_idle(self, has_activity, auto_mode, recording):
+        """
+        Called by the callback every frame.  Wakes straight away on activity, the frame rate
+        request goes with the next camera request.  Going idle is left to the controller thread.
+        """
+        now = time.monotonic()
+        if has_activity or not auto_mode or recording:
+            self.last_activity = now
+            if self.idle:
+                self.wake(now)
+        elif (not self.idle and not self.idle_pending and config.IDLE_ENABLED
+              and now - self.last_activity >= config.IDLE_AFTER):
+            self.idle_pending = True
+            self.command_queue.put("enter_idle")
+
+    def wake(self, now):
+        with self.idle_lock:
+            if not self.idle:
+                return
+            self.idle = False
+            self.picam2.set_controls({"FrameRate": self.frame_rate})
+        self.wake_started = now
+        self.metrics.idle_seconds_total.inc(now - self.idle_since)
+        # Powering the servos again talks to the I2C bus, not something for the callback
+        self.command_queue.put("wake")
+
+    def parse_detections(self, metadata, tuning):
+        imx500, intrinsics = self.imx500, self.intrinsics
+        threshold      = tuning.threshold
+        iou            = tuning.iou
+        max_detections = tuning.max_detections
+
+        np_outputs = imx500.get_outputs(metadata, add_batch=True)
+        if np_outputs is None:
+            return []
+        self.metrics.inference_results_total.inc()
+        if self.model_manager is not None and self.model_manager.pending is not None:
+            # First result from a newly loaded network
+            self.model_manager.first_inference()
+
+        boxes, scores, classes = decode_outputs(
+            np_outputs, imx500.get_input_size(),
+            intrinsics.postprocess, intrinsics.bbox_normalization, intrinsics.bbox_order,
+            threshold, iou, max_detections, config.NMS_TOP_K
+        )
 
+        log_debug = self.logger.isEnabledFor(logging.DEBUG) and not self.shed("debug_log")
+        new_detections = []
+        for box, score, category in zip(boxes, scores, classes):
+            det = Detection(box, category, score, metadata, self.picam2, imx500)
+            if log_debug and self.detection_log_sampler.allow():
+                self.logger.debug("[Detection] Raw coords: %s converted to pixel box: %s (%d not logged)",
+                                  box.tolist(), det.box, self.detection_log_sampler.take_suppressed())
+            new_detections.append(det)
+
+        self.metrics.detections_total.inc(len(new_detections))
+        return new_detections
+
+    def site_allows(self, det):
+        """
+        False if the site coordinator has given this target to another turret.
+        """
+        if self.site_client is None:
+            return True
+        return self.site_client.may_engage(det.track_id)
+
+    def identify_tracks(self, detections, ctx):
+        """
+        Gives each detection its site track id, so the coordinator can tell two animals
+        with the same label apart.
+        """
+        labels_list = ctx.labels
+        main_w, main_h = ctx.main_size
+        ids = self.site_track_ids.assign([
+            (labels_list[d.category] if d.category < len(labels_list) else str(d.category),
+             ((d.box[0] + d.box[2] / 2) / main_w, (d.box[1] + d.box[3] / 2) / main_h))
+            for d in detections
+        ])
+        for det, track_id in zip(detections, ids):
+            det.track_id = track_id
+
+    def frame_callback(self, request):
+        callback_start = time.perf_counter()
+        frame_time = time.time()
+        metadata = request.get_metadata()
+        self.record_frame_timing(metadata)
+        metrics = self.metrics
+        recording_manager = self.recording_manager
+        water_pistol = self.water_pistol
+        target_tracker = self.target_tracker
+        auto_mode = self.auto_mode
+        # One snapshot of the live settings, the camera configuration and the performance profile for the whole frame
+        tuning = live_config.current()
+        ctx = self.context
+        profile = governor.profile
+        # Time the callback may take before optional work is shed
+        rate = self.camera_rate()
+        budget = config.CALLBACK_BUDGET / rate if rate else None
+        raw_detections = apply_zones(self.parse_detections(metadata, tuning), ctx.zones)
+        if self.site_client is not None:
+            self.identify_tracks(raw_detections, ctx)
+
+        # 1) Update the smoothing store
+        self.smoother.update(raw_detections, alpha=tuning.alpha, fade_frames=tuning.fade_frames)
+
+        # 2) Retrieve the smoothed bounding boxes
+        #    Here we create "Detection-like" objects or simple dicts
+        #    so the draw function can be fed them.
+        smoothed_dets = self.smoother.detections()
+
+        # 3) (Optional) If you still do TargetTracker, you might pass raw_detections
+        #    or the smoothed_dets. Some prefer raw for immediate logic, or a partial approach.
+        has_detections = (len(smoothed_dets) > 0)
+        was_acquired = target_tracker.is_target_acquired()
+        target_tracker.update_detections(has_detections)
+        is_acquired = target_tracker.is_target_acquired()
+        metrics.target_acquired_gauge.set(int(is_acquired))
+        metrics.tracks_gauge.set(len(smoothed_dets))
+        self.check_idle(bool(raw_detections) or is_acquired, auto_mode, recording_manager.recording)
+
+        if is_acquired and not was_acquired and auto_mode:
+            self.command_queue.put("start_recording")
+
+        elif was_acquired and not is_acquired and auto_mode:
+            self.command_queue.put("stop_recording")
+            water_pistol.stop()
+            self.command_queue.put("home")
+
+        # 4) Pan/tilt: maybe track the first smoothed box if you want
+        # if is_acquired and smoothed_dets and auto_mode:
+        #     first_box = smoothed_dets[0]["box"]  # (x, y, w, h)
+        #     (x, y, w, h) = first_box
+        #     main_w, main_h = picam2.stream_configuration("main")["size"]
+        #     offset_x = (x + w/2) - (main_w / 2)
+        #     offset_y = (y + h/2) - (main_h / 2)
+        #     pan_tilt.set_target_by_pixels(offset_x, offset_y)
+
+        if is_acquired and raw_detections and auto_mode:
+            # Only targets allowed by the engage zones (all of them if there are none) and not
+            # given to another turret by the site coordinator are aimed at
+            targets = [d for d in raw_detections if ctx.zones.can_engage(d.zone) and self.site_allows(d)]
+
+            # Option A: Just pick the first detection
+            # first_det = targets[0]
+
+            # Option B: Pick the detection with the highest confidence
+            best_det = max(targets, key=lambda d: d.conf) if targets else None
+
+            if best_det is not None:
+                (x, y, w, h) = best_det.box  # (x, y, w, h)
+                center_x, center_y = ctx.main_center
+                offset_x = (x + w / 2) - center_x
+                offset_y = (y + h / 2) - center_y
+                self.pan_tilt.set_target_by_pixels(offset_x, offset_y, tuning)
+        else:
+            best_det = None
+
+        # Decided on every frame with detections, so the pistol stops as soon as the target walks
+        # into an ignore zone or is given to another turret.  A frame without detections keeps
+        # the current state, the track timing out is what stops it then.
+        if auto_mode and is_acquired and raw_detections:
+            if tuning.water_pistol_armed and best_det is not None and not best_det.zone & NO_FIRE:
+                water_pistol.start()
+            else:
+                water_pistol.stop()
+        elif auto_mode and (not is_acquired or not tuning.water_pistol_armed):
+            water_pistol.stop()
+
+        # Everything that does not need to happen before the next frame (logging, sidecar,
+        # detection log...) is done by the event bus subscribers on their own threads
+        self.frame_counter += 1
+        current_pan, current_tilt = self.servos.peek_current_angles()
+        self.event_bus.publish(FrameEvent(
+            frame_id=self.frame_counter,
+            timestamp=frame_time,
+            detections=tuple(DetectionRecord(int(d.category), float(d.conf), tuple(d.box), d.track_id)
+                             for d in raw_detections),
+            tracks=tuple(TrackRecord(d["category"], float(d["conf"]), tuple(d["box"])) for d in smoothed_dets),
+            acquired=is_acquired,
+            pan=current_pan,
+            tilt=current_tilt,
+            recording=recording_manager.recording,
+            auto_mode=auto_mode
+        ))
+
+        # 5) Draw bounding boxes on main (1:1)
+        inside_box = False
+
+        if recording_manager.recording and len(smoothed_dets) > 0:
+            cx, cy = ctx.main_overlay.center
+            for d in smoothed_dets:
+                (bx, by, bw, bh) = d["box"]
+                if bx <= cx <= (bx + bw) and by <= cy <= (by + bh):
+                    inside_box = True
+                    break
+        if (tuning.display_boxes_video and profile.draw_overlays
+                and not self.shed("main_overlay", callback_start, budget)):
+            with MappedArray(request, "main") as m:
+                main_array = m.array
+                draw_detections_on_frame(
+                    main_array,
+                    smoothed_dets,     # pass the "smoothed" list
+                    ctx.labels,
+                    ctx.main_overlay,
+                    recording_manager.recording,
+                    inside_box,
+                    scale_x=1.0,
+                    scale_y=1.0
+                )
+        # 6) Draw bounding boxes on lowres (scaled), only as often as the profile's preview_fps
+        #    and, while idle, only if someone is watching
+        publish_preview = (not profile.preview_fps
+                           or callback_start - self.last_preview >= 1.0 / profile.preview_fps)
+        if publish_preview and self.idle and not self.has_viewers():
+            publish_preview = False
+            metrics.preview_skipped_total.inc()
+        # A frame already over budget sheds whatever optional work is left
+        if publish_preview and self.shed("preview", callback_start, budget):
+            publish_preview = False
+        draw_preview = (publish_preview and tuning.display_boxes_preview and profile.draw_overlays
+                        and not self.shed("lores_overlay", callback_start, budget))
+        if publish_preview or recording_manager.recording:
+            with MappedArray(request, "lores") as lores_m:
+                lores_frame = cv2.cvtColor(lores_m.array, cv2.COLOR_YUV2BGR_I420)
+                sx, sy = ctx.lores_scale
+
+                # Poster/sprite capture uses the clean frame, before any boxes are drawn
+                if recording_manager.recording:
+                    recording_manager.previews.offer(lores_frame, raw_detections, ctx.labels)
+
+                if publish_preview:
+                    self.last_preview = callback_start
+                    if draw_preview:
+                        draw_detections_on_frame(
+                            lores_frame,
+                            smoothed_dets,     # pass the smoothed list
+                            ctx.labels,
+                            ctx.lores_overlay,
+                            recording_manager.recording,
+                            inside_box,
+                            scale_x=sx,
+                            scale_y=sy
+                        )
+                    if self.frame_ring is not None:
+                        self.frame_ring.publish(lores_frame)
+                    else:
+                        self.latest_frame = lores_frame.copy()
+
+        callback_duration = time.perf_counter() - callback_start
+        metrics.callback_seconds.observe(callback_duration)
+        if rate:
+            frame_interval = 1.0 / rate
+            self.callback_load = 0.9 * self.callback_load + 0.1 * (callback_duration / frame_interval)
+            if callback_duration > frame_interval:
+                metrics.late_frames_total.inc()
+            if config.LOAD_SHEDDING_ENABLED:
+                self.adapt_shedding(callback_duration, budget)
+
+    # ---- Event Bus Subscribers ----
+    def log_detections_subscriber(self, event):
+        # Shed along with the callback's debug logging when the callback is over budget
+        if self.logger.isEnabledFor(logging.DEBUG) and self.shed_level <= SHED_STAGES.index("debug_log"):
+            labels_list = self.context.labels
+            for d in event.detections:
+                if self.subscriber_log_sampler.allow():
+                    self.logger.debug("Detection: %s %.2f (%d not logged)", labels_list[d.category], d.conf,
+                                      self.subscriber_log_sampler.take_suppressed())
+
+    def sidecar_subscriber(self, event):
+        if event.recording:
+            self.recording_manager.tracks.add_frame(event.timestamp, event.tracks, event.pan, event.tilt, event.acquired)
+
+    def detection_log_subscriber(self, event):
+        if event.detections:
+            self.detection_log.add(event.timestamp, event.detections, event.pan, event.tilt)
+
+    def status_subscriber(self, event):
+        labels_list = self.context.labels
+        # Rounded so servo jitter and confidence noise do not count as changes
+        self.status_broadcaster.update({
+            "auto_mode": event.auto_mode,
+            "is_recording": event.recording,
+            "water_pistol_active": self.water_pistol.active,
+            "current_pan_angle": round(event.pan, 1),
+            "current_tilt_angle": round(event.tilt, 1),
+            "acquired": event.acquired,
+            "idle": self.idle,
+            "targets": [{"label": labels_list[t.category], "conf": round(t.conf, 2)} for t in event.tracks],
+        })
+
+    def model_stats_subscriber(self, event):
+        labels_list = self.context.labels
+        self.model_manager.note_detections(
+            event.timestamp,
+            [labels_list[d.category] for d in event.detections if d.category < len(labels_list)]
+        )
+
+    def site_subscriber(self, event):
+        # The raw detections, the smoothed tracks merge every object of a label into one
+        labels_list = self.context.labels
+        main_w, main_h = self.context.main_size
+        center_x, _ = self.context.main_center
+        pan_scale = live_config.current().pan_scale
+        tracks = [
+            site_protocol.TrackSummary(
+                labels_list[d.category] if d.category < len(labels_list) else str(d.category),
+                d.conf,
+                (d.box[0] / main_w, d.box[1] / main_h, d.box[2] / main_w, d.box[3] / main_h),
+                d.track_id,
+                # Site bearing: the pan that would aim at it, turned by the turret's heading
+                (self.settings.site_heading + event.pan + (d.box[0] + d.box[2] / 2 - center_x) * pan_scale) % 360
+            )
+            for d in event.detections
+        ]
+        flags = ((site_protocol.ACQUIRED if event.acquired else 0)
+                 | (site_protocol.RECORDING_ACTIVE if event.recording else 0)
+                 | (site_protocol.FIRING if self.water_pistol.active else 0))
+        self.site_client.publish(tracks, event.pan, event.tilt, flags)
+
+    def start_event_subscribers(self):
+        event_bus = self.event_bus
+        if self.site_client is not None:
+            # Only the newest frame matters to the coordinator
+            event_bus.subscribe("site", self.site_subscriber, policy="latest")
+        if self.model_manager.label_switch:
+            event_bus.subscribe("model_stats", self.model_stats_subscriber, maxlen=256, policy="drop_oldest")
+        # Status streams only ever need the newest frame
+        event_bus.subscribe("status", self.status_subscriber, policy="latest")
+        if config.RECORD_DETECTION_TRACKS:
+            event_bus.subscribe("sidecar", self.sidecar_subscriber, maxlen=256, policy="drop_oldest")
+        if self.detection_log:
+            event_bus.subscribe("detection_log", self.detection_log_subscriber, maxlen=1024, policy="drop_oldest")
+        # Debug logging is the first thing to give up if it cannot keep up
+        event_bus.subscribe("debug_log", self.log_detections_subscriber, maxlen=64, policy="drop_newest")
+
+    # ---- Used by the web routes ----
+    def status_data(self):
+        """
+        Current state for /status and the WebSocket, never waits on a move in progress.
+        """
+        current_pan, current_tilt = self.servos.peek_current_angles()
+        return {
+            "auto_mode": self.auto_mode,
+            "is_recording": self.recording_manager.recording,
+            "water_pistol_active": self.water_pistol.active,
+            "current_pan_angle": current_pan,
+            "current_tilt_angle": current_tilt,
+            "idle": self.idle,
+        }
+
+    def system_info(self):
+        return {
+            "command_queue": self.command_queue.stats(),
+            "event_bus": self.event_bus.stats(),
+            "site": self.site_client.status() if self.site_client is not None else None,
+            "idle": {
+                "idle": self.idle,
+                "seconds_since_activity": round(time.monotonic() - self.last_activity, 1),
+                "frame_rate": self.camera_rate(),
+                "servos_released": self.servos_released_at is not None,
+                "viewers": self.frame_ring.readers() if self.frame_ring is not None else self.viewers,
+            },
+            "load_shedding": list(SHED_STAGES[:self.shed_level]),
+        }
+
+    def start_move(self, direction):
+        """
+        Validates a move request and runs the move on a background thread, so the
+        request returns straight away.  Returns (message, http status).
+        """
+        if self.auto_mode:
+            return "Cannot move while in AUTO mode", 400
+        if not direction:
+            return "No direction provided", 400
+        if direction not in MOVE_DIRECTIONS:
+            return f"Unknown direction: {direction}", 400
+
+        delta_pan, delta_tilt = MOVE_DIRECTIONS[direction]
+        # Clicks made while a move is running are added up and done as one move afterwards
+        with self.move_lock:
+            pending_pan, pending_tilt = self.pending_move
+            self.pending_move = (pending_pan + delta_pan, pending_tilt + delta_tilt)
+            self.move_wake.set()
+        return "OK", 200
+
+    def move_worker(self):
+        """
+        Carries out the manual moves from start_move() one after another on one thread.
+        """
+        while True:
+            self.move_wake.wait()
+            with self.move_lock:
+                delta_pan, delta_tilt = self.pending_move
+                self.pending_move = (0.0, 0.0)
+                self.move_wake.clear()
+            try:
+                # Read the angles here, after any earlier move has finished, so quick clicks add up
+                tuning = live_config.current()
+                current_pan, current_tilt = self.servos.get_current_angles()
+                self.servos.move_to(current_pan + delta_pan, current_tilt + delta_tilt,
+                                    steps=tuning.move_steps, step_delay=tuning.move_step_delay)
+            except Exception as e:
+                self.logger.error(f"Manual move failed: {e}")
+
+    # ---- Controller Loop to Actually Start/Stop Recording ----
+    def handle_start_recording(self):
+        # Only start if not already recording (the callback and web page may both ask)
+        if not self.recording_manager.recording:
+            self.recording_manager.start_recording()
+
+    def handle_stop_recording(self):
+        # Only stop if we are currently recording
+        if self.recording_manager.recording:
+            self.recording_manager.stop_recording()
+            self.handle_reconfigure()
+            self.logger.info("Preview re-started after stopping recording.")
+
+    def handle_home(self):
+        self.pan_tilt.move_home_async()
+
+    def handle_set_mode(self, auto):
+        if auto:
+            self.water_pistol.stop()
+            self.target_tracker.reset()
+            tuning = live_config.current()
+            home_pan, home_tilt = self.home_angles(tuning)
+            self.servos.move_to(home_pan, home_tilt,
+                                steps=tuning.move_steps, step_delay=tuning.move_step_delay)
+            self.auto_mode = True
+            self.logger.info("Switched to AUTO mode")
+        else:
+            self.auto_mode = False
+            self.logger.info("Switched to MANUAL mode")
+
+    def handle_reconfigure(self):
+        # Camera (re)configuration must happen here, not inside the callback
+        self.picam2.configure(self.video_config)
+        self.configure_pipeline()
+        self.picam2.start(show_preview=SHOW_PREVIEW)
+        with self.idle_lock:
+            if self.idle:
+                self.picam2.set_controls({"FrameRate": self.camera_rate()})
+
+    def handle_update_zones(self, zones):
+        self.zone_list = zones
+        # Rasterised once here, the callback picks up the new context on its next frame
+        self.configure_pipeline()
+        self.logger.info(f"Zones updated: {len(zones)} zones")
+
+    def handle_enter_idle(self):
+        """
+        Drops to IDLE_FRAME_RATE and parks the servos at home with their pulses off.  The
+        callback wakes the pipeline again on the next detection.
+        """
+        with self.idle_lock:
+            self.idle_pending = False
+            if self.idle or time.monotonic() - self.last_activity < config.IDLE_AFTER:
+                return
+            self.idle_since = time.monotonic()
+            self.idle = True
+            self.picam2.set_controls({"FrameRate": self.camera_rate()})
+        self.metrics.idle_entries_total.inc()
+        self.logger.info(f"Idle after {config.IDLE_AFTER:.0f} s without detections, {self.camera_rate()} fps")
+        if config.IDLE_RELEASE_SERVOS:
+            self.pan_tilt.home()
+            # If a detection woke us during the move the queued "wake" powers them again anyway
+            if self.idle:
+                self.servos.release()
+                self.servos_released_at = time.monotonic()
+
+    def handle_wake(self):
+        if self.servos_released_at is not None:
+            self.metrics.servos_released_seconds_total.inc(time.monotonic() - self.servos_released_at)
+            self.servos_released_at = None
+            # Drive the servos at their parked angles again, tracking carries on from there
+            current_pan, current_tilt = self.servos.get_current_angles()
+            self.servos.move_to(current_pan, current_tilt, steps=1, step_delay=0)
+        self.logger.info(f"Awake, back to {self.frame_rate} fps")
+
+    def handle_apply_profile(self):
+        """
+        Applies the governor's current profile to the camera.  The frame rate changes straight
+        away.  A new preview resolution needs the camera stopped, so while recording it waits
+        for handle_stop_recording() to reconfigure the camera.
+        """
+        resize = self.profile_lores_size() != tuple(self.context.lores_size)
+        self.video_config = self.make_video_config(self.intrinsics)
+        if resize and not self.recording_manager.recording:
+            self.picam2.stop()
+            self.handle_reconfigure()
+        else:
+            with self.idle_lock:
+                self.picam2.set_controls({"FrameRate": self.camera_rate()})
+            if resize:
+                self.logger.info("New preview resolution applied once the recording stops")
+        self.logger.info(f"Applied performance profile {governor.profile.name} ({self.frame_rate} fps)")
+
+    def handle_switch_model(self, name, reason="request"):
+        """
+        Swaps the IMX500 network on the running system.  The camera is stopped for the
+        firmware upload, so this is refused while recording (the scheduler simply asks again).
+        """
+        model_manager = self.model_manager
+        if name == model_manager.current:
+            return
+        if self.recording_manager.recording:
+            self.logger.info(f"Not switching model to {name} while recording")
+            return
+        info = model_manager.resolve(name)
+        old_name = model_manager.current
+
+        switch_start = time.monotonic()
+        # No callbacks run while the camera is stopped, so the network, intrinsics, labels
+        # and pipeline context all change together
+        self.picam2.stop()
+        model_manager.switch_started(old_name, name, reason)
+        try:
+            new_imx500, new_intrinsics = load_network(info.network_path, info.labels_path, self.settings.camera_id)
+        except Exception as e:
+            self.logger.error(f"Failed to load model {name}: {e}")
+            model_manager.switch_failed(e)
+            # IMX500() may already have handed the new network to the sensor, so load the old one again
+            self.imx500, self.intrinsics = load_network(*self.network_files, self.settings.camera_id)
+            self.picam2.start(show_preview=SHOW_PREVIEW)
+            return
+        self.imx500, self.intrinsics = new_imx500, new_intrinsics
+        self.network_files = (info.network_path, info.labels_path)
+
+        # Category numbers mean something else with the new labels
+        self.smoother.reset()
+        self.target_tracker.reset()
+
+        self.video_config = self.make_video_config(self.intrinsics)
+        self.picam2.configure(self.video_config)
+        self.configure_pipeline()
+        if self.detection_log:
+            self.detection_log.set_stream_info(self.context.labels, self.context.main_size)
+        self.picam2.start(show_preview=SHOW_PREVIEW)
+        if hasattr(self.intrinsics, "preserve_aspect_ratio") and self.intrinsics.preserve_aspect_ratio:
+            self.imx500.set_auto_aspect_ratio()
+        model_manager.switch_loaded(name, time.monotonic() - switch_start)
+
+    def controller_loop(self):
+        """
+        Carries out the commands queued by the camera callback and web routes, to avoid
+        deadlock in the camera callback.  Blocks on the queue so it reacts immediately.
+        """
+        while True:
+            command = self.command_queue.get()
+            handler = self.command_handlers.get(command.name)
+            if handler is None:
+                self.logger.warning(f"Unknown command {command.name}")
+                continue
+            try:
+                handler(**command.args)
+            except Exception as e:
+                self.logger.error(f"Command {command.name} failed: {e}")
+
+    # ---- Start up phases, run concurrently by startup.py ----
+    def startup_servos(self):
+        self.servos.init()
+        self.pan_tilt = PanTiltControllerWrapper(self.servos, self.home_angles)
+        # No tracking moves until startup_homing() has finished
+        self.pan_tilt.is_moving = True
+
+    def startup_homing(self):
+        # Let the PCA9685 settle before the first move
+        time.sleep(1.0)
+        self.pan_tilt.home()
+        self.pan_tilt.is_moving = False
+
+    def startup_network(self):
+        # 1) Initialize IMX500, 2) with the pipeline's labels, else "assets/coco_labels.txt"
+        self.imx500, self.intrinsics = load_network(self.settings.model, self.settings.labels, self.settings.camera_id)
+        self.network_files = (self.settings.model, self.settings.labels)
+
+    def startup_camera(self):
+        # 3) Set up Picamera2, starting it uploads the network firmware to the IMX500
+        self.picam2 = Picamera2(self.imx500.camera_num)
+        self.video_config = self.make_video_config(self.intrinsics)
+        self.picam2.configure(self.video_config)
+        self.configure_pipeline()
+        self.picam2.start(show_preview=SHOW_PREVIEW)
+        if hasattr(self.intrinsics, "preserve_aspect_ratio") and self.intrinsics.preserve_aspect_ratio:
+            self.imx500.set_auto_aspect_ratio()
+
+    def startup_guarding(self):
+        # 4) Create the controllers, 5) then assign the pre_callback to handle detection + overlay
+        if config.DETECTION_LOG_ENABLED:
+            self.detection_log = DetectionLog(
+                self.settings.detection_log_directory,
+                flush_interval=config.DETECTION_LOG_FLUSH_INTERVAL,
+                max_days=config.DETECTION_LOG_MAX_DAYS
+            )
+            self.detection_log.set_stream_info(self.context.labels, self.context.main_size)
+            self.detection_log.start()
+        self.water_pistol = WaterPistolController(self.settings.relay_pin, self.metrics, self.logger)
+        self.recording_manager = RecordingManager(self)
+        tuning = live_config.current()
+        self.target_tracker = TargetTracker(
+            tuning.activation_detections,
+            tuning.activation_time_window,
+            tuning.no_detection_timeout,
+            self.logger
+        )
+        live_config.subscribe(self.target_tracker.apply_tuning)
+        # Camera changes for a new performance profile are made on the controller thread
+        governor.subscribe(lambda profile, transition: self.command_queue.put("apply_profile"))
+        self.model_manager = ModelManager(
+            config.MODELS_DIRECTORY,
+            current=os.path.basename(os.path.dirname(self.settings.model)),
+            schedule=config.MODEL_SCHEDULE,
+            label_switch=config.MODEL_LABEL_SWITCH,
+            stats_window=config.MODEL_STATS_WINDOW,
+            stats_min_detections=config.MODEL_STATS_MIN_DETECTIONS,
+            stats_hold=config.MODEL_STATS_HOLD,
+            check_interval=config.MODEL_SCHEDULER_INTERVAL
+        )
+        self.model_manager.start(lambda name, reason: self.command_queue.put("switch_model", name=name, reason=reason))
+        if config.SITE_COORDINATOR:
+            self.site_client = SiteClient(
+                config.SITE_COORDINATOR,
+                self.settings.site_unit_id,
+                min_interval=config.SITE_PUBLISH_INTERVAL,
+                assignment_timeout=config.SITE_ASSIGNMENT_TIMEOUT,
+                labels={"pipeline": self.name}
+            )
+            self.site_client.start()
+        self.start_event_subscribers()
+        self.picam2.pre_callback = self.frame_callback
+
+    def add_startup_phases(self, startup):
+        """
+        Adds this pipeline's phases, named "<phase>:<pipeline name>".  Needs the shared "stores" phase.
+        """
+        name = self.name
+        startup.add(f"servos:{name}", self.startup_servos)
+        startup.add(f"homing:{name}", self.startup_homing, after=(f"servos:{name}",))
+        startup.add(f"network:{name}", self.startup_network)
+        startup.add(f"camera:{name}", self.startup_camera, after=(f"network:{name}",))
+        startup.add(f"guarding:{name}", self.startup_guarding, after=(f"camera:{name}", f"servos:{name}", "stores"))
 
+    def stop(self):
+        if self.water_pistol is not None:
+            self.water_pistol.stop()
+        if self.detection_log:
+            self.detection_log.stop()
+
+# (pan, tilt) change in degrees for each /move direction
+MOVE_DIRECTIONS = {
+    "up":    (0.0, 5.0),
+    "down":  (0.0, -5.0),
+    "left":  (5.0, 0.0),
+    "right": (-5.0, 0.0),
+}
 
 # -----------------------------------------------------------------------------
-#  Main Loop to Actually Start/Stop Recording
+#  Shared start up phases, run concurrently by startup.py
 # -----------------------------------------------------------------------------
-def main_loop():
-    """
-    Periodically checks if we need to start or stop recording, to avoid deadlock
-    in the camera callback.
-    """
-    while True:
-        global recording_requested, recording_stop_requested
-
-        # Start recording if requested, but only if not already recording
-        if recording_requested and not recording_manager.recording:
-            recording_manager.start_recording()
-            recording_requested = False
-
-        # Stop recording if requested, but only if we are currently recording
-        if recording_stop_requested and recording_manager.recording:
-            recording_manager.stop_recording()
-            recording_stop_requested = False
-            picam2.configure(video_config)
-            picam2.start(show_preview=SHOW_PREVIEW)
-            logger.info("Preview re-started after stopping recording.")
-            # If you want to reconfigure picam2 or do something else, do it here
-            # (not inside the callback)
-
-        time.sleep(0.05)
+def startup_stores():
+    # 4) Recordings, retention and the system sampler, shared by the pipelines and independent of the cameras
+    global recording_catalog, retention_manager
+    system_sampler.start()
+    recording_catalog = RecordingCatalog(SAVE_DIRECTORY)
+    if config.RETENTION_ENABLED:
+        retention_manager = RetentionManager(
+            recording_catalog,
+            max_mb=config.RETENTION_MAX_MB,
+            max_age_days=config.RETENTION_MAX_AGE_DAYS,
+            reserve_mb=config.RETENTION_RESERVE_MB,
+            low_value_conf=config.RETENTION_LOW_VALUE_CONF,
+            check_interval=config.RETENTION_CHECK_INTERVAL,
+            evictions_per_pass=config.RETENTION_EVICTIONS_PER_PASS,
+            keep_recent=config.RETENTION_KEEP_RECENT
+        )
+        retention_manager.start()
+
+def startup_web():
+    # 6) Start the Flask server in a background thread (or its own process), it answers 503 until start up is done
+    global velocity_controller
+    if config.WEB_SERVER_PROCESS:
+        start_web_process()
+    elif config.WEB_TIER == "async":
+        velocity_controller = VelocityController(default_pipeline(), config.JOYSTICK_MAX_SPEED,
+                                                 timeout=config.JOYSTICK_TIMEOUT)
+        threading.Thread(target=start_async_web_server, daemon=True).start()
+    else:
+        threading.Thread(target=start_web_server, daemon=True).start()
 
 # -----------------------------------------------------------------------------
 #  Main Program
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
-    # 1) Initialize IMX500
-    imx500 = IMX500(config.MODEL)
-    intrinsics = imx500.network_intrinsics
-    if not intrinsics:
-        intrinsics = NetworkIntrinsics()
-        intrinsics.task = "object detection"
-    elif intrinsics.task != "object detection":
-        logger.info("Network is not an object detection task.")
+    start_logging()
+    detect_platform()
+    try:
+        all_settings = load_pipeline_settings(config)
+    except ValueError as e:
+        logger.error(f"Invalid PIPELINES: {e}")
         sys.exit(1)
-
-    # 2) Set intrinsics.labels from config.LABELS, else "assets/coco_labels.txt"
-    if config.LABELS:
-        with open(config.LABELS, "r") as f:
-            intrinsics.labels = f.read().splitlines()
-    else:
-        with open("assets/coco_labels.txt", "r") as f:
-            intrinsics.labels = f.read().splitlines()
-
-    if hasattr(intrinsics, "ignore_dash_labels"):
-        intrinsics.ignore_dash_labels = config.IGNORE_DASH_LABELS
-    if hasattr(intrinsics, "postprocess"):
-        intrinsics.postprocess = config.POSTPROCESS
-    if hasattr(intrinsics, "bbox_normalization"):
-        intrinsics.bbox_normalization = config.BBOX_NORMALIZATION
-    if hasattr(intrinsics, "bbox_order"):
-        intrinsics.bbox_order = config.BBOX_ORDER
-    if hasattr(intrinsics, "preserve_aspect_ratio"):
-        intrinsics.preserve_aspect_ratio = config.PRESERVE_ASPECT_RATIO
-    intrinsics.update_with_defaults()
+    try:
+        profiles = load_profiles(config.PERFORMANCE_PROFILES)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Invalid PERFORMANCE_PROFILES: {e}")
+        sys.exit(1)
+    governor = PerformanceGovernor(
+        profiles,
+        config.GOVERNOR_LIMITS,
+        # The worst pipeline decides, they share the CPU
+        get_callback_load=lambda: max((t.callback_load for t in pipelines.values()), default=None),
+        interval=config.GOVERNOR_INTERVAL,
+        degrade_after=config.GOVERNOR_DEGRADE_AFTER,
+        recover_after=config.GOVERNOR_RECOVER_AFTER
+    )
 
     if config.PRINT_INTRINSICS:
-        logger.info(intrinsics)
-        print(intrinsics)
+        for settings in all_settings:
+            imx500, intrinsics = load_network(settings.model, settings.labels, settings.camera_id)
+            logger.info(f"{settings.name}: {intrinsics}")
+            print(intrinsics)
         sys.exit(0)
 
-    # 3) Set up Picamera2
-    picam2 = Picamera2(imx500.camera_num)
-    video_config = picam2.create_video_configuration(
-        main={"size": config.MAIN_STREAM_RESOLUTION},
-        lores={"size": config.LOW_RES_STREAM_RESOLUTION, "format": "YUV420"},
-        controls={"FrameRate": intrinsics.inference_rate},
-        buffer_count=12,
-        transform=Transform(
-            hflip=config.FLIP_HORIZONTALLY,
-            vflip=config.FLIP_VERTICALLY
-        )
-    )
-    picam2.configure(video_config)
-    picam2.start(show_preview=SHOW_PREVIEW)
-    if hasattr(intrinsics, "preserve_aspect_ratio") and intrinsics.preserve_aspect_ratio:
-        imx500.set_auto_aspect_ratio()
-
-    # 4) Create global controllers
-    pan_tilt = PanTiltControllerWrapper(MOVE_STEPS, MOVE_STEP_DELAY)
-    water_pistol = WaterPistolController()
-    recording_manager = RecordingManager(picam2)
-    target_tracker = TargetTracker(
-        config.ACTIVATION_DETECTIONS,
-        config.ACTIVATION_TIME_WINDOW,
-        config.NO_DETECTION_TIMEOUT
-    )
-
-    # 5) Assign the pre_callback to handle detection + overlay (but no direct record calls)
-    picam2.pre_callback = do_frame_callback
-
-    # 6) Start the Flask server in a background thread
-    flask_thread = threading.Thread(target=start_web_server, daemon=True)
-    flask_thread.start()
+    for settings in all_settings:
+        pipelines[settings.name] = TurretPipeline(settings)
+    logger.info(f"Pipelines: {', '.join(pipelines)}")
+
+    # 1) - 6) Run the start up phases, each as soon as the phases it needs are done
+    startup.add("stores", startup_stores)
+    for turret in pipelines.values():
+        turret.add_startup_phases(startup)
+    # The web process needs the stream sizes for its frame rings, the threaded servers need nothing
+    camera_phases = tuple(f"camera:{name}" for name in pipelines)
+    startup.add("web", startup_web, after=camera_phases if config.WEB_SERVER_PROCESS else ())
+    failed = startup.run()
+    if failed:
+        logger.error(f"Start up failed: {', '.join(failed)}")
+        sys.exit(1)
+    if config.PERFORMANCE_GOVERNOR_ENABLED:
+        governor.start()
 
-    # 7) Run main loop to actually start/stop recording outside callback
+    # 7) Each pipeline's controller loop actually starts/stops recording outside its callback
+    for turret in pipelines.values():
+        threading.Thread(target=turret.controller_loop, name=f"controller_{turret.name}", daemon=True).start()
     try:
-        main_loop()
+        while True:
+            time.sleep(3600)
     except KeyboardInterrupt:
         logger.info("Shutting down...")
-        water_pistol.stop()
+        for turret in pipelines.values():
+            turret.stop()
         sys.exit(0)
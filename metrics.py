@@ -0,0 +1,202 @@
+# metrics.py
+"""
+Counters, gauges and histograms exported in the Prometheus text format on /metrics.
+
+Each process has one registry.  Modules create their metrics at import time
+(registry.counter(...) returns the existing metric if the name is already
+registered) and update them from the hot paths; an update is one small lock
+and an addition, so it is safe from the camera callback.  Rendering only
+reads the current values, so a scrape costs well under a millisecond.
+
+Metric families used by this project all start with "turret_".  A metric
+can carry fixed labels, e.g. labels={"pipeline": "left"} when main.py runs
+several pipelines; every label set of a name is its own metric and they are
+rendered together under one HELP/TYPE.
+"""
+
+import bisect
+import threading
+
+# Default histogram buckets in seconds, spanning a fast callback to a slow I2C write
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def format_labels(labels):
+    """
+    {"pipeline": "left"} -> 'pipeline="left"', sorted so the same labels always give the same text.
+    """
+    if not labels:
+        return ""
+    return ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+
+
+def sample_name(name, labels):
+    return f"{name}{{{labels}}}" if labels else name
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=""):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        return [(sample_name(self.name, self.labels), self.value)]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None, labels=""):
+        """
+        function, if given, is called at scrape time for the value instead of set().
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.function = function
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [(sample_name(self.name, self.labels), self.function())]
+            except Exception:
+                # Whatever the function reads may not exist yet during start up
+                return []
+        return [(sample_name(self.name, self.labels), self.value)]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS, labels=""):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket plus the +Inf bucket, not cumulative until rendered
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+
+    def samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.total
+        result = []
+        cumulative = 0
+        prefix = f"{self.labels}," if self.labels else ""
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            result.append((f'{self.name}_bucket{{{prefix}le="{format_value(bound)}"}}', cumulative))
+        result.append((sample_name(f"{self.name}_sum", self.labels), total))
+        result.append((sample_name(f"{self.name}_count", self.labels), cumulative))
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric_class, name, *args, labels=None, **kwargs):
+        labels = format_labels(labels)
+        with self.lock:
+            metric = self.metrics.get((name, labels))
+            if metric is None:
+                # All label sets of a name must be the same kind of metric
+                other = next((m for (n, _), m in self.metrics.items() if n == name), None)
+                if other is not None and not isinstance(other, metric_class):
+                    raise ValueError(f"Metric {name} is already registered as a {other.kind}")
+                metric = metric_class(name, *args, labels=labels, **kwargs)
+                self.metrics[(name, labels)] = metric
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, labels=None):
+        return self.register(Counter, name, help_text, labels=labels)
+
+    def gauge(self, name, help_text, function=None, labels=None):
+        return self.register(Gauge, name, help_text, function=function, labels=labels)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, labels=None):
+        return self.register(Histogram, name, help_text, buckets=buckets, labels=labels)
+
+    def render(self, exclude=()):
+        """
+        exclude: family names to leave out, e.g. the ones another process already rendered.
+        """
+        # Label sets of one name are grouped under a single HELP/TYPE
+        families = {}
+        for metric in list(self.metrics.values()):
+            if metric.name in exclude:
+                continue
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, metrics in families.items():
+            lines.append(f"# HELP {name} {metrics[0].help_text}")
+            lines.append(f"# TYPE {name} {metrics[0].kind}")
+            for metric in metrics:
+                for sample, value in metric.samples():
+                    if value is None:
+                        continue
+                    lines.append(f"{sample} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# The registry of this process
+registry = Registry()
+
+# Content type of the Prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def stream_metrics():
+    """
+    JPEG encode time and MJPEG client count, shared by whichever web tier does the encoding.
+    Registered on first use so only the process that streams exports them.
+    """
+    return (
+        registry.histogram("turret_jpeg_encode_seconds", "Time to JPEG encode one preview frame"),
+        registry.gauge("turret_stream_clients", "Connected /video_feed clients"),
+    )
+
+
+def family_names(body):
+    """
+    Names of the metric families in a rendered body, from its TYPE lines.
+    """
+    return {line.split()[2] for line in body.splitlines() if line.startswith("# TYPE ")}
@@ -0,0 +1,274 @@
+# model_benchmark.py
+"""
+Benchmarks the models in models/ against each other.
+
+For every model directory (network.rpk, labels.txt, best_imx_MemoryReport.json)
+it reports the on-chip memory use from the memory report and, if there are
+recorded output tensors for it (see test_scripts/record_tensors.py), the
+host-side post-processing time per frame, the detections per frame and, for
+frames that have labels, the precision and recall per class.
+
+    python model_benchmark.py --recordings recordings/ --output model_report.json
+
+The post-processing is detection_postprocess.decode_outputs(), the same code
+the camera callback runs, with the threshold, IOU and box settings from
+my_configuration.py / config.json unless given on the command line.  The
+report is JSON; a summary table is printed as well.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+import live_config
+from detection_postprocess import decode_outputs
+from model_manager import list_models
+
+config = live_config.config
+
+MEMORY_REPORT = "best_imx_MemoryReport.json"
+SIZE_UNITS = {"B": 1 / (1024 * 1024), "KB": 1 / 1024, "MB": 1.0, "GB": 1024.0}
+
+
+def parse_size_mb(text):
+    """
+    "5.27MB" -> 5.27, as written in the memory reports.
+    """
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([KMG]?B)\s*", text)
+    if not match:
+        raise ValueError(f"Unknown size {text!r}")
+    return float(match.group(1)) * SIZE_UNITS[match.group(2)]
+
+
+def read_memory_report(model_dir):
+    path = os.path.join(model_dir, MEMORY_REPORT)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as f:
+        report = json.load(f)["Memory Report"]
+    return {
+        "runtime_mb": round(parse_size_mb(report["Runtime Memory Physical Size"]), 3),
+        "model_mb": round(parse_size_mb(report["Model Memory Physical Size"]), 3),
+        "usage_mb": round(parse_size_mb(report["Memory Usage"]), 3),
+        "available_mb": round(parse_size_mb(report["Total Memory Available On Chip"]), 3),
+        "utilization_pct": float(report["Memory Utilization"].rstrip("%")),
+        "fits_in_chip": report["Fit In Chip"],
+    }
+
+
+def read_labels(labels_path):
+    # Same filtering as get_labels() in main.py, class numbers index into what is left
+    with open(labels_path or "assets/coco_labels.txt", "r") as f:
+        labels = f.read().splitlines()
+    if config.IGNORE_DASH_LABELS:
+        labels = [label for label in labels if label and label != "-"]
+    return labels
+
+
+def read_ground_truth(txt_path, class_names):
+    """
+    [(label, (x0, y0, x1, y1))] from a YOLO format label file, coordinates 0.0 - 1.0 of the image.
+    """
+    objects = []
+    with open(txt_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            cx, cy, w, h = (float(v) for v in parts[1:])
+            objects.append((class_names[int(parts[0])], (cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2)))
+    return objects
+
+
+def to_image_box(box, input_rect):
+    """
+    A decoded box, (y0, x0, y1, x1) of the network input as convert_inference_coords() takes
+    them, to (x0, y0, x1, y1) of the image using the recorded input rectangle.
+    """
+    y0, x0, y1, x1 = box
+    rx, ry, rw, rh = input_rect
+    return (rx + x0 * rw, ry + y0 * rh, rx + x1 * rw, ry + y1 * rh)
+
+
+def box_iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def match_frame(detections, truth, match_iou, counts):
+    """
+    Greedy matching by score, a detection is a true positive if it overlaps an unmatched
+    labelled object of the same class by at least match_iou.  Updates counts[label].
+    """
+    matched = set()
+    for label, box, _ in sorted(detections, key=lambda d: -d[2]):
+        best, best_iou = None, match_iou
+        for i, (truth_label, truth_box) in enumerate(truth):
+            if i in matched or truth_label != label:
+                continue
+            overlap = box_iou(box, truth_box)
+            if overlap >= best_iou:
+                best, best_iou = i, overlap
+        entry = counts.setdefault(label, {"tp": 0, "fp": 0, "fn": 0})
+        if best is None:
+            entry["fp"] += 1
+        else:
+            matched.add(best)
+            entry["tp"] += 1
+    for i, (truth_label, _) in enumerate(truth):
+        if i not in matched:
+            counts.setdefault(truth_label, {"tp": 0, "fp": 0, "fn": 0})["fn"] += 1
+
+
+def precision_recall(entry):
+    tp, fp, fn = entry["tp"], entry["fp"], entry["fn"]
+    return {
+        **entry,
+        "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+    }
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 4)
+
+
+def benchmark_recording(frame_files, labels, class_names, settings, repeat, match_iou):
+    timings = []
+    detection_counts = []
+    counts = {}
+    labelled_frames = 0
+    for npz_path in frame_files:
+        with np.load(npz_path) as data:
+            outputs = [data[f"out{i}"] for i in range(sum(1 for k in data.files if k.startswith("out")))]
+            input_size = tuple(int(v) for v in data["input_size"])
+            input_rect = tuple(float(v) for v in data["input_rect"]) if "input_rect" in data.files else (0, 0, 1, 1)
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            boxes, scores, classes = decode_outputs(outputs, input_size, **settings)
+            timings.append(time.perf_counter() - start)
+        detection_counts.append(len(scores))
+
+        txt_path = npz_path[:-len(".npz")] + ".txt"
+        if class_names is None or not os.path.isfile(txt_path):
+            continue
+        labelled_frames += 1
+        detections = [
+            (labels[int(c)] if int(c) < len(labels) else str(int(c)), to_image_box(box, input_rect), float(s))
+            for box, s, c in zip(boxes, scores, classes)
+        ]
+        match_frame(detections, read_ground_truth(txt_path, class_names), match_iou, counts)
+
+    result = {
+        "frames": len(frame_files),
+        "postprocess_ms": {
+            "mean": round(float(np.mean(timings)) * 1000, 4),
+            "p50": percentile_ms(timings, 50),
+            "p95": percentile_ms(timings, 95),
+            "max": round(max(timings) * 1000, 4),
+        },
+        "detections_per_frame": round(float(np.mean(detection_counts)), 3),
+        "labelled_frames": labelled_frames,
+    }
+    if labelled_frames:
+        total = {"tp": 0, "fp": 0, "fn": 0}
+        for entry in counts.values():
+            for key in total:
+                total[key] += entry[key]
+        result["overall"] = precision_recall(total)
+        result["per_class"] = {label: precision_recall(entry) for label, entry in sorted(counts.items())}
+    return result
+
+
+def benchmark_model(info, recordings, class_names, settings, repeat, match_iou):
+    model_dir = os.path.dirname(info.network_path)
+    labels = read_labels(info.labels_path)
+    result = {
+        "name": info.name,
+        "network_mb": round(os.path.getsize(info.network_path) / (1024 * 1024), 3),
+        "labels": labels,
+        "memory": read_memory_report(model_dir),
+    }
+    frame_files = sorted(glob.glob(os.path.join(recordings, info.name, "frame_*.npz"))) if recordings else []
+    if frame_files:
+        result.update(benchmark_recording(frame_files, labels, class_names, settings, repeat, match_iou))
+    return result
+
+
+def show(value, fmt):
+    return format(value, fmt) if value is not None else "-"
+
+
+def print_summary(report):
+    print(f"{'model':<45} {'mem %':>6} {'frames':>7} {'ms p50':>8} {'ms p95':>8} {'dets/f':>7} {'prec':>6} {'recall':>6}")
+    for model in report["models"]:
+        memory = model["memory"]
+        overall = model.get("overall", {})
+        timing = model.get("postprocess_ms", {})
+        print(f"{model['name']:<45} "
+              f"{show(memory and memory['utilization_pct'], '>6.0f'):>6} "
+              f"{model.get('frames', 0):>7} "
+              f"{show(timing.get('p50'), '>8.3f'):>8} "
+              f"{show(timing.get('p95'), '>8.3f'):>8} "
+              f"{show(model.get('detections_per_frame'), '>7.2f'):>7} "
+              f"{show(overall.get('precision'), '>6.3f'):>6} "
+              f"{show(overall.get('recall'), '>6.3f'):>6}")
+
+
+def main():
+    tuning = live_config.current()
+    parser = argparse.ArgumentParser(description="Benchmark the IMX500 models")
+    parser.add_argument("--models", default=config.MODELS_DIRECTORY, help="Models directory")
+    parser.add_argument("--recordings", help="Recorded output tensors, one sub directory per model")
+    parser.add_argument("--output", help="Write the JSON report here (printed if not given)")
+    parser.add_argument("--threshold", type=float, default=tuning.threshold)
+    parser.add_argument("--iou", type=float, default=tuning.iou)
+    parser.add_argument("--max-detections", type=int, default=tuning.max_detections)
+    parser.add_argument("--top-k", type=int, default=config.NMS_TOP_K, help="Candidates kept for NMS (yolov8)")
+    parser.add_argument("--match-iou", type=float, default=0.5, help="Overlap for a detection to count as correct")
+    parser.add_argument("--repeat", type=int, default=5, help="Times each frame is post-processed for the timing")
+    args = parser.parse_args()
+
+    settings = {
+        "postprocess": config.POSTPROCESS,
+        "bbox_normalization": config.BBOX_NORMALIZATION,
+        "bbox_order": config.BBOX_ORDER,
+        "threshold": args.threshold,
+        "iou": args.iou,
+        "max_detections": args.max_detections,
+        "top_k": args.top_k,
+    }
+    class_names = None
+    if args.recordings and os.path.isfile(os.path.join(args.recordings, "classes.txt")):
+        with open(os.path.join(args.recordings, "classes.txt"), "r") as f:
+            class_names = [line.strip() for line in f if line.strip()]
+
+    report = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {**settings, "match_iou": args.match_iou, "repeat": args.repeat},
+        "models": [
+            benchmark_model(info, args.recordings, class_names, settings, args.repeat, args.match_iou)
+            for info in list_models(args.models).values()
+        ],
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+    print_summary(report)
+
+
+if __name__ == "__main__":
+    main()
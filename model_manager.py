@@ -0,0 +1,209 @@
+# model_manager.py
+"""
+Keeps track of the IMX500 networks in the models directory and decides which
+one should be running.
+
+Each sub directory of models/ holding a network.rpk (and normally a
+labels.txt) is one model, named after the directory.  The specialised
+models (foxes, herons, cats...) are more accurate for their class than the
+all-classes model, so the scheduler can pick one:
+
+    by time   - MODEL_SCHEDULE, e.g. the fox model at night, herons at dawn
+    by stats  - MODEL_LABEL_SWITCH, e.g. once the running model has seen
+                enough foxes recently, switch to the fox model and stay on
+                it while foxes keep being detected
+
+The actual switch (stopping the camera and loading the new network) is done
+by main.py on the controller thread; this module only asks for it and keeps
+the history of switches and how long each took.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import NamedTuple
+
+logger = logging.getLogger("my_app_logger.model_manager")
+
+
+class ModelInfo(NamedTuple):
+    name: str
+    network_path: str
+    labels_path: str      # None if the model has no labels.txt
+
+
+def list_models(directory):
+    """
+    {name: ModelInfo} for every model directory, sorted by name.
+    """
+    models = {}
+    if not os.path.isdir(directory):
+        return models
+    for name in sorted(os.listdir(directory)):
+        network_path = os.path.join(directory, name, "network.rpk")
+        if not os.path.isfile(network_path):
+            continue
+        labels_path = os.path.join(directory, name, "labels.txt")
+        models[name] = ModelInfo(name, network_path, labels_path if os.path.isfile(labels_path) else None)
+    return models
+
+
+def minutes_of_day(text):
+    """
+    "HH:MM" -> minutes since midnight.
+    """
+    hours, minutes = text.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def in_window(now_minutes, start, end):
+    # Windows may wrap past midnight, e.g. 20:00 - 06:00
+    if start <= end:
+        return start <= now_minutes < end
+    return now_minutes >= start or now_minutes < end
+
+
+class ModelManager:
+    def __init__(self, directory, current, schedule=(), label_switch=None,
+                 stats_window=300.0, stats_min_detections=20, stats_hold=600.0, check_interval=30.0):
+        """
+        current:      name of the model loaded at start up, also the default when no rule applies
+        schedule:     [(start "HH:MM", end "HH:MM", model name), ...], first match wins
+        label_switch: {label: model name} for switching on recent detections
+        """
+        self.directory = directory
+        self.models = list_models(directory)
+        self.default = current
+        self.current = current
+        self.schedule = [(minutes_of_day(start), minutes_of_day(end), name) for start, end, name in schedule]
+        self.label_switch = dict(label_switch or {})
+        self.stats_window = stats_window
+        self.stats_min_detections = stats_min_detections
+        self.stats_hold = stats_hold
+        self.check_interval = check_interval
+
+        for name in [n for _, _, n in self.schedule] + list(self.label_switch.values()):
+            if name not in self.models:
+                logger.warning(f"Model {name} used in the model schedule is not in {directory}")
+
+        self.lock = threading.Lock()
+        self.recent = deque()          # (timestamp, label) of recent detections
+        self.last_seen = {}            # label -> timestamp of the last detection
+        self.history = deque(maxlen=20)
+        self.pending = None            # Switch waiting for its first inference result
+        self.request_switch = None
+
+    # ---- Detection statistics, fed from an event bus subscriber ----
+    def note_detections(self, timestamp, labels):
+        with self.lock:
+            for label in labels:
+                self.recent.append((timestamp, label))
+                self.last_seen[label] = timestamp
+            cutoff = timestamp - self.stats_window
+            while self.recent and self.recent[0][0] < cutoff:
+                self.recent.popleft()
+
+    # ---- Choosing a model ----
+    def scheduled_model(self, now):
+        t = time.localtime(now)
+        now_minutes = t.tm_hour * 60 + t.tm_min
+        for start, end, name in self.schedule:
+            if in_window(now_minutes, start, end):
+                return name
+        return self.default
+
+    def choose(self, now):
+        """
+        Returns (model name, reason) for what should be running now.
+        """
+        with self.lock:
+            # Stay on a label model while its label keeps being seen
+            for label, name in self.label_switch.items():
+                last = self.last_seen.get(label)
+                if self.current == name and last is not None and now - last < self.stats_hold:
+                    return name, f"{label} seen {int(now - last)}s ago"
+
+            counts = Counter(label for timestamp, label in self.recent if timestamp >= now - self.stats_window)
+        for label, count in counts.most_common():
+            if label in self.label_switch and count >= self.stats_min_detections:
+                return self.label_switch[label], f"{count} {label} detections in the last {int(self.stats_window)}s"
+        return self.scheduled_model(now), "schedule"
+
+    def resolve(self, name):
+        """
+        ModelInfo for name, rescanning the directory in case a model was added.  Raises KeyError.
+        """
+        if name not in self.models:
+            self.models = list_models(self.directory)
+        return self.models[name]
+
+    # ---- Scheduler thread ----
+    def start(self, request_switch):
+        """
+        request_switch(name, reason) is called whenever a different model should be running.
+        """
+        self.request_switch = request_switch
+        if not self.schedule and not self.label_switch:
+            return
+        threading.Thread(target=self.run, name="model_scheduler", daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                name, reason = self.choose(time.time())
+                if name != self.current and self.pending is None and name in self.models:
+                    logger.info(f"Model scheduler wants {name} ({reason})")
+                    self.request_switch(name, reason)
+            except Exception as e:
+                logger.error(f"Model scheduler failed: {e}")
+
+    # ---- Switch bookkeeping, called by main.py ----
+    def switch_started(self, old, new, reason):
+        self.pending = {"from": old, "to": new, "reason": reason, "time": time.time(), "started": time.monotonic()}
+
+    def switch_loaded(self, new, load_seconds):
+        """
+        The camera is running again with the new network, waiting for its first result.
+        """
+        self.current = new
+        if self.pending is not None:
+            self.pending["load_seconds"] = round(load_seconds, 3)
+
+    def first_inference(self):
+        """
+        Called from the camera callback when a result arrives while a switch is pending,
+        which is when the new network is really running.
+        """
+        pending = self.pending
+        # Results can still arrive before switch_loaded() has been called
+        if pending is None or "load_seconds" not in pending:
+            return
+        self.pending = None
+        pending["total_seconds"] = round(time.monotonic() - pending.pop("started"), 3)
+        self.history.append(pending)
+        logger.info(f"Switched model {pending['from']} -> {pending['to']} in {pending['total_seconds']}s "
+                    f"({pending['reason']})")
+
+    def switch_failed(self, error):
+        pending, self.pending = self.pending, None
+        if pending is not None:
+            pending.pop("started", None)
+            pending["error"] = str(error)
+            self.history.append(pending)
+
+    def status(self):
+        now = time.time()
+        wanted, reason = self.choose(now)
+        pending = self.pending
+        return {
+            "current": self.current,
+            "default": self.default,
+            "wanted": wanted,
+            "wanted_reason": reason,
+            "switching": None if pending is None else {k: v for k, v in pending.items() if k != "started"},
+            "models": list(self.models),
+            "history": list(self.history),
+        }
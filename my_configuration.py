@@ -7,6 +7,10 @@ RASPBERRY_PI_ZERO_2W = False # This will be auto updated by code now as will det
 #Setup the logging
 LOG_LEVEL = "DEBUG"     # or "DEBUG", "WARNING", "ERROR", "CRITICAL"
 LOG_FILE = None        # If set to a filename (e.g. "my_log.log"), logs to a file; if None, logs to console
+LOG_QUEUE_SIZE = 10000          # Log records waiting to be written, further records are dropped (and counted) rather than blocking
+LOG_DETECTIONS_PER_SECOND = 5   # At most this many per-detection DEBUG lines per second, the rest are counted in the next line
+LOG_BINARY_FILE = None          # If set (e.g. "turret_log.bin"), also keeps every record in a compact binary log for post-mortems
+LOG_BINARY_MAX_MB = 8           # Size at which the binary log is rotated to <file>.1
 
 # Servo Settings (assumes both servos are the sme type)  By default set for servo of type MG996R which can do 180 degrees
 PWM_FREQUENCY = 50
@@ -39,10 +43,23 @@ TILT_INVERT = True  # If True, tilt movement is inverted
 # Zone around center in which we do NOT move (pixels) when tracking, so if the we are within dead_zone (in the centre of the image) we wont move any further
 DEAD_ZONE = 60
 
+ZONES_FILE = "zones.json"
+# Ignore / engage / no-fire zones, drawn on the Zones page (/zones) and saved here.
+
+ZONE_GRID_WIDTH = 160
+# Width in cells of the bitmap the zones are rasterised into, the height follows the frame's aspect ratio.
+
+ZONE_TEST_POINT = "footprint"
+# Point of a detection box tested against the zones, "footprint" (middle of the bottom edge) or "centre".
+
 #Show bounding boxes
-DISPLAY_BOXES_VIDEO = True
+DISPLAY_BOXES_VIDEO = False   # Burns the boxes into the recorded video, costly at full resolution and spoils the footage
 DISPLAY_BOXES_PREVIEW = True
 
+# Save the detections of each recording to a sidecar file (<recording>.tracks.jsonl) so the
+# recordings page can draw the boxes over the clean video on demand
+RECORD_DETECTION_TRACKS = True
+
 #Smoothing
 ALPHA = 1.0        # blending factor: 0.3..0.7 typical
 FADE_FRAMES = 3    # how many consecutive frames with no detection before we remove the box
@@ -58,6 +75,62 @@ MOVE_STEP_DELAY = 0.05
 # Fire water pistol on detections
 WATER_PISTOL_ARMED = True
 
+# Idle mode, after a quiet period the camera drops to a low frame rate, the preview is only made for
+# people watching and the servos are parked at home without PWM pulses. The first detection brings
+# the full frame rate back on the next camera request.
+IDLE_ENABLED = True
+IDLE_AFTER = 600.0          # seconds without detections (in AUTO mode, not recording) before going idle
+IDLE_FRAME_RATE = 5.0       # camera frame rate while idle
+IDLE_RELEASE_SERVOS = True  # park and switch off the servo pulses while idle, stops jitter and holding current
+
+# Run the web server in its own process, preview frames are passed through shared memory and
+# everything else over a local socket, so web clients cannot slow down the camera callback
+WEB_SERVER_PROCESS = False
+WEB_SERVER_PORT = 5000
+
+# "flask" for the plain threaded Flask server, "async" to serve the video feed, moves and a
+# control WebSocket (joystick) from an asyncio server with the Flask app mounted underneath.
+# "async" needs starlette, a2wsgi and uvicorn, and is ignored when WEB_SERVER_PROCESS is set.
+WEB_TIER = "flask"
+JOYSTICK_MAX_SPEED = 30.0   # degrees per second at full joystick deflection
+JOYSTICK_TIMEOUT = 0.5      # seconds without a joystick update before the turret stops
+
+# System Info page, sampled in the background and kept as history for the charts
+SYSTEM_SAMPLE_INTERVAL = 2.0     # seconds between samples
+SYSTEM_HISTORY_SAMPLES = 900     # samples kept (30 minutes at 2 s)
+
+# Performance governor, steps down through PERFORMANCE_PROFILES (best first) when the Pi gets hot or
+# overloaded and back up once it has recovered, instead of leaving it to the firmware's thermal throttling
+PERFORMANCE_GOVERNOR_ENABLED = True
+PERFORMANCE_PROFILES = [
+    {"name": "full"},
+    {"name": "reduced", "frame_rate": 20, "preview_fps": 10, "jpeg_quality": 75, "recording_bitrate": 6000000},
+    {"name": "low", "frame_rate": 15, "lores_size": (480, 270), "preview_fps": 5, "jpeg_quality": 65,
+     "draw_overlays": False, "recording_bitrate": 4000000},
+    {"name": "minimal", "frame_rate": 10, "lores_size": (320, 180), "preview_fps": 2, "jpeg_quality": 50,
+     "draw_overlays": False, "recording_bitrate": 2000000},
+]
+# Keys: frame_rate, lores_size, preview_fps, jpeg_quality, draw_overlays, recording_bitrate, see performance_governor.py
+GOVERNOR_LIMITS = {               # (recover below, degrade above) for each signal
+    "temperature": (70.0, 78.0),  # SoC degrees C, the firmware starts throttling at 80
+    "load": (0.7, 0.95),          # 1 minute load average per core
+    "callback": (0.6, 0.9),       # camera callback time as a fraction of the frame interval
+}
+GOVERNOR_INTERVAL = 2.0           # seconds between checks
+GOVERNOR_DEGRADE_AFTER = 6.0      # seconds a signal must stay above its degrade limit before stepping down
+GOVERNOR_RECOVER_AFTER = 60.0     # seconds all signals must stay below their recover limits before stepping up
+
+# Load shedding, when the camera callback runs over its budget it skips optional work, in this order:
+# the overlay on the recording, the overlay on the preview, the preview frame itself, debug logging.
+# Parsing the detections, tracking and aiming are never skipped.
+LOAD_SHEDDING_ENABLED = True
+CALLBACK_BUDGET = 0.8             # fraction of the frame interval the callback may use
+SHED_RECOVER_FRAMES = 50          # frames in a row well within budget before one stage is done again
+
+# Status push to the web page (/status/stream)
+STATUS_STREAM_MIN_INTERVAL = 0.1   # seconds, changes within this time are sent as one update
+STATUS_STREAM_HEARTBEAT = 15.0     # seconds of no changes before a keepalive is sent
+
 #Picamera settings
 
 SHOW_PREVIEW = False # Set to false in headless mode, if running locally on PI setting to True will show the live preview in a window
@@ -74,6 +147,40 @@ FLIP_HORIZONTALLY = False
 SAVE_DIRECTORY_NAME = "./saved_videos/"
 DELETE_CONVERTED_FILES = True #If True Delete the .h264 version once converted to MP4
 
+# Recording previews, a poster image (the highest confidence detection frame) and a small sprite
+# strip are saved next to each recording so the recordings page does not need to load the videos
+GENERATE_RECORDING_PREVIEWS = True
+PREVIEW_SPRITE_FRAMES = 10       # Number of thumbnails in the sprite strip
+PREVIEW_SPRITE_INTERVAL = 1.0    # Seconds between sprite thumbnails
+PREVIEW_SPRITE_WIDTH = 160       # Width in pixels of each sprite thumbnail
+PREVIEW_JPEG_QUALITY = 85
+THUMBNAIL_CACHE_MAX_AGE = 31536000  # Seconds a browser may cache posters/sprites (they never change once written)
+
+# Serving recordings to the browser, downloads are limited so they cannot starve the live stream
+MAX_CONCURRENT_VIDEO_DOWNLOADS = 3  # Browsers open 2-3 range requests per video when seeking
+VIDEO_DOWNLOAD_WAIT = 10.0          # Seconds a request waits for a free download slot before getting a 503
+VIDEO_DOWNLOAD_RATE_LIMIT_KBPS = 0  # Per download bandwidth cap in KB/s, 0 = unlimited (keeps zero-copy sendfile)
+VIDEO_CACHE_MAX_AGE = 31536000      # Seconds a browser may cache a finished recording
+USE_X_SENDFILE = False              # Set True if a front end web server (Apache/lighttpd) handles X-Sendfile
+
+# Retention, old and least interesting recordings are deleted to stay within these budgets
+RETENTION_ENABLED = True
+RETENTION_MAX_MB = 8000          # Total size allowed for saved recordings, 0 = no limit
+RETENTION_MAX_AGE_DAYS = 30      # Delete recordings older than this, 0 = keep forever
+RETENTION_RESERVE_MB = 1024      # Free disk space always kept so the recording in progress can finish
+RETENTION_LOW_VALUE_CONF = 0.6   # Recordings with nothing identified or below this confidence are deleted first
+RETENTION_CHECK_INTERVAL = 60.0  # Seconds between background checks
+RETENTION_EVICTIONS_PER_PASS = 5 # Maximum recordings deleted per check, keeps each pass short
+RETENTION_KEEP_RECENT = 3        # The newest recordings are never deleted to make space (expired ones still are)
+
+# Detection log, every detection is appended to a compact binary file per day which can be
+# summarised with /detections/summary (e.g. how many foxes per night this month)
+DETECTION_LOG_ENABLED = True
+DETECTION_LOG_DIRECTORY = "./detection_log/"
+DETECTION_LOG_FLUSH_INTERVAL = 5.0  # Seconds between writes to disk
+DETECTION_LOG_MAX_DAYS = 365        # Day files older than this are deleted, 0 = keep forever
+DETECTION_LOG_VISIT_GAP = 10.0      # Detections of the same label closer than this (seconds) count as one visit
+
 
 
 MODEL = "models/train_all_with_herons_foxes_yolov8n_175_32/network.rpk"
@@ -107,9 +214,13 @@ MAX_DETECTIONS = 2
 IGNORE_DASH_LABELS = True
 # If True, ignore labels that are just "-" in the model's label set.
 
-POSTPROCESS = "" # or "nanodet" if needed
+POSTPROCESS = "" # or "yolov8" / "nanodet" if needed
 # Type of postprocessing to apply to raw model outputs.
-# e.g., "nanodet" if your model is a NanoDet-based architecture; otherwise None.
+# e.g., "yolov8" for a YOLOv8 export without NMS on the chip (decoded by yolo_decode.py),
+# "nanodet" if your model is a NanoDet-based architecture; otherwise None.
+
+NMS_TOP_K = 300
+# With POSTPROCESS = "yolov8", how many of the highest scoring candidates go into NMS each frame.
 
 PRESERVE_ASPECT_RATIO = False
 # Whether to preserve the aspect ratio when scaling image input to the model.
@@ -124,6 +235,40 @@ ACTIVATION_TIME_WINDOW = 1.0
 NO_DETECTION_TIMEOUT = 2.0
 # If no detections occur within this many seconds, we consider the target "lost" and stop recording and squirting
 
+MODELS_DIRECTORY = "models/"
+# Directory of the models (one sub directory with network.rpk and labels.txt each) that can be
+# switched to while running, see /models and /models/switch.
+
+MODEL_SCHEDULE = []
+# Run a different model at certain times of day, first matching window wins, MODEL otherwise.
+# e.g. [("20:00", "06:00", "train_foxes_yolov8n_175_32"), ("06:00", "09:00", "train_herons_yolov8n_150_32")]
+
+MODEL_LABEL_SWITCH = {}
+# Switch to a specialised model once its label has been detected often enough recently, and stay
+# on it while that label keeps being seen. e.g. {"foxes": "train_foxes_yolov8n_175_32"}
+
+MODEL_STATS_WINDOW = 300.0         # Seconds of detections counted for MODEL_LABEL_SWITCH
+MODEL_STATS_MIN_DETECTIONS = 20    # Detections of a label in the window needed to switch
+MODEL_STATS_HOLD = 600.0           # Seconds without the label before going back to the scheduled model
+MODEL_SCHEDULER_INTERVAL = 30.0    # Seconds between scheduler checks
+
+SITE_COORDINATOR = None
+# Address of the site coordinator (site_coordinator.py) when several turrets cover one site,
+# e.g. "udp://192.168.1.10:5600" or "tcp://192.168.1.10:5601". None to work alone.
+
+SITE_UNIT_ID = 1                   # This turret's id at the coordinator, unique on the site
+SITE_PUBLISH_INTERVAL = 0.1        # Seconds between track updates to the coordinator
+SITE_ASSIGNMENT_TIMEOUT = 2.0      # Seconds without an answer before engaging everything again
+SITE_HEADING = 0.0                 # Site bearing (degrees) this turret faces at pan 0, so the coordinator
+                                   # can tell which of its neighbours' tracks are the same animal
+
+PIPELINES = []
+# Several cameras/turrets run by one main.py, e.g. two IMX500s on a Pi 5, each entry overriding
+# the settings above for one pipeline (see pipeline_settings.py), e.g.
+# [{"name": "left", "camera_id": "i2c@88000", "pan_channel": 0, "tilt_channel": 1, "relay_pin": 14},
+#  {"name": "right", "camera_id": "i2c@80000", "pan_channel": 2, "tilt_channel": 3, "relay_pin": 15}]
+# Empty for a single pipeline using the settings above. The first one is served at /, each at /pipeline/<name>/.
+
 PRINT_INTRINSICS = False
 # If True, print the IMX500 network intrinsics (details about the loaded model)
 # and exit before the main program loop, for debugging only.
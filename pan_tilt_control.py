@@ -3,166 +3,157 @@
 from Adafruit_PCA9685 import PCA9685
 import threading
 import time
-import json
-import os
-
-
-def load_configuration():
-    """
-    Loads configuration from my_configuration.py and optionally overrides
-    with values from config.json if it exists
-    """
-    print("Loading Pan/tilt specific settings from my_configuration.py and config.json.")
-    # Default values if no configuration is available
-    config_vars = {
-        'PWM_FREQUENCY': 50,
-        'MIN_PULSE': 150,
-        'MAX_PULSE': 565,
-        'ANGLE_RANGE': 90,
-        'I2C_ADDRESS': 0x40,
-        'I2C_BUS': 1,
-        'PAN_SERVO_CHANNEL': 0,
-        'TILT_SERVO_CHANNEL': 1
-    }
-
-    # Try to load from my_configuration.py first
-    try:
-        import my_configuration
-        for var in ['PWM_FREQUENCY', 'MIN_PULSE', 'MAX_PULSE', 'ANGLE_RANGE',
-                    'I2C_ADDRESS', 'I2C_BUS', 'PAN_SERVO_CHANNEL', 'TILT_SERVO_CHANNEL']:
-            if hasattr(my_configuration, var):
-                config_vars[var] = getattr(my_configuration, var)
-        print("Loaded settings from my_configuration.py")
-    except ImportError:
-        print("my_configuration.py not found. Using default values.")
-
-    # Then try to load and override from JSON if it exists
-    json_path = "config.json"
-    if os.path.exists(json_path):
-        try:
-            with open(json_path, 'r') as f:
-                json_config = json.load(f)
-
-            # Override any existing settings with JSON values
-            for key, value in json_config.items():
-                if key in config_vars:
-                    config_vars[key] = value
-                    print(f"Overriding {key} from JSON config with value: {value}")
-                else:
-                    print(f"Warning: Pan_Tilt setup skipping key JSON: {key}")
-
-        except Exception as e:
-            print(f"Error loading JSON configuration: {e}")
-
-    # Calculate CENTER_PULSE after all configurations are loaded
-    config_vars['CENTER_PULSE'] = (config_vars['MIN_PULSE'] + config_vars['MAX_PULSE']) // 2
-
-    return config_vars
-
-
-# Load configuration from both sources
-cfg = load_configuration()
-
-# Set configuration values
-PWM_FREQUENCY = cfg['PWM_FREQUENCY']
-MIN_PULSE = cfg['MIN_PULSE']
-MAX_PULSE = cfg['MAX_PULSE']
-CENTER_PULSE = cfg['CENTER_PULSE']
-ANGLE_RANGE = cfg['ANGLE_RANGE']
-I2C_ADDRESS = cfg['I2C_ADDRESS']
-I2C_BUS = cfg['I2C_BUS']
-PAN_SERVO_CHANNEL = cfg['PAN_SERVO_CHANNEL']
-TILT_SERVO_CHANNEL = cfg['TILT_SERVO_CHANNEL']
-
-#
-#
-# # Get the configuration from the config file or if that is not available set some defaults
-# try:
-#     import my_configuration
-#     # Use the values from the configuration file
-#     PWM_FREQUENCY = my_configuration.PWM_FREQUENCY
-#     MIN_PULSE = my_configuration.MIN_PULSE
-#     MAX_PULSE = my_configuration.MAX_PULSE
-#     CENTER_PULSE = my_configuration.CENTER_PULSE
-#     ANGLE_RANGE = my_configuration.ANGLE_RANGE
-#     I2C_ADDRESS = my_configuration.I2C_ADDRESS
-#     I2C_BUS = my_configuration.I2C_BUS
-#     PAN_SERVO_CHANNEL = my_configuration.PAN_SERVO_CHANNEL
-#     TILT_SERVO_CHANNEL = my_configuration.TILT_SERVO_CHANNEL
-# except ImportError:
-#     # Default values if the configuration module cannot be imported
-#     print("configuration module not found. Using default values.")
-#     # Servo Settings
-#     PWM_FREQUENCY = 50
-#     MIN_PULSE = 150  # Pulse length for -90 degrees
-#     MAX_PULSE = 565  # Pulse length for +90 degrees
-#     CENTER_PULSE = (MIN_PULSE + MAX_PULSE) // 2
-#     ANGLE_RANGE = 90  # Range of motion in degrees (-90 to +90)
-#     # PCA9685 I2C settings and servo channels
-#     I2C_ADDRESS = 0x40
-#     I2C_BUS = 1
-#     PAN_SERVO_CHANNEL = 0
-#     TILT_SERVO_CHANNEL = 1
-
-# Global variables to track current angles
-current_pan = 0.0
-current_tilt = 0.0
-lock = threading.Lock()
-
-# Initialize the PCA9685
-pwm = PCA9685(address=I2C_ADDRESS, busnum=I2C_BUS )
-pwm.set_pwm_freq(PWM_FREQUENCY)
-
-def angle_to_pulse(angle):
+import live_config
+from metrics import registry
+
+
+# Settings come from live_config, which has already loaded my_configuration.py and config.json.
+# The pulse range can change while running, see angle_to_pulse(), the I2C settings need a restart.
+config = live_config.config
+I2C_ADDRESS = config.I2C_ADDRESS
+I2C_BUS = config.I2C_BUS
+PAN_SERVO_CHANNEL = config.PAN_SERVO_CHANNEL
+TILT_SERVO_CHANNEL = config.TILT_SERVO_CHANNEL
+PWM_FREQUENCY = config.PWM_FREQUENCY
+
+# Prometheus metrics, see metrics.py
+moves_total = registry.counter("turret_moves_total", "Pan/tilt moves issued")
+i2c_write_seconds = registry.histogram("turret_i2c_write_seconds", "Time to write both servo channels over I2C",
+                                       buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05))
+
+# The PCA9685 boards, opened by open_board() so importing this module doesn't touch the I2C bus.
+# Several turrets can share one board, each on its own pair of channels.
+boards = {}   # (address, bus) -> PCA9685
+boards_lock = threading.Lock()
+
+def open_board(address, bus):
+    with boards_lock:
+        board = boards.get((address, bus))
+        if board is None:
+            board = PCA9685(address=address, busnum=bus)
+            board.set_pwm_freq(PWM_FREQUENCY)
+            boards[(address, bus)] = board
+        return board
+
+def angle_to_pulse(angle, tuning=None):
     """
     Convert an angle (-90 to 90 degrees) to a pulse width.
     :param angle: The desired angle (-90 to +90 degrees)
+    :param tuning: live_config snapshot to use, the current one if None
     :return: Corresponding pulse width
     """
-    if angle < -ANGLE_RANGE or angle > ANGLE_RANGE:
-        raise ValueError(f"Angle must be between -{ANGLE_RANGE} and {ANGLE_RANGE} degrees.")
-    return int(CENTER_PULSE + (angle / ANGLE_RANGE) * (MAX_PULSE - CENTER_PULSE))
+    tuning = tuning or live_config.current()
+    if angle < -tuning.angle_range or angle > tuning.angle_range:
+        raise ValueError(f"Angle must be between -{tuning.angle_range} and {tuning.angle_range} degrees.")
+    return int(tuning.center_pulse + angle * tuning.pulse_per_degree)
 
-def move_to(pan_angle, tilt_angle, steps=10, step_delay=0.05):
+class PanTilt:
     """
-    Move the pan and tilt servos to specified angles.
-    :param pan_angle: Target pan angle (-90 to 90 degrees)
-    :param tilt_angle: Target tilt angle (-90 to 90 degrees)
-    :param steps: Number of steps for smooth movement
-    :param step_delay: Delay between steps in seconds
+    One pan/tilt turret: two channels of a PCA9685 and the angles they were last moved to.
     """
-    global current_pan, current_tilt
-
-    with lock:
-        # Validate angles
-        pan_angle = max(-ANGLE_RANGE, min(ANGLE_RANGE, pan_angle))
-        tilt_angle = max(-ANGLE_RANGE, min(ANGLE_RANGE, tilt_angle))
-
-        # Calculate pulse values
-        pan_start = angle_to_pulse(current_pan)
-        pan_end = angle_to_pulse(pan_angle)
-        tilt_start = angle_to_pulse(current_tilt)
-        tilt_end = angle_to_pulse(tilt_angle)
-
-        # Smoothly interpolate between current and target positions
-        for step in range(1, steps + 1):
-            pan_pulse = pan_start + (pan_end - pan_start) * step // steps
-            tilt_pulse = tilt_start + (tilt_end - tilt_start) * step // steps
-            pwm.set_pwm(PAN_SERVO_CHANNEL, 0, pan_pulse)
-            pwm.set_pwm(TILT_SERVO_CHANNEL, 0, tilt_pulse)
-            time.sleep(step_delay)
-
-        # Update current angles
-        current_pan = pan_angle
-        current_tilt = tilt_angle
+    def __init__(self, address=I2C_ADDRESS, bus=I2C_BUS, pan_channel=PAN_SERVO_CHANNEL, tilt_channel=TILT_SERVO_CHANNEL):
+        self.address = address
+        self.bus = bus
+        self.pan_channel = pan_channel
+        self.tilt_channel = tilt_channel
+        self.current_pan = 0.0
+        self.current_tilt = 0.0
+        self.lock = threading.Lock()
+        self.pwm = None
+        self.powered = False   # False until the first move and after release()
+
+    def init(self):
+        """
+        Initialize the PCA9685.  Called once at start up, before the first move.
+        """
+        with self.lock:
+            if self.pwm is None:
+                self.pwm = open_board(self.address, self.bus)
+
+    def move_to(self, pan_angle, tilt_angle, steps=10, step_delay=0.05):
+        """
+        Move the pan and tilt servos to specified angles.
+        :param pan_angle: Target pan angle (-90 to 90 degrees)
+        :param tilt_angle: Target tilt angle (-90 to 90 degrees)
+        :param steps: Number of steps for smooth movement
+        :param step_delay: Delay between steps in seconds
+        """
+        self.init()
+        with self.lock:
+            # One snapshot for the whole move
+            tuning = live_config.current()
+            angle_range = tuning.angle_range
+
+            # Validate angles (the current ones too, in case ANGLE_RANGE was reduced)
+            pan_angle = max(-angle_range, min(angle_range, pan_angle))
+            tilt_angle = max(-angle_range, min(angle_range, tilt_angle))
+            start_pan = max(-angle_range, min(angle_range, self.current_pan))
+            start_tilt = max(-angle_range, min(angle_range, self.current_tilt))
+
+            # Calculate pulse values
+            pan_start = angle_to_pulse(start_pan, tuning)
+            pan_end = angle_to_pulse(pan_angle, tuning)
+            tilt_start = angle_to_pulse(start_tilt, tuning)
+            tilt_end = angle_to_pulse(tilt_angle, tuning)
+
+            moves_total.inc()
+            # Smoothly interpolate between current and target positions
+            for step in range(1, steps + 1):
+                pan_pulse = pan_start + (pan_end - pan_start) * step // steps
+                tilt_pulse = tilt_start + (tilt_end - tilt_start) * step // steps
+                write_start = time.perf_counter()
+                self.pwm.set_pwm(self.pan_channel, 0, pan_pulse)
+                self.pwm.set_pwm(self.tilt_channel, 0, tilt_pulse)
+                i2c_write_seconds.observe(time.perf_counter() - write_start)
+                time.sleep(step_delay)
+
+            # Update current angles
+            self.current_pan = pan_angle
+            self.current_tilt = tilt_angle
+            self.powered = True
+
+    def release(self):
+        """
+        Stops the pulses on both channels so the servos go limp where they are, no jitter and
+        no holding current.  The next move_to() drives them again.
+        """
+        with self.lock:
+            if self.pwm is not None and self.powered:
+                self.pwm.set_pwm(self.pan_channel, 0, 0)
+                self.pwm.set_pwm(self.tilt_channel, 0, 0)
+            self.powered = False
+
+    def get_current_angles(self):
+        """
+        Get the current pan and tilt angles.
+        :return: Tuple (current_pan, current_tilt)
+        """
+        with self.lock:
+            return self.current_pan, self.current_tilt
+
+    def peek_current_angles(self):
+        """
+        Get the last completed pan and tilt angles without waiting for a move in progress.
+        Safe to call from the camera callback.
+        :return: Tuple (current_pan, current_tilt)
+        """
+        return self.current_pan, self.current_tilt
+
+# The turret on the configured channels, used through the functions below by the
+# calibration page and the test at the bottom
+default_turret = PanTilt()
+
+def init():
+    default_turret.init()
+
+def move_to(pan_angle, tilt_angle, steps=10, step_delay=0.05):
+    default_turret.move_to(pan_angle, tilt_angle, steps=steps, step_delay=step_delay)
 
 def get_current_angles():
-    """
-    Get the current pan and tilt angles.
-    :return: Tuple (current_pan, current_tilt)
-    """
-    with lock:
-        return current_pan, current_tilt
+    return default_turret.get_current_angles()
+
+def peek_current_angles():
+    return default_turret.peek_current_angles()
 
 if __name__ == "__main__":
     # If you run this on its own then just do a little test movement
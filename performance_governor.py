@@ -0,0 +1,194 @@
+# performance_governor.py
+"""
+Steps between performance profiles as the Pi heats up or runs out of CPU.
+
+Without it a hot enclosure lets the firmware throttle the CPU, and the frame
+rate collapses at random.  Instead a background thread watches:
+
+    temperature  - SoC temperature in degrees C
+    load         - 1 minute load average per CPU core
+    callback     - time the camera callback takes, as a fraction of the
+                   frame interval (the worst pipeline)
+
+Each signal has a (recover, degrade) pair of limits.  Once any signal has
+been above its degrade limit for degrade_after seconds the governor steps
+down one profile.  It only steps back up after every signal has stayed
+below its recover limit for recover_after seconds.  Between the two limits
+it holds the current profile, so it does not flap around one value.
+
+Profiles go from the best (first) to the cheapest (last).  Each one sets:
+
+    frame_rate         - camera frame rate cap, None for the network's inference rate
+    lores_size         - preview stream resolution, None for LOW_RES_STREAM_RESOLUTION
+    preview_fps        - preview frames published to the web page per second, None for every frame
+    jpeg_quality       - JPEG quality of the MJPEG preview
+    draw_overlays      - draw the boxes and crosshair on the preview and recording
+    recording_bitrate  - H.264 bitrate of new recordings, None for the encoder default
+
+The governor only picks a profile; main.py applies it.  Listeners are called
+with (profile, transition) after every change.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from metrics import registry
+from system_metrics import get_cpu_temperature
+
+logger = logging.getLogger("my_app_logger.performance")
+
+transitions_total = registry.counter("turret_performance_transitions_total", "Performance profile changes")
+
+
+class Profile(NamedTuple):
+    name: str
+    frame_rate: float = None
+    lores_size: tuple = None
+    preview_fps: float = None
+    jpeg_quality: int = 95
+    draw_overlays: bool = True
+    recording_bitrate: int = None
+
+
+def load_profiles(entries):
+    """
+    Profiles from a list of dicts (PERFORMANCE_PROFILES), raises ValueError for unknown keys.
+    """
+    if not entries:
+        raise ValueError("At least one performance profile is needed")
+    profiles = []
+    for entry in entries:
+        unknown = set(entry) - set(Profile._fields)
+        if unknown:
+            raise ValueError(f"Unknown performance profile settings: {', '.join(sorted(unknown))}")
+        profile = Profile(**entry)
+        if profile.lores_size is not None:
+            profile = profile._replace(lores_size=tuple(profile.lores_size))
+        profiles.append(profile)
+    return profiles
+
+
+def get_load():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return None
+
+
+class PerformanceGovernor:
+    def __init__(self, profiles, limits, get_callback_load=None, interval=2.0,
+                 degrade_after=6.0, recover_after=60.0, history=50):
+        """
+        profiles: Profile list, best first
+        limits: {signal: (recover, degrade)} for "temperature", "load" and "callback"
+        get_callback_load: function returning the callback time per frame interval, or None
+        """
+        self.profiles = profiles
+        self.limits = limits
+        self.get_callback_load = get_callback_load
+        self.interval = interval
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+
+        self.index = 0
+        self.profile = profiles[0]
+        self.signals = {}
+        self.hot_since = None
+        self.cool_since = None
+        self.transitions = deque(maxlen=history)
+        self.listeners = []
+        self.lock = threading.Lock()
+        registry.gauge("turret_performance_profile", "Index of the performance profile in use, 0 is the best",
+                       function=lambda: self.index)
+
+    def subscribe(self, listener):
+        """
+        listener(profile, transition) is called from the governor thread after every change.
+        """
+        self.listeners.append(listener)
+
+    def start(self):
+        threading.Thread(target=self.run, name="performance_governor", daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check(self.read_signals())
+            except Exception as e:
+                logger.error(f"Performance check failed: {e}")
+
+    def read_signals(self):
+        return {
+            "temperature": get_cpu_temperature(),
+            "load": get_load(),
+            "callback": self.get_callback_load() if self.get_callback_load else None,
+        }
+
+    def check(self, signals, now=None):
+        """
+        Steps down or up one profile if the signals have been out of range long enough.
+        Returns the transition, or None.
+        """
+        now = time.monotonic() if now is None else now
+        hot = []
+        cool = True
+        for name, value in signals.items():
+            if value is None or name not in self.limits:
+                continue
+            recover, degrade = self.limits[name]
+            if value > degrade:
+                hot.append(f"{name} {value:.2f} > {degrade}")
+            if value >= recover:
+                cool = False
+
+        with self.lock:
+            self.signals = signals
+            self.hot_since = (self.hot_since or now) if hot else None
+            self.cool_since = (self.cool_since or now) if cool else None
+            if hot and now - self.hot_since >= self.degrade_after and self.index < len(self.profiles) - 1:
+                transition = self.step(self.index + 1, ", ".join(hot))
+            elif cool and now - self.cool_since >= self.recover_after and self.index > 0:
+                transition = self.step(self.index - 1, "all signals below their recover limits")
+            else:
+                return None
+
+        logger.info(f"Performance profile {transition['from']} -> {transition['to']} ({transition['reason']})")
+        for listener in self.listeners:
+            try:
+                listener(self.profile, transition)
+            except Exception as e:
+                logger.error(f"Performance listener failed: {e}")
+        return transition
+
+    def step(self, index, reason):
+        transition = {
+            "time": time.time(),
+            "from": self.profile.name,
+            "to": self.profiles[index].name,
+            "reason": reason,
+            "signals": {k: (round(v, 3) if v is not None else None) for k, v in self.signals.items()},
+        }
+        self.index = index
+        self.profile = self.profiles[index]
+        self.transitions.append(transition)
+        transitions_total.inc()
+        # The next step needs the signals to stay out of range for a whole period again
+        self.hot_since = None
+        self.cool_since = None
+        return transition
+
+    def status(self):
+        with self.lock:
+            return {
+                "profile": self.profile._asdict(),
+                "index": self.index,
+                "profiles": [p.name for p in self.profiles],
+                "signals": {k: (round(v, 3) if v is not None else None) for k, v in self.signals.items()},
+                "limits": {k: list(v) for k, v in self.limits.items()},
+                "transitions": list(self.transitions),
+            }
@@ -0,0 +1,77 @@
+# pipeline_context.py
+"""
+Everything the camera callback needs that only changes when the camera is
+configured (or the model is swapped, or the zones are edited): stream sizes,
+the lores/main scale, the frame centre, the label list, the overlay geometry
+and the rasterised zones.
+
+It is built once per configuration and the callback takes the one reference
+at the start of each frame, instead of asking Picamera2 for the stream
+configuration and re-measuring the overlay text every frame.
+"""
+
+from typing import NamedTuple
+
+import cv2
+
+# Recording overlay, text in the bottom banner and crosshair size
+STATUS_TEXTS = ("ACQUIRED", "TRACKING")
+STATUS_FONT_SCALE = 2.0
+STATUS_THICKNESS = 2
+CROSSHAIR_LENGTH = 30
+
+
+class OverlayGeometry(NamedTuple):
+    width: int
+    height: int
+    center: tuple           # (x, y)
+    crosshair: tuple        # ((x0, y0), (x1, y1)) for the horizontal then the vertical line
+    status_text: dict       # text -> (origin, banner top left, banner bottom right)
+
+
+class PipelineContext(NamedTuple):
+    main_size: tuple        # (width, height)
+    lores_size: tuple
+    main_center: tuple      # (x, y) in main stream pixels
+    lores_scale: tuple      # (sx, sy) from main to lores pixels
+    labels: tuple
+    main_overlay: OverlayGeometry
+    lores_overlay: OverlayGeometry
+    zones: object           # zones.ZoneMap in main stream pixels
+
+
+def overlay_geometry(width, height):
+    center_x = width // 2
+    center_y = height // 2
+    crosshair = (
+        ((center_x - CROSSHAIR_LENGTH, center_y), (center_x + CROSSHAIR_LENGTH, center_y)),
+        ((center_x, center_y - CROSSHAIR_LENGTH), (center_x, center_y + CROSSHAIR_LENGTH)),
+    )
+    status_text = {}
+    for text in STATUS_TEXTS:
+        (text_width, text_height), baseline = cv2.getTextSize(
+            text, cv2.FONT_HERSHEY_SIMPLEX, STATUS_FONT_SCALE, STATUS_THICKNESS
+        )
+        text_x = (width - text_width) // 2
+        text_y = height - 20
+        status_text[text] = (
+            (text_x, text_y),
+            (text_x, text_y - text_height - baseline),
+            (text_x + text_width, text_y + baseline),
+        )
+    return OverlayGeometry(width, height, (center_x, center_y), crosshair, status_text)
+
+
+def build_context(main_size, lores_size, labels, zone_map):
+    main_w, main_h = main_size
+    lores_w, lores_h = lores_size
+    return PipelineContext(
+        main_size=(main_w, main_h),
+        lores_size=(lores_w, lores_h),
+        main_center=(main_w / 2, main_h / 2),
+        lores_scale=(lores_w / float(main_w), lores_h / float(main_h)),
+        labels=tuple(labels),
+        main_overlay=overlay_geometry(main_w, main_h),
+        lores_overlay=overlay_geometry(lores_w, lores_h),
+        zones=zone_map,
+    )
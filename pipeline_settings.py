@@ -0,0 +1,101 @@
+# pipeline_settings.py
+"""
+The settings of each camera/turret pipeline run by main.py.
+
+With PIPELINES empty there is one pipeline, "main", built from the top level
+settings of my_configuration.py, exactly as before.  Each PIPELINES entry is
+a dict overriding those settings for one pipeline, e.g. on a Pi 5 with an
+IMX500 on each CSI port and both turrets on one PCA9685:
+
+    PIPELINES = [
+        {"name": "left",  "camera_id": "i2c@88000", "pan_channel": 0, "tilt_channel": 1, "relay_pin": 14},
+        {"name": "right", "camera_id": "i2c@80000", "pan_channel": 2, "tilt_channel": 3, "relay_pin": 15},
+    ]
+
+With several pipelines the files each one writes get the pipeline name
+(zones_<name>.json, capture_<name>_<time>.mp4, a detection log sub
+directory) unless the entry sets them, and each one is its own unit at the
+site coordinator (SITE_UNIT_ID, SITE_UNIT_ID + 1...).
+"""
+
+import os
+import re
+from typing import NamedTuple
+
+
+class PipelineSettings(NamedTuple):
+    name: str
+    camera_id: str                  # Part of the IMX500's device tree path, "" for the first one found
+    model: str
+    labels: str
+    i2c_address: int
+    pan_channel: int
+    tilt_channel: int
+    relay_pin: int
+    flip_horizontally: bool
+    flip_vertically: bool
+    zones_file: str
+    detection_log_directory: str
+    recording_prefix: str           # Start of the recording file names
+    home: tuple                     # (pan, tilt), None to use the live HOME_PAN / HOME_TILT
+    site_unit_id: int
+    site_heading: float             # Site bearing (degrees) the turret faces at pan 0
+
+
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def load_pipeline_settings(config):
+    """
+    Returns a PipelineSettings per pipeline, the first one is the default pipeline
+    behind the plain web routes.  Raises ValueError for invalid or clashing entries.
+    """
+    entries = list(config.PIPELINES) or [{"name": "main"}]
+    several = len(entries) > 1
+    zones_root, zones_ext = os.path.splitext(config.ZONES_FILE)
+    settings = []
+    for index, entry in enumerate(entries):
+        unknown = set(entry) - set(PipelineSettings._fields)
+        if unknown:
+            raise ValueError(f"Unknown pipeline settings: {', '.join(sorted(unknown))}")
+        name = entry.get("name", f"pipeline{index + 1}")
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Pipeline name {name!r} may only use letters, digits, - and _")
+        values = {
+            "name": name,
+            "camera_id": "",
+            "model": config.MODEL,
+            "labels": config.LABELS,
+            "i2c_address": config.I2C_ADDRESS,
+            "pan_channel": config.PAN_SERVO_CHANNEL,
+            "tilt_channel": config.TILT_SERVO_CHANNEL,
+            "relay_pin": config.REPLAY_PIN,
+            "flip_horizontally": config.FLIP_HORIZONTALLY,
+            "flip_vertically": config.FLIP_VERTICALLY,
+            "zones_file": f"{zones_root}_{name}{zones_ext}" if several else config.ZONES_FILE,
+            "detection_log_directory": (os.path.join(config.DETECTION_LOG_DIRECTORY, name) if several
+                                        else config.DETECTION_LOG_DIRECTORY),
+            "recording_prefix": f"capture_{name}_" if several else "capture_",
+            "home": None,
+            "site_unit_id": config.SITE_UNIT_ID + index,
+            "site_heading": config.SITE_HEADING,
+        }
+        values.update(entry)
+        if values["home"] is not None:
+            values["home"] = tuple(values["home"])
+        settings.append(PipelineSettings(**values))
+    check_conflicts(settings)
+    return settings
+
+
+def check_conflicts(settings):
+    if len(settings) > 1 and any(not s.camera_id for s in settings):
+        raise ValueError("Each pipeline needs a camera_id when there are several")
+    for field in ("name", "camera_id", "relay_pin", "zones_file", "detection_log_directory",
+                  "recording_prefix", "site_unit_id"):
+        values = [getattr(s, field) for s in settings]
+        if len(set(values)) < len(values):
+            raise ValueError(f"Pipelines must not share the same {field}")
+    channels = [(s.i2c_address, c) for s in settings for c in (s.pan_channel, s.tilt_channel)]
+    if len(set(channels)) < len(channels):
+        raise ValueError("Pipelines must not share servo channels")
@@ -0,0 +1,146 @@
+# recording_catalog.py
+"""
+Keeps an index of finished recordings.
+
+Every recording in SAVE_DIRECTORY gets a small JSON entry next to its MP4
+(capture_<timestamp>.json) describing when it was made, what was seen and
+which preview images belong to it.  The catalog is read once at startup and
+then kept up to date in memory, so the web pages never need to list or stat
+the directory again.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("my_app_logger.catalog")
+
+
+class RecordingCatalog:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.entries = {}  # { base_name: entry dict }
+        self.load()
+
+    def load(self):
+        """
+        Reads every catalog entry from disk.  MP4 files without an entry
+        (recorded before the catalog existed) get a minimal in-memory entry.
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        entries = {}
+        videos = {}
+        for dir_entry in os.scandir(self.directory):
+            name = dir_entry.name
+            base_name, ext = os.path.splitext(name)
+            if ext == ".json":
+                try:
+                    with open(dir_entry.path, "r") as f:
+                        entries[base_name] = json.load(f)
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable catalog entry {name}: {e}")
+            elif ext.lower() == ".mp4":
+                videos[base_name] = dir_entry
+
+        for base_name, dir_entry in videos.items():
+            if base_name not in entries:
+                stat = dir_entry.stat()
+                entries[base_name] = {
+                    "name": base_name,
+                    "video": dir_entry.name,
+                    "start_time": stat.st_mtime,
+                    "end_time": stat.st_mtime,
+                    "size_bytes": stat.st_size,
+                    "labels": [],
+                    "max_conf": None,
+                    "poster": None,
+                    "sprite": None,
+                }
+
+        with self.lock:
+            self.entries = entries
+        logger.info(f"Loaded {len(entries)} recordings from {self.directory}")
+
+    def entry_path(self, base_name):
+        return os.path.join(self.directory, base_name + ".json")
+
+    def add(self, entry):
+        """
+        Stores (or replaces) an entry and writes it next to the video.
+        """
+        base_name = entry["name"]
+        tmp_path = self.entry_path(base_name) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_path, self.entry_path(base_name))
+        with self.lock:
+            self.entries[base_name] = entry
+
+    def get(self, base_name):
+        with self.lock:
+            return self.entries.get(base_name)
+
+    def find_by_filename(self, filename):
+        """
+        Returns the entry owning a file (video, poster, sprite or tracks), or None.
+        """
+        with self.lock:
+            for entry in self.entries.values():
+                if filename in (entry.get("video"), entry.get("poster"), entry.get("sprite"), entry.get("tracks")):
+                    return entry
+        return None
+
+    def list_entries(self):
+        """
+        All entries, newest first.
+        """
+        with self.lock:
+            entries = list(self.entries.values())
+        entries.sort(key=lambda e: e.get("start_time") or 0, reverse=True)
+        return entries
+
+    def remove(self, base_name):
+        """
+        Deletes a recording and every file that belongs to it.
+        Returns the removed entry, or None if it was not in the catalog.
+        """
+        with self.lock:
+            entry = self.entries.pop(base_name, None)
+        if entry is None:
+            return None
+
+        filenames = [entry.get("video"), entry.get("poster"), entry.get("sprite"), entry.get("tracks"),
+                     base_name + ".json"]
+        for filename in filenames:
+            if not filename:
+                continue
+            path = os.path.join(self.directory, filename)
+            if os.path.exists(path):
+                os.remove(path)
+        return entry
+
+
+def make_entry(base_name, video_filename, start_time, end_time, size_bytes, labels, max_conf):
+    """
+    Builds a new catalog entry dict for a finished recording.
+    """
+    return {
+        "name": base_name,
+        "video": video_filename,
+        "start_time": start_time,
+        "end_time": end_time,
+        "start_str": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_time)),
+        "duration": round(end_time - start_time, 1),
+        "size_bytes": size_bytes,
+        "labels": sorted(labels),
+        "max_conf": None if max_conf is None else round(float(max_conf), 3),
+        "poster": None,
+        "sprite": None,
+        "sprite_frames": 0,
+        "tracks": None,
+    }
@@ -0,0 +1,101 @@
+# recording_previews.py
+"""
+Builds the poster JPEG and the sprite-strip preview for a recording while it is
+being made, so the recordings page can show a still and a hover animation
+without the browser having to download any of the MP4.
+
+The collector is fed the clean (not yet annotated) lores frame from the camera
+callback.  It only copies a frame when the detection confidence beats the best
+seen so far, and takes a small thumbnail for the sprite at a fixed interval,
+so the cost inside the callback stays very low.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("my_app_logger.previews")
+
+
+class PreviewCollector:
+    def __init__(self, sprite_frames=10, sprite_interval=1.0, sprite_width=160, jpeg_quality=85):
+        self.sprite_frames = sprite_frames
+        self.sprite_interval = sprite_interval
+        self.sprite_width = sprite_width
+        self.jpeg_quality = jpeg_quality
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.poster_frame = None
+            self.best_conf = -1.0
+            self.sprite = []
+            self.last_sprite_time = 0.0
+            self.labels_seen = set()
+
+    def offer(self, frame, detections, labels):
+        """
+        Called from the camera callback with the unannotated BGR lores frame
+        and the raw detections for that frame.
+        """
+        now = time.monotonic()
+        best_conf = max((float(d.conf) for d in detections), default=None)
+
+        with self.lock:
+            for d in detections:
+                self.labels_seen.add(labels[int(d.category)])
+
+            # Keep the highest-confidence frame as the poster (first frame until something is seen)
+            if self.poster_frame is None or (best_conf is not None and best_conf > self.best_conf):
+                self.poster_frame = frame.copy()
+                if best_conf is not None:
+                    self.best_conf = best_conf
+
+            if len(self.sprite) < self.sprite_frames and (now - self.last_sprite_time) >= self.sprite_interval:
+                height, width = frame.shape[:2]
+                thumb_h = max(1, int(height * self.sprite_width / width))
+                self.sprite.append(cv2.resize(frame, (self.sprite_width, thumb_h), interpolation=cv2.INTER_AREA))
+                self.last_sprite_time = now
+
+    def summary(self):
+        """
+        Returns (labels_seen, max_conf) for the catalog entry.
+        """
+        with self.lock:
+            max_conf = self.best_conf if self.best_conf >= 0 else None
+            return set(self.labels_seen), max_conf
+
+    def write(self, directory, base_name):
+        """
+        Writes <base_name>_poster.jpg and <base_name>_sprite.jpg and returns
+        a dict with the filenames (None where nothing was captured) and the
+        number of frames in the sprite.
+        """
+        with self.lock:
+            poster_frame = self.poster_frame
+            sprite = list(self.sprite)
+
+        result = {"poster": None, "sprite": None, "sprite_frames": 0}
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
+
+        if poster_frame is not None:
+            poster_name = f"{base_name}_poster.jpg"
+            if cv2.imwrite(os.path.join(directory, poster_name), poster_frame, params):
+                result["poster"] = poster_name
+            else:
+                logger.error(f"Failed to write poster {poster_name}")
+
+        if sprite:
+            sprite_name = f"{base_name}_sprite.jpg"
+            if cv2.imwrite(os.path.join(directory, sprite_name), np.hstack(sprite), params):
+                result["sprite"] = sprite_name
+                result["sprite_frames"] = len(sprite)
+            else:
+                logger.error(f"Failed to write sprite {sprite_name}")
+
+        return result
@@ -0,0 +1,154 @@
+# retention_manager.py
+"""
+Deletes old recordings so SAVE_DIRECTORY never fills the SD card.
+
+Works from the recording catalog rather than walking the directory.  A
+background thread checks the byte, age and free-space budgets at a fixed
+interval (or straight away when a recording starts) and evicts a few
+recordings per pass: expired ones first, then low-value ones (nothing
+identified or low confidence), then simply the oldest.
+
+The keep_recent newest recordings are never deleted to make space.  If the
+disk is short of the free-space reserve because of other data, and deleting
+every other recording would still not restore it, nothing is deleted for
+the reserve and a warning is logged instead.
+"""
+
+import logging
+import shutil
+import threading
+import time
+
+logger = logging.getLogger("my_app_logger.retention")
+
+MB = 1024 * 1024
+
+
+class RetentionManager:
+    def __init__(self, catalog, max_mb=0, max_age_days=0, reserve_mb=1024,
+                 low_value_conf=0.6, check_interval=60.0, evictions_per_pass=5, keep_recent=3):
+        self.catalog = catalog
+        self.max_bytes = int(max_mb * MB)
+        self.max_age = max_age_days * 24 * 3600
+        self.reserve_bytes = int(reserve_mb * MB)
+        self.low_value_conf = low_value_conf
+        self.check_interval = check_interval
+        self.evictions_per_pass = evictions_per_pass
+        self.keep_recent = keep_recent
+
+        self.wake_event = threading.Event()
+        self.lock = threading.Lock()
+        self.evicted_count = 0
+        self.evicted_bytes = 0
+        self.last_check = None
+        self.state = {"pressure": "unknown"}
+        self.reserve_unreachable = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        """
+        Ask for a check now, e.g. when a recording starts and needs headroom.
+        """
+        self.wake_event.set()
+
+    def run(self):
+        while True:
+            try:
+                more_to_do = self.enforce()
+            except Exception as e:
+                logger.error(f"Retention check failed: {e}")
+                more_to_do = False
+            # Carry straight on while still over budget, otherwise wait for the next check
+            if not more_to_do:
+                self.wake_event.wait(self.check_interval)
+            self.wake_event.clear()
+
+    def is_low_value(self, entry):
+        max_conf = entry.get("max_conf")
+        return not entry.get("labels") or max_conf is None or max_conf < self.low_value_conf
+
+    def enforce(self):
+        """
+        Runs one incremental pass.  Returns True if the budgets are still exceeded
+        after evicting evictions_per_pass recordings.
+        """
+        now = time.time()
+        evicted = 0
+
+        while evicted < self.evictions_per_pass:
+            entries = self.catalog.list_entries()  # newest first
+            used_bytes = sum(e.get("size_bytes") or 0 for e in entries)
+            free_bytes = shutil.disk_usage(self.catalog.directory).free
+
+            expired = [e for e in entries if self.max_age and (now - (e.get("start_time") or now)) > self.max_age]
+            # Only these may be deleted to make space
+            candidates = entries[self.keep_recent:]
+            candidate_bytes = sum(e.get("size_bytes") or 0 for e in candidates)
+            over_size = self.max_bytes and used_bytes > self.max_bytes
+            short_of_reserve = free_bytes < self.reserve_bytes
+            self.check_reserve_reachable(short_of_reserve and candidate_bytes < self.reserve_bytes - free_bytes,
+                                         free_bytes, candidate_bytes)
+            over_budget = over_size or (short_of_reserve and not self.reserve_unreachable)
+
+            self.update_state(entries, used_bytes, free_bytes, now)
+
+            if expired:
+                victim = expired[-1]
+                reason = "expired"
+            elif over_budget and candidates:
+                low_value = [e for e in candidates if self.is_low_value(e)]
+                victim = low_value[-1] if low_value else candidates[-1]
+                reason = "low value" if low_value else "oldest"
+            else:
+                return False
+
+            self.catalog.remove(victim["name"])
+            evicted += 1
+            with self.lock:
+                self.evicted_count += 1
+                self.evicted_bytes += victim.get("size_bytes") or 0
+            logger.info(f"Deleted recording {victim['name']} ({reason}) to stay within retention budget")
+
+        return True
+
+    def check_reserve_reachable(self, unreachable, free_bytes, candidate_bytes):
+        if unreachable and not self.reserve_unreachable:
+            logger.warning(f"Only {free_bytes / MB:.0f} MB free, the {self.reserve_bytes / MB:.0f} MB reserve is "
+                           f"taken by other data and deleting recordings ({candidate_bytes / MB:.0f} MB) "
+                           f"cannot free it, keeping them")
+        elif self.reserve_unreachable and not unreachable:
+            logger.info("Free space reserve can be kept by deleting recordings again")
+        self.reserve_unreachable = unreachable
+
+    def update_state(self, entries, used_bytes, free_bytes, now):
+        if free_bytes < self.reserve_bytes or (self.max_bytes and used_bytes > self.max_bytes):
+            pressure = "critical"
+        elif free_bytes < 2 * self.reserve_bytes or (self.max_bytes and used_bytes > 0.9 * self.max_bytes):
+            pressure = "warning"
+        else:
+            pressure = "ok"
+
+        with self.lock:
+            self.last_check = now
+            self.state = {
+                "pressure": pressure,
+                "recordings": len(entries),
+                "recordings_mb": round(used_bytes / MB, 2),
+                "free_mb": round(free_bytes / MB, 2),
+                "budget_mb": round(self.max_bytes / MB, 2) if self.max_bytes else None,
+                "reserve_mb": round(self.reserve_bytes / MB, 2),
+                "reserve_unreachable": self.reserve_unreachable,
+                "max_age_days": round(self.max_age / 86400, 1) if self.max_age else None,
+            }
+
+    def status(self):
+        with self.lock:
+            status = dict(self.state)
+            status["evicted_count"] = self.evicted_count
+            status["evicted_mb"] = round(self.evicted_bytes / MB, 2)
+            status["last_check"] = self.last_check
+        return status
@@ -0,0 +1,110 @@
+# shared_frames.py
+"""
+Ring buffer of preview frames in multiprocessing.shared_memory, used to hand
+the annotated lores frames from the camera process to the web process
+without pickling or copying them through a pipe.
+
+Layout of the shared block:
+
+    header   : int64[3]           -> [latest sequence number, number of slots, readers]
+    slot_seq : int64[slots]       -> sequence number held by each slot (-1 while being written)
+    frames   : uint8[slots, h, w, c]
+
+The writer copies each frame into the next slot and then publishes its
+sequence number.  Readers look at the latest slot, encode straight from the
+shared memory (no copy) and afterwards check the slot's sequence number is
+unchanged; if the writer lapped them the frame is discarded.
+
+The web process keeps the number of connected streams in the header so the
+camera process can skip the preview work while nobody is watching.
+"""
+
+import threading
+
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+HEADER_FIELDS = 3
+
+
+class SharedFrameRing:
+    def __init__(self, name=None, shape=None, slots=4, create=False):
+        """
+        Camera side: SharedFrameRing(shape=(h, w, 3), slots=4, create=True)
+        Web side:    SharedFrameRing(name=ring.name, shape=ring.shape, slots=ring.slots)
+        """
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        meta_bytes = 8 * (HEADER_FIELDS + slots)
+        size = meta_bytes + slots * frame_bytes
+
+        self.owner = create
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        if not create:
+            # Attaching registers the block with this process's resource tracker, which would
+            # unlink it when this process exits.  Only the creating process may do that.
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf, offset=0)
+        self.slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf, offset=8 * HEADER_FIELDS)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=meta_bytes)
+
+        # Only the web process changes the reader count, its stream threads share this lock
+        self.readers_lock = threading.Lock()
+
+        if create:
+            self.header[0] = 0
+            self.header[1] = slots
+            self.header[2] = 0
+            self.slot_seq[:] = 0
+
+    def publish(self, frame):
+        """
+        Copies a frame into the next slot (camera process only).
+        """
+        seq = int(self.header[0]) + 1
+        slot = seq % self.slots
+        self.slot_seq[slot] = -1
+        # Crop off any row padding the camera stream might have
+        np.copyto(self.frames[slot], frame[:self.shape[0], :self.shape[1]])
+        self.slot_seq[slot] = seq
+        self.header[0] = seq
+        return seq
+
+    def latest_seq(self):
+        return int(self.header[0])
+
+    def view(self, seq):
+        """
+        Zero-copy view of the frame with sequence number seq.  The caller must
+        check still_valid(seq) after using it.
+        """
+        return self.frames[seq % self.slots]
+
+    def still_valid(self, seq):
+        return int(self.slot_seq[seq % self.slots]) == seq
+
+    def add_reader(self, delta):
+        """
+        Web process: +1 when a stream starts reading, -1 when it stops.
+        """
+        with self.readers_lock:
+            self.header[2] += delta
+
+    def readers(self):
+        return int(self.header[2])
+
+    def close(self):
+        # Drop the numpy views before closing the mapping
+        self.header = self.slot_seq = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def describe(self):
+        """
+        What the web process needs to attach to this ring.
+        """
+        return {"name": self.name, "shape": self.shape, "slots": self.slots}
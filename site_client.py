@@ -0,0 +1,230 @@
+# site_client.py
+"""
+The unit side of the site coordinator (site_coordinator.py).
+
+publish() sends what the turret sees as a TRACKS message (at most every
+min_interval seconds, or idle_interval while it sees nothing, unless the
+tracks seen change) and a receiver thread keeps the latest ASSIGN reply.
+
+Every detection gets a track id from TrackIds, which follows each object
+from frame to frame, so two animals with the same label are two tracks.
+The camera callback asks may_engage(track_id) before aiming or firing.  If
+the coordinator has not answered for assignment_timeout seconds the unit
+works alone again and engages everything, so a coordinator outage never
+disarms the site.
+
+    client = SiteClient("udp://192.168.1.10:5600", unit=1)
+    client.start()
+"""
+
+import logging
+import math
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import site_protocol as protocol
+from metrics import registry
+
+logger = logging.getLogger("my_app_logger.site_client")
+
+
+class TrackIds:
+    """
+    Gives each detection the id of the nearest detection with the same label in
+    the previous frames, or a new id.  Not thread safe, the camera callback owns it.
+    """
+    def __init__(self, max_distance=0.15, keep_frames=5):
+        """
+        max_distance: how far (0.0 - 1.0 of the frame) an object may move between frames
+        keep_frames: frames a track is kept without being seen
+        """
+        self.max_distance = max_distance
+        self.keep_frames = keep_frames
+        self.tracks = {}      # id -> [label, (cx, cy), frames unseen]
+        self.next_id = 1
+
+    def assign(self, detections):
+        """
+        detections: (label, (cx, cy)) pairs, centres 0.0 - 1.0 of the frame.  Returns their ids.
+        """
+        for track in self.tracks.values():
+            track[2] += 1
+        ids = [None] * len(detections)
+        # Closest pairs first, each track and detection matched at most once
+        pairs = []
+        for index, (label, (cx, cy)) in enumerate(detections):
+            for track_id, (track_label, (tx, ty), _) in self.tracks.items():
+                if track_label == label:
+                    distance = math.hypot(cx - tx, cy - ty)
+                    if distance <= self.max_distance:
+                        pairs.append((distance, index, track_id))
+        used = set()
+        for distance, index, track_id in sorted(pairs):
+            if ids[index] is None and track_id not in used:
+                ids[index] = track_id
+                used.add(track_id)
+        for index, (label, centre) in enumerate(detections):
+            if ids[index] is None:
+                ids[index] = self.next_id
+                self.next_id = self.next_id % 0xFFFF + 1
+            self.tracks[ids[index]] = [label, centre, 0]
+        self.tracks = {k: v for k, v in self.tracks.items() if v[2] <= self.keep_frames}
+        return ids
+
+
+class SiteClient:
+    def __init__(self, address, unit, min_interval=0.1, idle_interval=1.0, assignment_timeout=2.0, labels=None):
+        """
+        labels: metric labels, e.g. {"pipeline": "left"} when one process runs several units
+        """
+        url = urlparse(address)
+        if url.scheme not in ("udp", "tcp") or not url.hostname or not url.port:
+            raise ValueError(f"Site coordinator address must be udp://host:port or tcp://host:port, not {address}")
+        self.transport = url.scheme
+        self.address = (url.hostname, url.port)
+        self.unit = unit
+        self.min_interval = min_interval
+        self.idle_interval = idle_interval
+        self.assignment_timeout = assignment_timeout
+
+        self.sock = None
+        self.send_lock = threading.Lock()
+        # The publisher and the recording catalog both number messages
+        self.seq_lock = threading.Lock()
+        self.seq = 0
+        self.last_sent = 0.0
+        self.last_tracks = None
+        self.engage = {}             # track id -> label, from the last ASSIGN
+        self.objects = 0
+        self.assigned_at = None      # monotonic time of the last ASSIGN
+        self.last_latency = None
+
+        self.assignment_seconds = registry.histogram(
+            "turret_site_assignment_seconds", "Round trip from sending TRACKS to receiving the assignment",
+            buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25), labels=labels
+        )
+        self.published_total = registry.counter("turret_site_published_total",
+                                                "TRACKS messages sent to the coordinator", labels=labels)
+        self.published_bytes_total = registry.counter("turret_site_published_bytes_total",
+                                                      "Bytes sent to the coordinator", labels=labels)
+
+    # ---- Connection ----
+    def connect(self):
+        if self.transport == "udp":
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect(self.address)
+        else:
+            sock = socket.create_connection(self.address, timeout=5)
+            sock.settimeout(None)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+
+    def start(self):
+        threading.Thread(target=self.run, name="site_client", daemon=True).start()
+
+    def run(self):
+        while True:
+            try:
+                self.connect()
+                logger.info(f"Connected to site coordinator {self.transport}://{self.address[0]}:{self.address[1]}")
+                self.receive()
+            except OSError as e:
+                logger.warning(f"Site coordinator connection failed: {e}")
+            self.sock = None
+            time.sleep(2.0)
+
+    def receive(self):
+        if self.transport == "udp":
+            while True:
+                try:
+                    message = self.sock.recv(protocol.MAX_MESSAGE)
+                except ConnectionRefusedError:
+                    # Nothing listening yet, UDP reports it on the next receive
+                    time.sleep(0.5)
+                    continue
+                self.handle_reply(message)
+        else:
+            with self.sock.makefile("rb") as sock_file:
+                while True:
+                    message = protocol.read_frame(sock_file)
+                    if message is None:
+                        raise ConnectionError("Coordinator closed the connection")
+                    self.handle_reply(message)
+
+    def send(self, message):
+        sock = self.sock
+        if sock is None:
+            return False
+        try:
+            with self.send_lock:
+                if self.transport == "udp":
+                    sock.send(message)
+                else:
+                    sock.sendall(protocol.frame(message))
+        except OSError:
+            return False
+        self.published_bytes_total.inc(len(message))
+        return True
+
+    def next_seq(self):
+        with self.seq_lock:
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            return self.seq
+
+    # ---- Messages ----
+    def publish(self, tracks, pan, tilt, flags):
+        """
+        tracks are site_protocol.TrackSummary.  Returns True if a message was sent.
+        """
+        now = time.monotonic()
+        # A new track is sent straight away, it may not be engaged until it has been assigned
+        track_ids = frozenset(t.track_id for t in tracks)
+        interval = self.min_interval if track_ids else self.idle_interval
+        if now - self.last_sent < interval and track_ids == self.last_tracks:
+            return False
+        message = protocol.encode_tracks(self.unit, self.next_seq(), now, pan, tilt, flags, tracks)
+        if not self.send(message):
+            return False
+        self.last_sent = now
+        self.last_tracks = track_ids
+        self.published_total.inc()
+        return True
+
+    def publish_recording(self, start_time, duration, max_conf, name, labels):
+        message = protocol.encode_recording(self.unit, self.next_seq(), time.monotonic(),
+                                            start_time, duration, max_conf, name, labels)
+        self.send(message)
+
+    def handle_reply(self, message):
+        try:
+            header, body = protocol.decode(message)
+        except ValueError as e:
+            logger.debug(f"Ignoring message from the coordinator: {e}")
+            return
+        if header.type != protocol.ASSIGN or header.unit != self.unit:
+            return
+        now = time.monotonic()
+        self.engage = {t.track_id: t.label for t in body["tracks"]}
+        self.objects = body["objects"]
+        self.assigned_at = now
+        self.last_latency = now - header.timestamp
+        self.assignment_seconds.observe(self.last_latency)
+
+    # ---- Used by the camera callback ----
+    def connected(self):
+        return self.assigned_at is not None and time.monotonic() - self.assigned_at < self.assignment_timeout
+
+    def may_engage(self, track_id):
+        return not self.connected() or track_id in self.engage
+
+    def status(self):
+        return {
+            "coordinator": f"{self.transport}://{self.address[0]}:{self.address[1]}",
+            "unit": self.unit,
+            "connected": self.connected(),
+            "engage": [{"track": track_id, "label": label} for track_id, label in sorted(self.engage.items())],
+            "site_objects": self.objects,
+            "latency_ms": None if self.last_latency is None else round(self.last_latency * 1000, 2),
+        }
@@ -0,0 +1,380 @@
+# site_coordinator.py
+"""
+Coordinates several turrets covering one site.
+
+Each unit (main.py with SITE_COORDINATOR set) sends a TRACKS message with
+what it sees a few times a second, see site_protocol.py.  The coordinator:
+
+    - merges the tracks of the same label by units whose views overlap and
+      whose site bearings are within merge_angle degrees into one site
+      object, so one heron seen by two turrets is one heron, while two
+      herons stay two objects (a unit's own tracks are never merged)
+    - assigns every site object to one unit, the one seeing it with the most
+      confidence, keeping the current unit while it still follows it and
+      giving each unit at most one object, so two turrets don't soak the
+      same heron while a second heron is left alone
+    - answers every TRACKS message with an ASSIGN message holding the track
+      ids that unit may engage
+    - keeps a short history of site events (one per animal visit, however
+      many units saw it) and the recordings the units made during them
+
+    python site_coordinator.py --udp 5600 --tcp 5601 --http 5680 --overlap 1,2 --overlap 2,3
+
+Bearings are only comparable if each unit's SITE_HEADING is set so that its
+heading plus its pan angle gives the same bearing as its neighbours' for
+the same spot.
+
+Without --overlap every unit is taken to overlap every other one.  /status
+on the HTTP port returns the units, objects, events and recordings as JSON,
+/metrics the Prometheus metrics.
+"""
+
+import argparse
+import json
+import logging
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import site_protocol as protocol
+from metrics import registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+logger = logging.getLogger("my_app_logger.site_coordinator")
+
+messages_total = registry.counter("turret_site_messages_total", "Messages received from the units")
+bytes_total = registry.counter("turret_site_bytes_total", "Bytes received from the units")
+bad_messages_total = registry.counter("turret_site_bad_messages_total", "Messages that could not be decoded")
+assign_seconds = registry.histogram("turret_site_assign_seconds", "Time to handle a TRACKS message and assign",
+                                    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01))
+
+
+class UnitState:
+    def __init__(self, unit):
+        self.unit = unit
+        self.first_seen = time.time()
+        self.last_seen = 0.0
+        self.tracks = []
+        self.pan = 0.0
+        self.tilt = 0.0
+        self.flags = 0
+        self.messages = 0
+        self.bytes = 0
+        # (time, bytes) of recent messages for the rate
+        self.recent = deque(maxlen=256)
+
+    def rate(self, now, window=10.0):
+        window = max(min(window, now - self.first_seen), 1.0)
+        count = 0
+        size = 0
+        for timestamp, length in self.recent:
+            if now - timestamp <= window:
+                count += 1
+                size += length
+        return round(count / window, 2), round(size / window, 1)
+
+
+class Coordinator:
+    def __init__(self, overlaps=None, track_timeout=1.0, event_gap=10.0, history=200, merge_angle=15.0):
+        """
+        overlaps: pairs of unit ids whose views overlap, None if all of them do
+        track_timeout: seconds after which a unit's last TRACKS no longer counts
+        event_gap: seconds without a sighting that end a site event
+        merge_angle: degrees between the bearings of two units' tracks that are still one object
+        """
+        self.overlaps = None if overlaps is None else {frozenset(pair) for pair in overlaps}
+        self.track_timeout = track_timeout
+        self.event_gap = event_gap
+        self.merge_angle = merge_angle
+        self.lock = threading.Lock()
+        self.units = {}
+        self.objects = []          # Current site objects, see assign()
+        self.engaged = set()       # (unit, track id) being engaged after the last assign()
+        self.events = deque(maxlen=history)
+        self.open_events = []
+        self.recordings = deque(maxlen=history)
+        self.next_event = 1
+
+    def overlapping(self, a, b):
+        return self.overlaps is None or frozenset((a, b)) in self.overlaps
+
+    def handle(self, message, now=None):
+        """
+        Handles one message from a unit.  Returns the reply to send back, or None.
+        """
+        now = time.time() if now is None else now
+        start = time.perf_counter()
+        messages_total.inc()
+        bytes_total.inc(len(message))
+        try:
+            header, body = protocol.decode(message)
+        except ValueError as e:
+            bad_messages_total.inc()
+            logger.debug(f"Ignoring message: {e}")
+            return None
+
+        with self.lock:
+            unit = self.units.get(header.unit)
+            if unit is None:
+                unit = self.units[header.unit] = UnitState(header.unit)
+                logger.info(f"Unit {header.unit} joined")
+            unit.messages += 1
+            unit.bytes += len(message)
+            unit.recent.append((now, len(message)))
+
+            if header.type == protocol.RECORDING:
+                self.add_recording(header.unit, body, now)
+                return None
+            if header.type != protocol.TRACKS:
+                return None
+
+            unit.last_seen = now
+            unit.tracks = body["tracks"]
+            unit.pan = body["pan"]
+            unit.tilt = body["tilt"]
+            unit.flags = body["flags"]
+            self.assign(now)
+            tracks = [protocol.AssignedTrack(obj["track"], obj["bearing"], obj["label"])
+                      for obj in self.objects if obj["unit"] == header.unit]
+            reply = protocol.encode_assign(header, len(self.objects), tracks)
+        assign_seconds.observe(time.perf_counter() - start)
+        return reply
+
+    def sightings(self, now):
+        """
+        (unit, TrackSummary) from the units heard from recently, best seen first.
+        """
+        seen = []
+        for unit in self.units.values():
+            if now - unit.last_seen > self.track_timeout:
+                continue
+            seen.extend((unit.unit, track) for track in unit.tracks)
+        seen.sort(key=lambda s: -s[1].conf)
+        return seen
+
+    def matches(self, obj, unit, track):
+        """
+        Degrees between track and obj if it may be the same animal, else None.
+        """
+        if obj["label"] != track.label or unit in obj["tracks"]:
+            return None
+        if not all(self.overlapping(unit, other) for other in obj["tracks"]):
+            return None
+        difference = abs((track.bearing - obj["bearing"] + 180) % 360 - 180)
+        return difference if difference <= self.merge_angle else None
+
+    def group(self, sightings):
+        """
+        Merges the sightings into site objects, each with at most one track per unit.
+        """
+        objects = []
+        for unit, track in sightings:
+            obj = None
+            best = None
+            for candidate in objects:
+                difference = self.matches(candidate, unit, track)
+                if difference is not None and (best is None or difference < best):
+                    obj, best = candidate, difference
+            if obj is None:
+                # The first (best) sighting's bearing stands for the object
+                obj = {"label": track.label, "bearing": track.bearing, "tracks": {}, "units": {},
+                       "unit": None, "track": None}
+                objects.append(obj)
+            obj["tracks"][unit] = track.track_id
+            obj["units"][unit] = track.conf
+        return objects
+
+    def assign(self, now):
+        objects = self.group(self.sightings(now))
+
+        # Best seen objects first, each unit engages at most one object
+        busy = set()
+        engaged = set()
+        for obj in sorted(objects, key=lambda o: -max(o["units"].values())):
+            current = next((u for u, t in obj["tracks"].items() if (u, t) in self.engaged and u not in busy), None)
+            if current is not None:
+                chosen = current
+            else:
+                free = [u for u in obj["units"] if u not in busy]
+                chosen = max(free, key=lambda u: obj["units"][u]) if free else None
+            if chosen is not None:
+                busy.add(chosen)
+                obj["unit"] = chosen
+                obj["track"] = obj["tracks"][chosen]
+                engaged.add((chosen, obj["track"]))
+        self.objects = objects
+        self.engaged = engaged
+        self.update_events(now)
+
+    def update_events(self, now):
+        claimed = []
+        for obj in self.objects:
+            units = set(obj["units"])
+            tracks = [[u, t] for u, t in obj["tracks"].items()]
+            # The event following one of the object's tracks, else a new sighting of a label
+            # that was already being seen there
+            event = next((e for e in self.open_events if any(t in e["tracks"] for t in tracks)), None)
+            if event is None:
+                event = next((e for e in self.open_events if e not in claimed
+                              and e["label"] == obj["label"] and units & set(e["units"])), None)
+            if event is None:
+                event = {"id": self.next_event, "label": obj["label"], "start": now, "end": now,
+                         "units": [], "max_conf": 0.0, "recordings": [], "tracks": []}
+                self.next_event += 1
+                self.open_events.append(event)
+                self.events.append(event)
+            claimed.append(event)
+            event["end"] = now
+            event["units"] = sorted(units | set(event["units"]))
+            event["tracks"] = tracks
+            event["max_conf"] = round(max(event["max_conf"], max(obj["units"].values())), 3)
+        self.open_events = [e for e in self.open_events if now - e["end"] <= self.event_gap]
+
+    def add_recording(self, unit, body, now):
+        recording = {"unit": unit, "received": now, **body, "max_conf": round(body["max_conf"], 3)}
+        # Linked to the events of the same labels that were going on during the recording
+        end = body["start_time"] + body["duration"]
+        recording["events"] = [
+            e["id"] for e in self.events
+            if e["label"] in body["labels"] and e["start"] <= end and e["end"] >= body["start_time"]
+        ]
+        for event in self.events:
+            if event["id"] in recording["events"]:
+                event["recordings"].append(f"{unit}:{body['name']}")
+        self.recordings.append(recording)
+
+    def status(self):
+        now = time.time()
+        with self.lock:
+            return {
+                "units": {
+                    unit.unit: {
+                        "age": round(now - unit.last_seen, 2) if unit.last_seen else None,
+                        "messages": unit.messages,
+                        "bytes": unit.bytes,
+                        "messages_per_second": unit.rate(now)[0],
+                        "bytes_per_second": unit.rate(now)[1],
+                        "pan": round(unit.pan, 1),
+                        "tilt": round(unit.tilt, 1),
+                        "flags": unit.flags,
+                        "tracks": [{"id": t.track_id, "label": t.label, "conf": round(t.conf, 2),
+                                    "bearing": round(t.bearing, 1)} for t in unit.tracks],
+                    } for unit in self.units.values()
+                },
+                "objects": [{"label": o["label"], "bearing": round(o["bearing"], 1), "unit": o["unit"],
+                             "track": o["track"], "seen_by": sorted(o["units"])} for o in self.objects],
+                "events": list(self.events),
+                "recordings": list(self.recordings),
+            }
+
+
+# ---- Transports ----
+def serve_udp(coordinator, host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+
+    def run():
+        while True:
+            message, address = sock.recvfrom(protocol.MAX_MESSAGE)
+            try:
+                reply = coordinator.handle(message)
+                if reply is not None:
+                    sock.sendto(reply, address)
+            except Exception as e:
+                logger.error(f"UDP message from {address} failed: {e}")
+    threading.Thread(target=run, name="site_udp", daemon=True).start()
+    logger.info(f"Site coordinator listening on udp://{host}:{port}")
+    return sock
+
+
+def serve_tcp(coordinator, host, port):
+    class Handler(socketserver.StreamRequestHandler):
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def handle(self):
+            while True:
+                message = protocol.read_frame(self.rfile)
+                if message is None:
+                    return
+                reply = coordinator.handle(message)
+                if reply is not None:
+                    self.wfile.write(protocol.frame(reply))
+
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.allow_reuse_address = True
+    threading.Thread(target=server.serve_forever, name="site_tcp", daemon=True).start()
+    logger.info(f"Site coordinator listening on tcp://{host}:{port}")
+    return server
+
+
+def serve_http(coordinator, host, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/status":
+                body = json.dumps(coordinator.status()).encode("utf-8")
+                content_type = "application/json"
+            elif self.path == "/metrics":
+                body = registry.render().encode("utf-8")
+                content_type = METRICS_CONTENT_TYPE
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="site_http", daemon=True).start()
+    logger.info(f"Site coordinator status on http://{host}:{port}/status")
+    return server
+
+
+def parse_overlaps(values):
+    if not values:
+        return None
+    return [tuple(int(u) for u in value.split(",")) for value in values]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordinate the turrets of one site")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--udp", type=int, default=5600, help="UDP port (0 to disable)")
+    parser.add_argument("--tcp", type=int, default=5601, help="TCP port (0 to disable)")
+    parser.add_argument("--http", type=int, default=5680, help="HTTP status port (0 to disable)")
+    parser.add_argument("--overlap", action="append", help="Units whose views overlap, e.g. 1,2 (repeat as needed)")
+    parser.add_argument("--track-timeout", type=float, default=1.0)
+    parser.add_argument("--event-gap", type=float, default=10.0)
+    parser.add_argument("--merge-angle", type=float, default=15.0,
+                        help="Degrees between two units' bearings that are still one animal")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    coordinator = Coordinator(parse_overlaps(args.overlap), args.track_timeout, args.event_gap,
+                              merge_angle=args.merge_angle)
+    if args.udp:
+        serve_udp(coordinator, args.host, args.udp)
+    if args.tcp:
+        serve_tcp(coordinator, args.host, args.tcp)
+    if args.http:
+        serve_http(coordinator, args.host, args.http)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# site_protocol.py
+"""
+Binary messages between the turrets of one site and the site coordinator
+(site_coordinator.py), over UDP (one message per datagram) or TCP (each
+message prefixed with its length as an unsigned 16 bit integer).
+
+Every message starts with the same header, little endian:
+
+    magic "TS", version, type, unit id (u16), sequence number (u32),
+    timestamp (f64)
+
+For TRACKS and RECORDING the timestamp is the unit's time.monotonic() when
+it was sent; the coordinator copies header, sequence number and timestamp
+into its ASSIGN reply, so the unit can measure the round trip with its own
+clock.
+
+    TRACKS     unit -> coordinator, what the unit sees now:
+               pan, tilt (f32), flags (u8), track count (u8), then per track
+               the label, track id (u16, the unit's own, stable while it
+               follows the object), confidence (u8, 0 - 255), box (4 x u16,
+               0 - 65535 of the frame, x, y, w, h) and site bearing (f32,
+               degrees, the unit's heading plus the pan pointing at it)
+    ASSIGN     coordinator -> unit, the tracks the unit may engage:
+               site object count (u16), track count (u8), then per track
+               the track id (u16), the object's site bearing (f32) and label
+    RECORDING  unit -> coordinator, a finished recording:
+               start time (f64, epoch), duration (f32), max confidence (u8),
+               name, label count (u8), labels
+
+Labels and names are a length byte followed by UTF-8.  A TRACKS message
+with three tracks is about 95 bytes.
+"""
+
+import struct
+from typing import NamedTuple
+
+MAGIC = b"TS"
+VERSION = 2
+
+TRACKS = 1
+ASSIGN = 2
+RECORDING = 3
+
+# Flags in TRACKS
+ACQUIRED = 1
+RECORDING_ACTIVE = 2
+FIRING = 4
+
+HEADER = struct.Struct("<2sBBHId")
+TRACKS_BODY = struct.Struct("<ffBB")
+TRACK = struct.Struct("<HBHHHHf")
+ASSIGNED = struct.Struct("<Hf")
+ASSIGN_BODY = struct.Struct("<HB")
+RECORDING_BODY = struct.Struct("<dfB")
+LENGTH = struct.Struct("<H")
+
+MAX_MESSAGE = 65507   # Largest UDP payload
+
+
+class Header(NamedTuple):
+    type: int
+    unit: int
+    seq: int
+    timestamp: float
+
+
+class TrackSummary(NamedTuple):
+    label: str
+    conf: float
+    box: tuple          # (x, y, w, h) 0.0 - 1.0 of the frame
+    track_id: int = 0
+    bearing: float = 0.0
+
+
+class AssignedTrack(NamedTuple):
+    track_id: int
+    bearing: float
+    label: str
+
+
+def pack_text(text):
+    data = text.encode("utf-8")[:255]
+    return bytes((len(data),)) + data
+
+
+def unpack_text(message, offset):
+    length = message[offset]
+    end = offset + 1 + length
+    if end > len(message):
+        raise ValueError("Message truncated")
+    return message[offset + 1:end].decode("utf-8", "replace"), end
+
+
+def unit16(value):
+    return min(max(int(value * 65535), 0), 65535)
+
+
+def encode_tracks(unit, seq, timestamp, pan, tilt, flags, tracks):
+    parts = [
+        HEADER.pack(MAGIC, VERSION, TRACKS, unit, seq, timestamp),
+        TRACKS_BODY.pack(pan, tilt, flags, min(len(tracks), 255)),
+    ]
+    for track in tracks[:255]:
+        x, y, w, h = track.box
+        parts.append(pack_text(track.label))
+        parts.append(TRACK.pack(track.track_id & 0xFFFF, min(max(int(track.conf * 255), 0), 255),
+                                unit16(x), unit16(y), unit16(w), unit16(h), track.bearing))
+    return b"".join(parts)
+
+
+def encode_assign(header, objects, tracks):
+    """
+    tracks are AssignedTrack.
+    """
+    parts = [
+        HEADER.pack(MAGIC, VERSION, ASSIGN, header.unit, header.seq, header.timestamp),
+        ASSIGN_BODY.pack(min(objects, 65535), min(len(tracks), 255)),
+    ]
+    for track in tracks[:255]:
+        parts.append(ASSIGNED.pack(track.track_id & 0xFFFF, track.bearing))
+        parts.append(pack_text(track.label))
+    return b"".join(parts)
+
+
+def encode_recording(unit, seq, timestamp, start_time, duration, max_conf, name, labels):
+    parts = [
+        HEADER.pack(MAGIC, VERSION, RECORDING, unit, seq, timestamp),
+        RECORDING_BODY.pack(start_time, duration, min(max(int((max_conf or 0.0) * 255), 0), 255)),
+        pack_text(name),
+        bytes((min(len(labels), 255),)),
+    ]
+    parts.extend(pack_text(label) for label in sorted(labels)[:255])
+    return b"".join(parts)
+
+
+def decode(message):
+    """
+    Returns (Header, body dict).  Raises ValueError for anything that is not a valid message.
+    """
+    try:
+        magic, version, kind, unit, seq, timestamp = HEADER.unpack_from(message, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a site message")
+        header = Header(kind, unit, seq, timestamp)
+        offset = HEADER.size
+
+        if kind == TRACKS:
+            pan, tilt, flags, count = TRACKS_BODY.unpack_from(message, offset)
+            offset += TRACKS_BODY.size
+            tracks = []
+            for _ in range(count):
+                label, offset = unpack_text(message, offset)
+                track_id, conf, x, y, w, h, bearing = TRACK.unpack_from(message, offset)
+                offset += TRACK.size
+                tracks.append(TrackSummary(label, conf / 255, (x / 65535, y / 65535, w / 65535, h / 65535),
+                                           track_id, bearing))
+            return header, {"pan": pan, "tilt": tilt, "flags": flags, "tracks": tracks}
+
+        if kind == ASSIGN:
+            objects, count = ASSIGN_BODY.unpack_from(message, offset)
+            offset += ASSIGN_BODY.size
+            tracks = []
+            for _ in range(count):
+                track_id, bearing = ASSIGNED.unpack_from(message, offset)
+                label, offset = unpack_text(message, offset + ASSIGNED.size)
+                tracks.append(AssignedTrack(track_id, bearing, label))
+            return header, {"objects": objects, "tracks": tracks}
+
+        if kind == RECORDING:
+            start_time, duration, max_conf = RECORDING_BODY.unpack_from(message, offset)
+            offset += RECORDING_BODY.size
+            name, offset = unpack_text(message, offset)
+            count = message[offset]
+            offset += 1
+            labels = []
+            for _ in range(count):
+                label, offset = unpack_text(message, offset)
+                labels.append(label)
+            return header, {"start_time": start_time, "duration": duration, "max_conf": max_conf / 255,
+                            "name": name, "labels": labels}
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Bad site message: {e}")
+    raise ValueError(f"Unknown site message type {kind}")
+
+
+def frame(message):
+    """
+    A message with its length prefix, for TCP.
+    """
+    return LENGTH.pack(len(message)) + message
+
+
+def read_frame(sock_file):
+    """
+    Reads one length prefixed message from a socket file, None at the end of the stream.
+    """
+    prefix = sock_file.read(LENGTH.size)
+    if len(prefix) < LENGTH.size:
+        return None
+    (length,) = LENGTH.unpack(prefix)
+    message = sock_file.read(length)
+    if len(message) < length:
+        return None
+    return message
@@ -0,0 +1,138 @@
+# startup.py
+"""
+Runs the start up phases of main.py concurrently and times them.
+
+Start up used to be one long serial sequence: open the PCA9685, sleep and
+home the servos, load the network, start the camera (which uploads the
+firmware to the IMX500), and only then start the web server.  Most of those
+only wait on hardware and don't depend on each other, so each phase runs on
+its own thread as soon as the phases it needs have finished:
+
+    startup = Startup()
+    startup.add("servos", start_servos)
+    startup.add("network", load_network)
+    startup.add("camera", start_camera, after=("network",))
+    startup.add("guarding", start_guarding, after=("camera", "servos"))
+    startup.run()
+
+run() waits for every phase, logs a timing breakdown and returns the names
+of the phases that failed (a phase whose dependency failed is skipped).
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger("my_app_logger.startup")
+
+
+def process_age():
+    """
+    Seconds since this process was created, i.e. interpreter start up and the imports.
+    """
+    import psutil
+    return time.time() - psutil.Process().create_time()
+
+
+class Phase:
+    def __init__(self, name, function, after):
+        self.name = name
+        self.function = function
+        self.after = tuple(after)
+        self.done = threading.Event()
+        self.started = None       # Seconds since Startup was created
+        self.finished = None
+        self.status = "waiting"   # waiting, running, ok, failed or skipped
+        self.error = None
+
+
+class Startup:
+    def __init__(self):
+        self.created = time.monotonic()
+        self.phases = {}
+        self.imports_seconds = None
+        # Set once run() has finished, the web routes answer 503 until then
+        self.ready = threading.Event()
+
+    def add(self, name, function, after=()):
+        for dependency in after:
+            if dependency not in self.phases:
+                raise ValueError(f"Start up phase {name} depends on unknown phase {dependency}")
+        self.phases[name] = Phase(name, function, after)
+
+    def elapsed(self):
+        return time.monotonic() - self.created
+
+    def run_phase(self, phase):
+        for dependency in phase.after:
+            self.phases[dependency].done.wait()
+        failed = [d for d in phase.after if self.phases[d].status != "ok"]
+        if failed:
+            phase.status = "skipped"
+            phase.error = f"needs {', '.join(failed)}"
+            phase.done.set()
+            return
+
+        phase.status = "running"
+        phase.started = self.elapsed()
+        try:
+            phase.function()
+            phase.status = "ok"
+        except Exception as e:
+            phase.status = "failed"
+            phase.error = str(e)
+            logger.error(f"Start up phase {phase.name} failed: {e}")
+        phase.finished = self.elapsed()
+        phase.done.set()
+
+    def run(self):
+        """
+        Runs every phase and waits for them.  Returns the names of the phases that did not succeed.
+        """
+        try:
+            self.imports_seconds = process_age() - self.elapsed()
+        except Exception:
+            pass
+        threads = []
+        for phase in self.phases.values():
+            thread = threading.Thread(target=self.run_phase, args=(phase,), name=f"startup_{phase.name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        self.log_breakdown()
+        failed = [p.name for p in self.phases.values() if p.status != "ok"]
+        if not failed:
+            self.ready.set()
+        return failed
+
+    def log_breakdown(self):
+        lines = ["Start up timing:"]
+        if self.imports_seconds is not None:
+            lines.append(f"    {'imports':<12} {self.imports_seconds:6.2f}s before the phases")
+        for phase in self.phases.values():
+            if phase.started is None:
+                lines.append(f"    {phase.name:<12} {phase.status} ({phase.error})")
+                continue
+            lines.append(f"    {phase.name:<12} {phase.started:6.2f}s -> {phase.finished:6.2f}s "
+                         f"{phase.finished - phase.started:6.2f}s  {phase.status}")
+        lines.append(f"    {'total':<12} {self.elapsed():6.2f}s")
+        logger.info("\n".join(lines))
+
+    def report(self):
+        """
+        Phase timings for /system_info.
+        """
+        return {
+            "imports_seconds": None if self.imports_seconds is None else round(self.imports_seconds, 3),
+            "ready": self.ready.is_set(),
+            "phases": [{
+                "name": p.name,
+                "after": list(p.after),
+                "status": p.status,
+                "started": None if p.started is None else round(p.started, 3),
+                "seconds": None if p.finished is None else round(p.finished - p.started, 3),
+                "error": p.error,
+            } for p in self.phases.values()],
+        }
@@ -0,0 +1,70 @@
+# status_stream.py
+"""
+Server-Sent Events stream of the turret status (/status/stream).
+
+One shared snapshot (mode, recording, pistol, pan/tilt, tracker state and
+current targets) is kept up to date by the camera side.  Every change bumps
+a version number and wakes the waiting streams, each of which sends only the
+keys that changed since its last message.  Bursts of changes are coalesced
+so a stream never sends more than one message per min_interval, and a
+comment line is sent as a keepalive when nothing has changed for a while.
+
+The web process (WEB_SERVER_PROCESS) cannot stream through the web bridge,
+so it long-polls wait_for_change over the bridge and runs the same
+sse_events generator on its side.
+"""
+
+import json
+import threading
+import time
+
+
+class StatusBroadcaster:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+        self.snapshot = {}
+
+    def update(self, values):
+        """
+        Merges values into the snapshot, waking the streams if anything changed.
+        """
+        with self.condition:
+            if all(self.snapshot.get(key) == value for key, value in values.items()):
+                return
+            # Replace rather than modify, so readers can keep the old dict without a lock
+            self.snapshot = {**self.snapshot, **values}
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        """
+        Blocks until the snapshot is newer than version or timeout expires.
+        Returns (version, snapshot), with the version unchanged on timeout.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout=timeout)
+            return self.version, self.snapshot
+
+
+def sse_events(wait_for_change, heartbeat=15.0, min_interval=0.1):
+    """
+    Generator of SSE messages: a "snapshot" event with everything first,
+    then "delta" events with just the changed keys.
+    """
+    version = -1
+    sent = None
+    while True:
+        new_version, snapshot = wait_for_change(version, heartbeat)
+        if new_version == version:
+            yield ": keepalive\n\n"
+            continue
+        version = new_version
+        if sent is None:
+            yield f"id: {version}\nevent: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+        else:
+            delta = {key: value for key, value in snapshot.items() if sent.get(key) != value}
+            if delta:
+                yield f"id: {version}\nevent: delta\ndata: {json.dumps(delta)}\n\n"
+        sent = snapshot
+        time.sleep(min_interval)
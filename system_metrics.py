@@ -0,0 +1,185 @@
+# system_metrics.py
+"""
+Background sampler for the System Info page.
+
+psutil.cpu_percent(interval=0.1) used to sleep inside every /system_info
+request, and temperature, memory, swap, disk and the board model were all
+re-read each time.  Instead one thread takes a sample every interval and
+keeps the last `history` samples in a ring buffer, so the endpoints only
+return what is already there.  Besides the system wide numbers each sample
+has the CPU and resident memory of this process and its children (the web
+process, video conversions...).
+
+Things that never change while running (board model, OS, Python version,
+installed packages) are read once.
+
+psutil and importlib.metadata are imported on first use, on the sampler
+thread, so importing this module costs nothing at start up.
+"""
+
+import logging
+import os
+import platform
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+logger = logging.getLogger("my_app_logger.system_metrics")
+
+MB = 1024 * 1024
+
+
+def get_cpu_temperature():
+    temp_path = "/sys/class/thermal/thermal_zone0/temp"
+    if os.path.exists(temp_path):
+        try:
+            with open(temp_path, "r") as f:
+                millideg = f.read().strip()
+                return float(millideg) / 1000.0
+        except Exception:
+            pass
+    return None
+
+
+def get_platform_name():
+    model_path = "/proc/device-tree/model"
+    if os.path.exists(model_path):
+        try:
+            with open(model_path, "r") as f:
+                return f.read().strip()
+        except Exception:
+            pass
+    return platform.platform()
+
+
+@lru_cache(maxsize=1)
+def platform_info():
+    return {
+        "platform_name": get_platform_name(),
+        "os_version": platform.platform(),
+        "python_version": platform.python_version(),
+    }
+
+
+@lru_cache(maxsize=1)
+def installed_packages():
+    """
+    Installed distributions of this interpreter, sorted by name.  Walking them
+    is slow on an SD card and they only change with a restart.
+    """
+    import importlib.metadata
+    installed = {}
+    for dist in importlib.metadata.distributions():
+        installed[dist.metadata["Name"]] = dist.metadata["Version"]
+    return dict(sorted(installed.items(), key=lambda x: x[0].lower()))
+
+
+class SystemSampler:
+    def __init__(self, interval=2.0, history=900, disk_path="/"):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.samples = deque(maxlen=history)
+        self.process = None    # psutil.Process of this process, set on the sampler thread
+        # Process objects are kept between samples, cpu_percent measures since the previous call
+        self.children = {}
+
+    def start(self):
+        threading.Thread(target=self.run, name="system_sampler", daemon=True).start()
+
+    def run(self):
+        import psutil
+        self.process = psutil.Process()
+        # Prime the CPU counters so the first real sample covers a whole interval
+        psutil.cpu_percent(interval=None)
+        self.process.cpu_percent(interval=None)
+        # Warm the caches off the request path
+        platform_info()
+        installed_packages()
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.samples.append(self.take_sample())
+            except Exception as e:
+                logger.warning(f"System sample failed: {e}")
+
+    def process_stats(self):
+        import psutil
+        processes = [self.process]
+        try:
+            children = self.process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        current = {}
+        for child in children:
+            # Reuse the Process we already have so its cpu_percent has a baseline
+            current[child.pid] = self.children.get(child.pid, child)
+        self.children = current
+        processes.extend(current.values())
+
+        stats = []
+        for proc in processes:
+            try:
+                with proc.oneshot():
+                    stats.append({
+                        "pid": proc.pid,
+                        "name": proc.name(),
+                        "cpu": proc.cpu_percent(interval=None),
+                        "rss_mb": round(proc.memory_info().rss / MB, 1),
+                    })
+            except psutil.Error:
+                continue
+        return stats
+
+    def take_sample(self):
+        import psutil
+        mem = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        processes = self.process_stats()
+        return {
+            "time": time.time(),
+            "temperature": get_cpu_temperature(),
+            "cpu_usage": psutil.cpu_percent(interval=None),
+            "memory": {
+                "total_mb": round(mem.total / MB, 2),
+                "used_mb":  round(mem.used / MB, 2),
+                "free_mb":  round(mem.available / MB, 2),
+            },
+            "swap": {
+                "total_mb": round(swap.total / MB, 2),
+                "used_mb":  round(swap.used / MB, 2),
+            },
+            "disk": {
+                "total_mb": round(disk.total / MB, 2),
+                "used_mb":  round(disk.used / MB, 2),
+                "free_mb":  round(disk.free / MB, 2),
+            },
+            "processes": processes,
+            "process_cpu": round(sum(p["cpu"] for p in processes), 1),
+            "process_rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+        }
+
+    def latest(self):
+        """
+        Newest sample merged with the static platform info (just the latter before the first sample).
+        """
+        sample = self.samples[-1] if self.samples else {}
+        return {**sample, **platform_info()}
+
+    def history(self, seconds=None):
+        """
+        One list per series for the samples of the last `seconds` (all of them if None).
+        """
+        samples = list(self.samples)
+        if seconds is not None:
+            cutoff = time.time() - seconds
+            samples = [s for s in samples if s["time"] >= cutoff]
+        return {
+            "time": [round(s["time"], 1) for s in samples],
+            "cpu": [s["cpu_usage"] for s in samples],
+            "temperature": [s["temperature"] for s in samples],
+            "memory_used_mb": [s["memory"]["used_mb"] for s in samples],
+            "process_cpu": [s["process_cpu"] for s in samples],
+            "process_rss_mb": [s["process_rss_mb"] for s in samples],
+        }
@@ -0,0 +1,82 @@
+# metrics_scrape.py
+"""
+Stand-in for a Prometheus server: scrapes /metrics from one or more turrets
+every few seconds, checks the output parses, and prints how long each scrape
+took together with the per-second rates of the counters.
+
+    python test_scripts/metrics_scrape.py http://turret1.local:5000 http://turret2.local:5000
+"""
+
+import argparse
+import time
+import urllib.request
+
+
+def parse_metrics(text):
+    """
+    Returns {sample name (with labels): value} and {family: type}, raising ValueError on bad lines.
+    """
+    samples = {}
+    types = {}
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if not line:
+            continue
+        if line.startswith("# TYPE "):
+            _, _, family, kind = line.split(" ", 3)
+            if family in types:
+                raise ValueError(f"line {line_number}: family {family} repeated")
+            types[family] = kind
+            continue
+        if line.startswith("#"):
+            continue
+        name, value = line.rsplit(" ", 1)
+        samples[name] = float(value)
+    return samples, types
+
+
+def scrape(url):
+    start = time.perf_counter()
+    with urllib.request.urlopen(url.rstrip("/") + "/metrics", timeout=5) as response:
+        text = response.read().decode("utf-8")
+    return text, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape turret /metrics endpoints")
+    parser.add_argument("urls", nargs="+", help="Base URL of each turret web server")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between scrapes")
+    parser.add_argument("--count", type=int, default=0, help="Number of scrapes (0 = forever)")
+    args = parser.parse_args()
+
+    previous = {}
+    scrapes = 0
+    while True:
+        for url in args.urls:
+            try:
+                text, duration = scrape(url)
+                samples, types = parse_metrics(text)
+            except Exception as e:
+                print(f"{url}: scrape failed: {e}")
+                continue
+
+            print(f"{url}: {len(samples)} samples in {duration * 1000:.1f} ms")
+            now = time.time()
+            if url in previous:
+                last_time, last_samples = previous[url]
+                elapsed = now - last_time
+                for name, value in sorted(samples.items()):
+                    if types.get(name) == "counter" and name in last_samples:
+                        print(f"    {name}: {(value - last_samples[name]) / elapsed:.2f}/s")
+            for name, value in sorted(samples.items()):
+                if types.get(name) == "gauge":
+                    print(f"    {name} = {value:g}")
+            previous[url] = (now, samples)
+
+        scrapes += 1
+        if args.count and scrapes >= args.count:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# postprocess_benchmark.py
+"""
+Micro-benchmark of the "yolov8" host-side decode and NMS (yolo_decode.py)
+against the per-class NMS it replaces.
+
+Builds synthetic YOLOv8 head outputs (4 + classes rows, one column per
+anchor) with a few objects, each surrounded by many overlapping candidate
+boxes, then times:
+
+    reference   best class per anchor, then NMS class by class with a full
+                sort, the way picamera2's combined_nms works
+    picamera2   picamera2's combined_nms itself, if picamera2 is installed
+    yolo_decode YoloDecoder.decode()
+
+and checks that yolo_decode keeps the same detections as the reference.
+
+    python test_scripts/postprocess_benchmark.py --anchors 8400 --classes 6 --objects 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from yolo_decode import YoloDecoder  # noqa: E402
+
+
+def make_outputs(anchors, classes, objects, input_size, rng):
+    head = np.zeros((4 + classes, anchors), dtype=np.float32)
+    head[0:2] = rng.uniform(0, input_size, (2, anchors))
+    head[2:4] = rng.uniform(4, 40, (2, anchors))
+    head[4:] = rng.uniform(0, 0.2, (classes, anchors))
+    # Each object is found by a cluster of anchors with jittered boxes
+    per_object = anchors // (objects * 20)
+    for n in range(objects):
+        columns = rng.choice(anchors, per_object, replace=False)
+        cx, cy = rng.uniform(60, input_size - 60, 2)
+        w, h = rng.uniform(30, 120, 2)
+        head[0, columns] = cx + rng.normal(0, 3, per_object)
+        head[1, columns] = cy + rng.normal(0, 3, per_object)
+        head[2, columns] = w + rng.normal(0, 3, per_object)
+        head[3, columns] = h + rng.normal(0, 3, per_object)
+        head[4 + n % classes, columns] = rng.uniform(0.3, 0.95, per_object)
+    return [head[np.newaxis]]
+
+
+def reference_nms(boxes, scores, iou):
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x0 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y0 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x1 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y1 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        order = rest[intersection / (area[i] + area[rest] - intersection + 1e-9) <= iou]
+    return keep
+
+
+def reference_decode(np_outputs, threshold, iou, max_detections):
+    head = np_outputs[0][0].T
+    cx, cy, w, h = head[:, :4].T
+    boxes = np.stack((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2), axis=1)
+    scores = head[:, 4:]
+    best_class = scores.argmax(axis=1)
+    best_score = scores.max(axis=1)
+    results = []
+    for c in np.unique(best_class):
+        index = np.flatnonzero((best_class == c) & (best_score >= threshold))
+        for i in reference_nms(boxes[index], best_score[index], iou):
+            results.append((best_score[index[i]], c, boxes[index[i]]))
+    results.sort(key=lambda r: -r[0])
+    return results[:max_detections]
+
+
+def picamera2_decode(combined_nms, np_outputs, threshold, iou, max_detections):
+    head = np_outputs[0][0].T
+    cx, cy, w, h = head[:, :4].T
+    boxes = np.stack((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2), axis=1)
+    return combined_nms(boxes[np.newaxis], head[np.newaxis, :, 4:], iou, threshold, max_detections)
+
+
+def time_it(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000, np.percentile(timings, 95) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the yolov8 host-side decode and NMS")
+    parser.add_argument("--anchors", type=int, default=8400)
+    parser.add_argument("--classes", type=int, default=6)
+    parser.add_argument("--objects", type=int, default=10)
+    parser.add_argument("--input-size", type=int, default=640)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.45)
+    parser.add_argument("--max-detections", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    outputs = make_outputs(args.anchors, args.classes, args.objects, args.input_size, rng)
+    input_size = (args.input_size, args.input_size)
+    decoder = YoloDecoder()
+
+    reference = reference_decode(outputs, args.threshold, args.iou, args.max_detections)
+    boxes, scores, classes = decoder.decode(outputs, input_size, args.threshold, args.iou,
+                                            args.max_detections, args.top_k)
+    expected = sorted((int(c), round(float(s), 5)) for s, c, _ in reference)
+    found = sorted((int(c), round(float(s), 5)) for s, c in zip(scores, classes))
+    candidates = int(np.sum(outputs[0][0][4:].max(axis=0) >= args.threshold))
+    print(f"{args.anchors} anchors, {args.classes} classes, {candidates} candidates above the threshold")
+    print(f"detections: reference {len(expected)}, yolo_decode {len(found)}, "
+          f"{'same' if expected == found else 'DIFFERENT'}")
+    if expected != found and candidates > args.top_k:
+        print(f"    (only the best {args.top_k} candidates go into NMS, try a larger --top-k)")
+
+    results = [("reference", time_it(lambda: reference_decode(outputs, args.threshold, args.iou,
+                                                              args.max_detections), args.repeat))]
+    try:
+        from picamera2.devices.imx500.postprocess import combined_nms
+        results.append(("picamera2", time_it(lambda: picamera2_decode(combined_nms, outputs, args.threshold, args.iou,
+                                                                      args.max_detections), args.repeat)))
+    except ImportError:
+        print("picamera2 not installed, skipping its combined_nms")
+    results.append(("yolo_decode", time_it(lambda: decoder.decode(outputs, input_size, args.threshold, args.iou,
+                                                                  args.max_detections, args.top_k), args.repeat)))
+
+    for name, (median, p95) in results:
+        print(f"    {name:<12} median {median:7.3f} ms   p95 {p95:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
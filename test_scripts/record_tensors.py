@@ -0,0 +1,86 @@
+# record_tensors.py
+"""
+Records the raw IMX500 output tensors of one model for model_benchmark.py.
+
+Runs the camera with the given network and saves every inference result as
+frame_000001.npz (the output tensors, the network input size and where the
+network input sits in the main stream image), optionally with the main
+stream frame as frame_000001.jpg so the clip can be labelled afterwards.
+Labels go next to the frames as frame_000001.txt in the YOLO format
+(class index, centre x, centre y, width, height, all 0.0 - 1.0 of the image)
+with the class names, one per line, in classes.txt in the recordings directory.
+
+    python test_scripts/record_tensors.py models/train_foxes_yolov8n_175_32 recordings/ --frames 300 --images
+
+Run it once per model, pointing the camera at the same scene.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from picamera2 import Picamera2
+from picamera2.devices import IMX500
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record IMX500 output tensors for model_benchmark.py")
+    parser.add_argument("model", help="Model directory holding network.rpk")
+    parser.add_argument("recordings", help="Recordings directory, the frames go in a sub directory named after the model")
+    parser.add_argument("--frames", type=int, default=300, help="Number of inference results to save")
+    parser.add_argument("--images", action="store_true", help="Also save the main stream frame as a JPEG")
+    parser.add_argument("--size", default="1280x720", help="Main stream size")
+    args = parser.parse_args()
+
+    model_name = os.path.basename(os.path.normpath(args.model))
+    output_dir = os.path.join(args.recordings, model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    width, height = (int(v) for v in args.size.split("x"))
+
+    imx500 = IMX500(os.path.join(args.model, "network.rpk"))
+    picam2 = Picamera2(imx500.camera_num)
+    picam2.configure(picam2.create_video_configuration(
+        main={"size": (width, height), "format": "RGB888"},
+        controls={"FrameRate": 10},
+        buffer_count=6
+    ))
+    imx500.show_network_fw_progress_bar()
+    picam2.start()
+    print(f"Recording {args.frames} results of {model_name} into {output_dir}")
+
+    saved = 0
+    start = time.time()
+    while saved < args.frames:
+        request = picam2.capture_request()
+        try:
+            metadata = request.get_metadata()
+            outputs = imx500.get_outputs(metadata, add_batch=True)
+            if outputs is None:
+                continue
+            # The whole network input in main stream pixels, the benchmark maps the boxes with it
+            x, y, w, h = imx500.convert_inference_coords((0.0, 0.0, 1.0, 1.0), metadata, picam2)
+            saved += 1
+            name = os.path.join(output_dir, f"frame_{saved:06d}")
+            arrays = {f"out{i}": output for i, output in enumerate(outputs)}
+            np.savez_compressed(
+                name + ".npz",
+                input_size=np.array(imx500.get_input_size()),
+                input_rect=np.array([x / width, y / height, w / width, h / height]),
+                **arrays
+            )
+            if args.images:
+                cv2.imwrite(name + ".jpg", request.make_array("main"))
+        finally:
+            request.release()
+        sys.stdout.write(f"\r{saved}/{args.frames}")
+        sys.stdout.flush()
+
+    picam2.stop()
+    print(f"\nSaved {saved} results in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
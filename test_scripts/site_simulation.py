@@ -0,0 +1,161 @@
+# site_simulation.py
+"""
+Runs a site coordinator and several simulated turrets on one host, no camera
+or servos needed, and reports the throughput per unit and the end-to-end
+assignment latency.
+
+The simulated site is a ring of 360 degrees with the units spread around it,
+each seeing a 150 degree arc, so neighbours overlap.  Animals wander around
+the ring; every frame each unit publishes the animals in its arc through
+the same SiteClient main.py uses, and "engages" the best one it may engage.
+At the end it counts the frames in which two units engaged the same animal
+and the frames in which a visible animal was engaged by nobody although
+some unit seeing it was free.  With more animals than the four labels some
+share a label, which the coordinator must still keep apart.
+
+    python test_scripts/site_simulation.py --units 3 --animals 3 --seconds 20
+    python test_scripts/site_simulation.py --animals 6                          # two animals per label
+    python test_scripts/site_simulation.py --transport tcp
+    python test_scripts/site_simulation.py --coordinator udp://127.0.0.1:5600   # an already running coordinator
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import site_coordinator  # noqa: E402
+import site_protocol as protocol  # noqa: E402
+from site_client import SiteClient  # noqa: E402
+
+LABELS = ("herons", "foxes", "cats", "magpies")
+VIEW_ARC = 150.0
+
+
+class Animal:
+    def __init__(self, number, rng):
+        self.number = number
+        self.label = LABELS[number % len(LABELS)]
+        self.position = rng.uniform(0, 360)
+        self.speed = rng.uniform(-8, 8)
+        self.conf = rng.uniform(0.5, 0.95)
+
+    def move(self, dt, rng):
+        self.speed += rng.gauss(0, 2) * dt
+        self.position = (self.position + self.speed * dt) % 360
+
+
+def angle_in_view(position, centre):
+    return abs((position - centre + 180) % 360 - 180) <= VIEW_ARC / 2
+
+
+class SimulatedUnit:
+    def __init__(self, unit, centre, address):
+        self.unit = unit
+        self.centre = centre
+        self.client = SiteClient(address, unit, min_interval=0.1)
+        self.frames = 0
+        self.engaged = None
+        self.latencies = []
+        self.last_assigned = None
+
+    def visible(self, animals):
+        return [a for a in animals if angle_in_view(a.position, self.centre)]
+
+    def frame(self, animals):
+        seen = self.visible(animals)
+        tracks = []
+        for animal in seen:
+            offset = ((animal.position - self.centre + 180) % 360 - 180) / VIEW_ARC + 0.5
+            # Each unit's own track ids, the ring position stands in for the site bearing
+            tracks.append(protocol.TrackSummary(animal.label, animal.conf, (offset - 0.05, 0.4, 0.1, 0.2),
+                                                animal.number + 1, animal.position))
+        flags = protocol.ACQUIRED if tracks else 0
+        self.client.publish(tracks, self.centre, 0.0, flags)
+        if self.client.assigned_at != self.last_assigned:
+            self.last_assigned = self.client.assigned_at
+            self.latencies.append(self.client.last_latency)
+        targets = [a for a in seen if self.client.may_engage(a.number + 1)]
+        self.engaged = max(targets, key=lambda a: a.conf) if targets else None
+        self.frames += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate several turrets and a site coordinator")
+    parser.add_argument("--units", type=int, default=3)
+    parser.add_argument("--animals", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--transport", choices=("udp", "tcp"), default="udp")
+    parser.add_argument("--port", type=int, default=5600)
+    parser.add_argument("--coordinator", help="Use a running coordinator at this address instead of starting one")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.coordinator:
+        address = args.coordinator
+        coordinator = None
+    else:
+        # Neighbours on the ring overlap
+        overlaps = [(u, u % args.units + 1) for u in range(1, args.units + 1)]
+        coordinator = site_coordinator.Coordinator(overlaps)
+        if args.transport == "udp":
+            site_coordinator.serve_udp(coordinator, "127.0.0.1", args.port)
+        else:
+            site_coordinator.serve_tcp(coordinator, "127.0.0.1", args.port)
+        address = f"{args.transport}://127.0.0.1:{args.port}"
+
+    rng = random.Random(1)
+    animals = [Animal(n, rng) for n in range(args.animals)]
+    units = [SimulatedUnit(u, (u - 1) * 360 / args.units, address) for u in range(1, args.units + 1)]
+    for unit in units:
+        unit.client.start()
+    time.sleep(0.5)
+
+    double_engaged = 0
+    missed = 0
+    frames = 0
+    dt = 1.0 / args.fps
+    end = time.monotonic() + args.seconds
+    next_frame = time.monotonic()
+    while time.monotonic() < end:
+        for animal in animals:
+            animal.move(dt, rng)
+        for unit in units:
+            unit.frame(animals)
+        frames += 1
+        engaged = [u.engaged.number for u in units if u.engaged is not None]
+        double_engaged += len(engaged) - len(set(engaged))
+        busy = {u.unit for u in units if u.engaged is not None}
+        for animal in animals:
+            if animal.number in engaged:
+                continue
+            if any(u.unit not in busy and animal in u.visible(animals) for u in units):
+                missed += 1
+        next_frame += dt
+        time.sleep(max(0.0, next_frame - time.monotonic()))
+
+    print(f"{args.units} units, {args.animals} animals, {frames} frames over {args.transport}")
+    for unit in units:
+        latencies = np.array(unit.latencies) * 1000
+        if latencies.size:
+            latency = f"p50 {np.percentile(latencies, 50):.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms"
+        else:
+            latency = "no assignments received"
+        print(f"    unit {unit.unit}: {unit.frames / args.seconds:.1f} frames/s, "
+              f"{len(unit.latencies)} assignments, round trip {latency}")
+    if coordinator is not None:
+        for unit, info in sorted(coordinator.status()["units"].items()):
+            print(f"    coordinator <- unit {unit}: {info['messages_per_second']} msg/s, {info['bytes_per_second']} B/s")
+        print(f"site events: {len(coordinator.events)}")
+    print(f"frames with an animal engaged twice: {double_engaged}, "
+          f"animals left alone with a free unit seeing them: {missed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# video_serving.py
+"""
+Helpers for serving recordings and their preview/track files to the browser.
+
+Shared by the Flask app in main.py and the separate web process
+(web_process.py), which is why nothing here touches the camera or the
+catalog directly.
+"""
+
+import os
+import time
+
+from flask import Response, send_file, send_from_directory
+from werkzeug.utils import safe_join
+
+
+class ThrottledFile:
+    """
+    Re-yields the chunks of a file response no faster than rate_kbps.
+
+    A class rather than a generator: the server calls close() when the response is done,
+    even if iteration never started (client gone, HEAD request), and that closes the file.
+    """
+    def __init__(self, iterable, rate_kbps):
+        self.iterable = iterable
+        self.bytes_per_second = rate_kbps * 1024.0
+
+    def __iter__(self):
+        start = time.monotonic()
+        sent = 0
+        for chunk in self.iterable:
+            yield chunk
+            sent += len(chunk)
+            ahead = (sent / self.bytes_per_second) - (time.monotonic() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def close(self):
+        if hasattr(self.iterable, "close"):
+            self.iterable.close()
+
+
+def close_with(response, callback):
+    """
+    Runs callback once when the server closes the response body.
+
+    send_file() responses are passed straight through to the server (direct_passthrough),
+    which then only closes the body iterable and never the response, so callbacks from
+    response.call_on_close() would not run.  The callback is chained onto the body's own
+    close(), which the server always calls, and which response.close() calls otherwise.
+    """
+    body = response.response
+    close = getattr(body, "close", None)
+    done = []
+
+    def close_and_callback():
+        try:
+            if close is not None:
+                close()
+        finally:
+            if not done:
+                done.append(True)
+                callback()
+
+    body.close = close_and_callback
+
+
+def send_recording(directory, filename, download_slots, finalised, wait=10.0, rate_kbps=0,
+                   cache_max_age=31536000, use_x_sendfile=False):
+    """
+    Serves a recording with Range, ETag and Last-Modified support so the browser can seek
+    without re-downloading.  The file is handed to the server's wsgi.file_wrapper, which a
+    production WSGI server turns into a zero-copy sendfile.
+
+    download_slots is a semaphore limiting concurrent downloads, finalised(filename) says
+    whether the file is a finished recording that can be cached forever.
+    """
+    file_path = safe_join(directory, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        return "File not found", 404
+
+    if not download_slots.acquire(timeout=wait):
+        response = Response("Too many downloads in progress, try again shortly.", status=503)
+        response.headers["Retry-After"] = "5"
+        return response
+
+    try:
+        response = send_file(file_path, conditional=True, etag=True)
+        if finalised(filename):
+            # Finished recordings never change, the browser does not need to revalidate
+            response.headers["Cache-Control"] = f"public, max-age={cache_max_age}, immutable"
+        else:
+            # Possibly still being converted, always revalidate
+            response.headers["Cache-Control"] = "no-cache"
+
+        if rate_kbps and not use_x_sendfile and response.status_code != 304:
+            response.response = ThrottledFile(response.response, rate_kbps)
+
+        # The slot is freed once the server has finished sending the response
+        close_with(response, download_slots.release)
+        return response
+    except Exception:
+        download_slots.release()
+        raise
+
+
+def send_immutable_file(directory, filename, suffixes, max_age, mimetype=None):
+    """
+    Serves a poster, sprite or track file.  These never change once written,
+    so the browser may keep them.
+    """
+    if not filename.endswith(suffixes):
+        return "Not found", 404
+    response = send_from_directory(directory, filename, max_age=max_age, mimetype=mimetype)
+    response.headers["Cache-Control"] = f"public, max-age={max_age}, immutable"
+    return response
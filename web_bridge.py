@@ -0,0 +1,132 @@
+# web_bridge.py
+"""
+Local socket between the camera process and the separate web process.
+
+The web process serves the pages, the MJPEG stream and the recording files
+itself, and forwards every other request (status, mode changes, moves,
+configuration...) over a Unix socket to the camera process.  There the
+request is run through the normal Flask app in main.py, so the routes only
+exist once.  Messages are pickled dicts sent with multiprocessing.connection,
+authenticated with a random key handed to the web process at start up.
+"""
+
+import logging
+import threading
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger("my_app_logger.web_bridge")
+
+# Hop-by-hop headers that must not be copied between the two HTTP exchanges
+SKIP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "host"}
+
+
+def request_to_message(req):
+    """
+    Packs a Flask/werkzeug request so it can be replayed in the camera process.
+    """
+    return {
+        "type": "http",
+        "method": req.method,
+        "path": req.path,
+        "query_string": req.query_string.decode("latin-1"),
+        "headers": [(k, v) for k, v in req.headers.items() if k.lower() not in SKIP_HEADERS],
+        "body": req.get_data(),
+    }
+
+
+def run_through_app(app, message):
+    """
+    Camera side: runs a forwarded request through the Flask app and packs the response.
+    """
+    with app.test_client() as client:
+        response = client.open(
+            message["path"],
+            method=message["method"],
+            query_string=message["query_string"],
+            headers=message["headers"],
+            data=message["body"],
+        )
+        return {
+            "status": response.status_code,
+            "headers": [(k, v) for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS],
+            "body": response.get_data(),
+        }
+
+
+class BridgeServer:
+    def __init__(self, address, authkey, app, handlers=None):
+        """
+        app is the Flask app forwarded requests are run through.  handlers maps
+        extra message types to functions taking the message and returning a reply.
+        """
+        self.address = address
+        self.authkey = authkey
+        self.app = app
+        self.handlers = handlers or {}
+        self.listener = None
+
+    def start(self):
+        self.listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                logger.warning(f"Web bridge rejected a connection: {e}")
+                continue
+            threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+
+    def serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if message["type"] == "http":
+                        reply = run_through_app(self.app, message)
+                    else:
+                        reply = self.handlers[message["type"]](message)
+                except Exception as e:
+                    logger.error(f"Web bridge failed handling {message.get('type')}: {e}")
+                    reply = {"status": 500, "headers": [], "body": str(e).encode(), "error": str(e)}
+                conn.send(reply)
+
+
+class BridgeClient:
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        # One connection per web server thread so requests never interleave
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self.local.conn = conn
+        return conn
+
+    def call(self, message):
+        """
+        Sends a message and waits for the reply, reconnecting once if the connection dropped.
+        """
+        for attempt in range(2):
+            conn = self.connection()
+            try:
+                conn.send(message)
+                return conn.recv()
+            except (EOFError, OSError):
+                self.local.conn = None
+                if attempt:
+                    raise
+
+    def forward(self, req):
+        """
+        Forwards a Flask request to the camera process, returns (body, status, headers).
+        """
+        reply = self.call(request_to_message(req))
+        return reply["body"], reply["status"], reply["headers"]
@@ -0,0 +1,229 @@
+# web_process.py
+"""
+Runs the web tier in its own process (WEB_SERVER_PROCESS = True), so JPEG
+encoding, template rendering and the web server threads do not compete with
+the camera callback for the GIL.
+
+main.py starts it as its own script (python web_process.py) and hands over
+the settings as one JSON line on stdin, so the child never imports main.py
+or anything that touches the hardware (pan_tilt_control, picamera2...).  A
+multiprocessing "spawn" child would run main.py's module scope again.  The
+child exits when its stdin closes, i.e. when the camera process is gone.
+
+Served here directly:
+    /, /system           - static pages
+    /video_feed          - MJPEG, encoded straight from the shared memory frame ring
+                           (one ring per pipeline, also at /pipeline/<name>/...)
+    /video, /thumbnail,
+    /tracks              - recording files from SAVE_DIRECTORY
+    /packages            - installed packages of this interpreter
+    /status/stream       - SSE, long-polling the pipeline's status snapshot over the bridge
+    /metrics             - the camera process metrics plus this process's stream metrics
+Everything else is forwarded to the camera process over the web bridge.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import cv2
+from flask import Flask, Response, abort, jsonify, render_template, request
+
+from metrics import registry, family_names, stream_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from shared_frames import SharedFrameRing
+from status_stream import sse_events
+from system_metrics import installed_packages
+from video_serving import send_immutable_file, send_recording
+from web_bridge import BridgeClient
+
+logger = logging.getLogger("my_app_logger.web_process")
+
+
+def create_app(settings, rings, bridge):
+    """
+    rings: {pipeline name: SharedFrameRing}, the first pipeline is the default one.
+    """
+    app = Flask(__name__)
+    app.config["USE_X_SENDFILE"] = settings["use_x_sendfile"]
+    save_directory = settings["save_directory"]
+    pipeline_names = settings["pipelines"]
+    download_slots = threading.BoundedSemaphore(settings["max_concurrent_downloads"])
+    frame_wait = 1.0 / (2 * settings["fps"])
+
+    def is_finalised(filename):
+        # A recording is finished once its catalog entry has been written
+        base_name = os.path.splitext(os.path.basename(filename))[0]
+        return os.path.exists(os.path.join(save_directory, base_name + ".json"))
+
+    encode_seconds, stream_clients = stream_metrics()
+    # JPEG quality of the camera process's performance profile, asked for every few seconds
+    jpeg_quality = {"value": 95, "checked": 0.0}
+
+    def preview_quality():
+        now = time.monotonic()
+        if now - jpeg_quality["checked"] > 5.0:
+            jpeg_quality["checked"] = now
+            try:
+                jpeg_quality["value"] = bridge.call({"type": "performance"})["jpeg_quality"]
+            except (EOFError, OSError, KeyError, TypeError) as e:
+                logger.warning(f"Could not read the performance profile: {e}")
+        return jpeg_quality["value"]
+
+    def gen_frames(ring):
+        last_seq = 0
+        stream_clients.inc()
+        ring.add_reader(1)
+        try:
+            while True:
+                seq = ring.latest_seq()
+                if seq == last_seq:
+                    time.sleep(frame_wait)
+                    continue
+                encode_start = time.perf_counter()
+                ret, buffer = cv2.imencode('.jpg', ring.view(seq), [cv2.IMWRITE_JPEG_QUALITY, preview_quality()])
+                encode_seconds.observe(time.perf_counter() - encode_start)
+                # Discard the frame if the camera process overwrote the slot while we encoded it
+                if not ret or not ring.still_valid(seq):
+                    continue
+                last_seq = seq
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+        finally:
+            ring.add_reader(-1)
+            stream_clients.dec()
+
+    def pipeline_ring(pipeline):
+        if pipeline is None:
+            return rings[pipeline_names[0]]
+        if pipeline not in rings:
+            abort(404)
+        return rings[pipeline]
+
+    @app.route('/')
+    @app.route('/pipeline/<pipeline>/')
+    def index(pipeline=None):
+        pipeline_ring(pipeline)
+        return render_template('index.html', base=f"/pipeline/{pipeline}" if pipeline else "",
+                               pipeline_names=pipeline_names, current=pipeline or pipeline_names[0])
+
+    @app.route("/system")
+    def system_page():
+        return render_template("system.html")
+
+    @app.route('/video_feed')
+    @app.route('/pipeline/<pipeline>/video_feed')
+    def video_feed(pipeline=None):
+        return Response(gen_frames(pipeline_ring(pipeline)),
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
+
+    @app.route("/video/<path:filename>")
+    def serve_video(filename):
+        return send_recording(
+            save_directory, filename, download_slots,
+            finalised=is_finalised,
+            wait=settings["download_wait"],
+            rate_kbps=settings["download_rate_kbps"],
+            cache_max_age=settings["video_cache_max_age"],
+            use_x_sendfile=settings["use_x_sendfile"]
+        )
+
+    @app.route("/thumbnail/<path:filename>")
+    def serve_thumbnail(filename):
+        return send_immutable_file(save_directory, filename, ("_poster.jpg", "_sprite.jpg"),
+                                   settings["thumbnail_cache_max_age"])
+
+    @app.route("/tracks/<path:filename>")
+    def serve_tracks(filename):
+        return send_immutable_file(save_directory, filename, (".tracks.jsonl",),
+                                   settings["thumbnail_cache_max_age"], mimetype="application/x-ndjson")
+
+    @app.route("/status/stream")
+    @app.route("/pipeline/<pipeline>/status/stream")
+    def status_stream(pipeline=None):
+        pipeline_ring(pipeline)
+        name = pipeline or pipeline_names[0]
+
+        def wait_over_bridge(version, timeout):
+            reply = bridge.call({"type": "status_wait", "pipeline": name, "version": version, "timeout": timeout})
+            if "version" not in reply:
+                # The camera process failed the request, keep the stream open and ask again shortly
+                logger.warning(f"Status wait failed: {reply.get('error')}")
+                time.sleep(1.0)
+                return version, None
+            return reply["version"], reply["snapshot"]
+
+        response = Response(
+            sse_events(wait_over_bridge,
+                       heartbeat=settings["status_heartbeat"],
+                       min_interval=settings["status_min_interval"]),
+            mimetype="text/event-stream"
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        try:
+            body, _, _ = bridge.forward(request)
+        except (EOFError, OSError) as e:
+            logger.error(f"Camera process not reachable: {e}")
+            body = b""
+        # A family may only appear once per scrape, the camera process's copy wins
+        own = registry.render(exclude=family_names(body.decode()))
+        return Response(body + own.encode(), mimetype=METRICS_CONTENT_TYPE)
+
+    @app.route("/packages")
+    def list_packages():
+        return jsonify(installed_packages())
+
+    @app.route("/<path:path>", methods=["GET", "POST", "PUT", "DELETE"])
+    def forward(path):
+        try:
+            return bridge.forward(request)
+        except (EOFError, OSError) as e:
+            logger.error(f"Camera process not reachable: {e}")
+            return "Camera process not reachable", 502
+
+    return app
+
+
+def run_web_process(settings, ring_info, bridge_address, authkey):
+    """
+    Entry point of the web process.  ring_info is {pipeline name: SharedFrameRing.describe()}.
+    """
+    logging.basicConfig(
+        level=getattr(logging, settings["log_level"].upper(), logging.INFO),
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        stream=sys.stdout
+    )
+    rings = {
+        name: SharedFrameRing(name=info["name"], shape=info["shape"], slots=info["slots"])
+        for name, info in ring_info.items()
+    }
+    bridge = BridgeClient(bridge_address, authkey)
+    app = create_app(settings, rings, bridge)
+    logger.info(f"Web process {os.getpid()} serving on port {settings['port']}")
+    app.run(host=settings["host"], port=settings["port"], debug=False, threaded=True)
+
+
+def exit_with_parent():
+    # stdin is a pipe from the camera process, it reaches EOF when that process ends
+    sys.stdin.read()
+    logger.info("Camera process gone, web process exiting")
+    os._exit(0)
+
+
+def main():
+    launch = json.loads(sys.stdin.readline())
+    threading.Thread(target=exit_with_parent, daemon=True).start()
+    run_web_process(launch["settings"], launch["rings"], launch["bridge_address"],
+                    bytes.fromhex(launch["authkey"]))
+
+
+if __name__ == "__main__":
+    main()
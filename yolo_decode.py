@@ -0,0 +1,111 @@
+# yolo_decode.py
+"""
+Decoding and NMS on the host for YOLOv8 exports without on-chip NMS
+(POSTPROCESS = "yolov8").
+
+Such a network outputs the raw detection head, one row per anchor
+(8400 for a 640x640 input) holding the box centre, size and one score per
+class.  Going through picamera2's generic NMS loops over the classes in
+Python and sorts every candidate, which takes a good part of the frame
+budget once a model has thousands of candidates.  Here:
+
+    - the best class and its score are found for all anchors at once, into
+      buffers that are only allocated when the output shape changes
+    - anchors below the threshold are dropped, then only the top_k highest
+      scores are kept (argpartition, no full sort) before NMS
+    - NMS runs once for all classes, each class offset into its own area of
+      the coordinate space so boxes of different classes never overlap, with
+      the IOU of the best box against all the remaining ones in one step
+"""
+
+import numpy as np
+
+
+class YoloDecoder:
+    def __init__(self):
+        # Work buffers, sized for the last output shape seen
+        self.anchors = 0
+        self.best_class = None
+        self.best_score = None
+
+    def prepare(self, anchors):
+        if anchors != self.anchors:
+            self.anchors = anchors
+            self.best_class = np.empty(anchors, dtype=np.intp)
+            self.best_score = np.empty(anchors, dtype=np.float32)
+
+    @staticmethod
+    def split_outputs(np_outputs):
+        """
+        (boxes (A, 4), scores (A, classes)) from either one combined head output (batch, 4 + classes, A),
+        possibly transposed, or separate box and score outputs.
+        """
+        if len(np_outputs) >= 2 and np_outputs[0][0].shape[-1] == 4:
+            return np_outputs[0][0], np_outputs[1][0]
+        head = np_outputs[0][0]
+        if head.shape[0] < head.shape[1]:
+            # (4 + classes, A), a view so nothing is copied
+            head = head.T
+        return head[:, :4], head[:, 4:]
+
+    def decode(self, np_outputs, input_size, threshold, iou, max_detections, top_k=300):
+        """
+        Returns (boxes, scores, classes).  Boxes are (y0, x0, y1, x1) 0.0 - 1.0 of the network
+        input, the same as the other post-processing paths, ready for convert_inference_coords().
+        """
+        input_w, input_h = input_size
+        boxes, scores = self.split_outputs(np_outputs)
+        self.prepare(scores.shape[0])
+
+        np.argmax(scores, axis=1, out=self.best_class)
+        np.max(scores, axis=1, out=self.best_score)
+        candidates = np.flatnonzero(self.best_score >= threshold)
+        if candidates.size == 0:
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.intp)
+
+        candidate_scores = self.best_score[candidates]
+        if candidates.size > top_k:
+            best = np.argpartition(candidate_scores, candidates.size - top_k)[-top_k:]
+            candidates = candidates[best]
+            candidate_scores = candidate_scores[best]
+        order = np.argsort(candidate_scores)[::-1]
+        candidates = candidates[order]
+        candidate_scores = candidate_scores[order]
+        candidate_classes = self.best_class[candidates]
+
+        # Centre/size in input pixels -> corners
+        cx, cy, w, h = boxes[candidates].T
+        x0 = cx - w / 2
+        y0 = cy - h / 2
+        x1 = cx + w / 2
+        y1 = cy + h / 2
+
+        keep = batched_nms(x0, y0, x1, y1, candidate_classes, iou, max_detections,
+                           offset=max(input_w, input_h) + 1)
+        corners = np.stack((y0[keep] / input_h, x0[keep] / input_w, y1[keep] / input_h, x1[keep] / input_w), axis=1)
+        return np.clip(corners, 0.0, 1.0), candidate_scores[keep], candidate_classes[keep]
+
+
+def batched_nms(x0, y0, x1, y1, classes, iou, max_detections, offset):
+    """
+    Indices of the boxes kept by NMS per class.  The boxes must already be sorted best first.
+    """
+    shift = classes * offset
+    x0 = x0 + shift
+    y0 = y0 + shift
+    x1 = x1 + shift
+    y1 = y1 + shift
+    areas = (x1 - x0) * (y1 - y0)
+
+    keep = []
+    remaining = np.arange(x0.size)
+    while remaining.size and len(keep) < max_detections:
+        i = remaining[0]
+        keep.append(i)
+        rest = remaining[1:]
+        width = np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest])
+        height = np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest])
+        intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+        overlap = intersection / (areas[i] + areas[rest] - intersection + 1e-9)
+        remaining = rest[overlap <= iou]
+    return np.array(keep, dtype=np.intp)
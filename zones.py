@@ -0,0 +1,125 @@
+# zones.py
+"""
+Polygon zones that limit what the turret reacts to.
+
+    ignore    detections here are dropped straight after parsing (the
+              neighbour's fence, the patio door)
+    engage    once any engage zone exists, only targets inside one are aimed
+              at and fired on; others are still tracked and recorded
+    no_fire   targets here are aimed at and recorded but the water pistol
+              stays off
+
+Zones are drawn on the web page and saved in zones.json, with the polygon
+points as 0.0 - 1.0 of the frame so they survive resolution changes.  For
+each camera configuration they are rasterised once into a small bitmap
+(one bit per kind, so zones may overlap) and a detection is tested by
+indexing the bitmap at its centre or footprint instead of running a point
+in polygon test per zone per frame.
+"""
+
+import json
+import logging
+import os
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("my_app_logger.zones")
+
+# Bit of each zone kind in the bitmap
+IGNORE = 1
+ENGAGE = 2
+NO_FIRE = 4
+ZONE_KINDS = {"ignore": IGNORE, "engage": ENGAGE, "no_fire": NO_FIRE}
+
+# Where a detection box is tested: its centre, or the middle of its bottom edge where the animal stands
+TEST_POINTS = ("centre", "footprint")
+
+
+class Zone(NamedTuple):
+    name: str
+    kind: str         # One of ZONE_KINDS
+    points: tuple     # ((x, y), ...) 0.0 - 1.0 of the frame
+
+
+def parse_zones(data):
+    """
+    Zones from their JSON form, [{"name": ..., "kind": ..., "points": [[x, y], ...]}, ...].
+    Raises ValueError if any of them is invalid.
+    """
+    if not isinstance(data, list):
+        raise ValueError("Zones must be a list")
+    zones = []
+    for number, item in enumerate(data, 1):
+        try:
+            name = str(item.get("name") or f"Zone {number}")
+            kind = item["kind"]
+            points = tuple((float(x), float(y)) for x, y in item["points"])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValueError(f"Zone {number} needs a kind and a list of [x, y] points")
+        if kind not in ZONE_KINDS:
+            raise ValueError(f"Zone {name}: kind must be one of {', '.join(ZONE_KINDS)}")
+        if len(points) < 3:
+            raise ValueError(f"Zone {name} needs at least 3 points")
+        if not all(0.0 <= v <= 1.0 for point in points for v in point):
+            raise ValueError(f"Zone {name}: points must be between 0.0 and 1.0")
+        zones.append(Zone(name, kind, points))
+    return zones
+
+
+def load_zones(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            return parse_zones(json.load(f))
+    except Exception as e:
+        logger.error(f"Could not load zones from {path}: {e}")
+        return []
+
+
+def save_zones(path, zones):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump([{"name": z.name, "kind": z.kind, "points": [list(p) for p in z.points]} for z in zones], f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ZoneMap:
+    def __init__(self, zones, frame_size, grid_width=160, test_point="footprint"):
+        """
+        frame_size is the (width, height) of the stream the detection boxes are in.
+        """
+        frame_w, frame_h = frame_size
+        grid_w = max(1, min(grid_width, frame_w))
+        grid_h = max(1, round(grid_w * frame_h / frame_w))
+        self.bitmap = np.zeros((grid_h, grid_w), dtype=np.uint8)
+        for zone in zones:
+            mask = np.zeros_like(self.bitmap)
+            polygon = np.array([(x * grid_w, y * grid_h) for x, y in zone.points], dtype=np.int32)
+            cv2.fillPoly(mask, [polygon], 1)
+            self.bitmap |= mask * ZONE_KINDS[zone.kind]
+
+        self.empty = not zones
+        self.has_engage = any(zone.kind == "engage" for zone in zones)
+        self.scale_x = grid_w / frame_w
+        self.scale_y = grid_h / frame_h
+        self.max_x = grid_w - 1
+        self.max_y = grid_h - 1
+        self.footprint = test_point == "footprint"
+
+    def flags_at(self, x, y):
+        """
+        Zone bits at a point in frame pixels.
+        """
+        column = min(max(int(x * self.scale_x), 0), self.max_x)
+        row = min(max(int(y * self.scale_y), 0), self.max_y)
+        return int(self.bitmap[row, column])
+
+    def flags_for_box(self, box):
+        x, y, w, h = box
+        return self.flags_at(x + w / 2, y + h if self.footprint else y + h / 2)
+
+    def can_engage(self, flags):
+        return not self.has_engage or bool(flags & ENGAGE)